@@ -0,0 +1,230 @@
+#!/usr/bin/env python
+import os
+import argparse
+import subprocess
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import h5py
+import numpy as np
+
+
+# Dataset paths within a population depth matrix file.
+DEPTHS_PATH = "/depths"
+SAMPLES_PATH = "/samples"
+SLICE_CHROMS_PATH = "/slices/chrom"
+SLICE_STARTS_PATH = "/slices/start"
+SLICE_ENDS_PATH = "/slices/end"
+
+
+def get_parameter_values():
+    """Define CLI parameters and return their set values.
+
+    Returns
+    -------
+    dict
+        Set parameter values
+    """
+    depth_args = argparse.ArgumentParser()
+    depth_args.add_argument("-i", "--input-directory", type=str, required=True, dest="input-directory", help="Path to population directory with BAM files")
+    depth_args.add_argument("-b", "--sliced-bed-file", type=str, required=True, dest="sliced-bed-file", help="Path to the sliced BED file")
+    depth_args.add_argument("-o", "--output-file", type=str, required=True, dest="output-file", help="Path to write the population depth matrix (.hdf5) to")
+    depth_args.add_argument("-w", "--workers", type=int, default=4, dest="workers", help="Number of BAM files to process at the same time [4]")
+    depth_args.add_argument("-t", "--threads", type=int, default=2, dest="threads", help="Number of sambamba threads per BAM file [2]")
+    depth_args.add_argument("-q", "--minimum-mapq", type=int, default=20, dest="minimum-mapq", help="Minimum mapping quality of reads to count [20]")
+    depth_args.add_argument("-s", "--sambamba", type=str, default="sambamba", dest="sambamba", help="Path to the sambamba executable [sambamba]")
+    return vars(depth_args.parse_args())
+
+
+def read_slices(slicedbedloc):
+    """Read and return the slices of the sliced BED file.
+
+    Parameters
+    ----------
+    slicedbedloc : str
+        Path to the sliced BED file
+
+    Returns
+    -------
+    bed_slices : list of tuple
+        Chromosome, start and end of each slice, in BED file order
+    """
+    bed_slices = []
+    with open(slicedbedloc, 'r') as slicedbedfile:
+        for fileline in slicedbedfile:
+            filelinedata = fileline.strip().split("\t")
+            if len(filelinedata) >= 3 and not fileline.startswith(("#", "track")):
+                bed_slices.append((filelinedata[0], int(filelinedata[1]), int(filelinedata[2])))
+    return bed_slices
+
+
+def make_depth_command(sambamba, bamfile, slicedbedloc, minimummapq, numofthreads):
+    """Make and return the sambamba depth region command for a BAM file.
+
+    The reads are filtered in the same way as the sambamba jobs of
+    generate_sambamba.py did. The output is written to stdout.
+
+    Returns
+    -------
+    list of str
+        Command and its arguments
+    """
+    read_filter = f"mapping_quality >= {minimummapq} and not duplicate and not failed_quality_control and not secondary_alignment"
+    return [sambamba, "depth", "region", bamfile, "-L", slicedbedloc, "-m", "-q", "10", "-F", read_filter, "-t", str(numofthreads)]
+
+
+def parse_depth_output(depthoutput, sliceindices):
+    """Parse the sambamba depth region output and return the mean depth per
+    slice.
+
+    Parameters
+    ----------
+    depthoutput : str
+        Output of sambamba depth region
+    sliceindices : dict
+        Index of each slice in the depth matrix
+
+    Returns
+    -------
+    slice_depths : numpy.ndarray
+        Mean depth per slice, NaN for slices without output
+    """
+    slice_depths = np.full(len(sliceindices), np.nan, dtype=np.float32)
+    outputlines = depthoutput.splitlines()
+    if len(outputlines) == 0:
+        return slice_depths
+    header_fields = outputlines[0].lstrip("# ").split("\t")
+    meancov_column = header_fields.index("meanCoverage")
+    for outputline in outputlines[1:]:
+        outputdata = outputline.split("\t")
+        sliceindex = sliceindices.get((outputdata[0], int(outputdata[1]), int(outputdata[2])))
+        if sliceindex is not None:
+            slice_depths[sliceindex] = float(outputdata[meancov_column])
+    return slice_depths
+
+
+def collect_sample_depths(depthcommand, sliceindices):
+    """Run the depth command of a single BAM file and return the mean depth
+    per slice, None if the command failed."""
+    depth_process = subprocess.run(depthcommand, stdout=subprocess.PIPE, stderr=subprocess.PIPE, universal_newlines=True)
+    if depth_process.returncode != 0:
+        print(f"Depth collection failed for {depthcommand[3]}: {depth_process.stderr.strip()}")
+        return None
+    return parse_depth_output(depth_process.stdout, sliceindices)
+
+
+def collect_depths(bamfiles, bedslices, slicedbedloc, depthparams):
+    """Collect the mean depth per slice of all BAM files of a population with
+    a local worker pool.
+
+    Parameters
+    ----------
+    bamfiles : dict
+        Path to the BAM file per sample
+    bedslices : list of tuple
+        Chromosome, start and end of each slice
+    slicedbedloc : str
+        Path to the sliced BED file
+    depthparams : dict
+        Set parameter values
+
+    Returns
+    -------
+    sample_names : list of str
+        Names of the samples with collected depths, in matrix row order
+    depth_matrix : numpy.ndarray
+        Mean depth per sample (rows) and slice (columns)
+    """
+    slice_indices = {bedslice: sliceindex for sliceindex, bedslice in enumerate(bedslices)}
+    sample_depths = {}
+    with ThreadPoolExecutor(max_workers=depthparams["workers"]) as depth_executor:
+        running = {depth_executor.submit(collect_sample_depths,
+                                         make_depth_command(depthparams["sambamba"], bamfile, slicedbedloc, depthparams["minimum-mapq"], depthparams["threads"]),
+                                         slice_indices): samplename
+                   for samplename, bamfile in bamfiles.items()}
+        for finished, future in enumerate(as_completed(running), start=1):
+            samplename = running[future]
+            slice_depths = future.result()
+            if slice_depths is not None:
+                sample_depths[samplename] = slice_depths
+            print(f"[{finished}/{len(running)}] Collected depths of {samplename}?: {slice_depths is not None}")
+
+    sample_names = [samplename for samplename in bamfiles if samplename in sample_depths]
+    depth_matrix = np.vstack([sample_depths[samplename] for samplename in sample_names]) if len(sample_names) > 0 else np.empty((0, len(bedslices)), dtype=np.float32)
+    return sample_names, depth_matrix
+
+
+def write_depth_matrix(outfileloc, samplenames, bedslices, depthmatrix):
+    """Write the population depth matrix with its sample names and slices.
+
+    Parameters
+    ----------
+    outfileloc : str
+        Path to write the depth matrix file to
+    samplenames : list of str
+        Sample name per matrix row
+    bedslices : list of tuple
+        Chromosome, start and end per matrix column
+    depthmatrix : numpy.ndarray
+        Mean depth per sample and slice
+
+    Returns
+    -------
+    file_written : bool
+        True if file has been written, False if not
+    """
+    file_written = False
+    try:
+        with h5py.File(outfileloc, 'w') as depthfile:
+            depthfile.create_dataset(DEPTHS_PATH, data=depthmatrix, chunks=True, compression="gzip", compression_opts=4)
+            depthfile.create_dataset(SAMPLES_PATH, data=np.array(samplenames, dtype=h5py.string_dtype()))
+            depthfile.create_dataset(SLICE_CHROMS_PATH, data=np.array([bedslice[0] for bedslice in bedslices], dtype=h5py.string_dtype()))
+            depthfile.create_dataset(SLICE_STARTS_PATH, data=np.array([bedslice[1] for bedslice in bedslices], dtype=np.int64))
+            depthfile.create_dataset(SLICE_ENDS_PATH, data=np.array([bedslice[2] for bedslice in bedslices], dtype=np.int64))
+        file_written = True
+    except IOError:
+        print(f"Could not write depth matrix {outfileloc}")
+    finally:
+        return file_written
+
+
+def read_depth_matrix(depthfileloc):
+    """Read and return a population depth matrix written by this script.
+
+    Parameters
+    ----------
+    depthfileloc : str
+        Path to the depth matrix file
+
+    Returns
+    -------
+    sample_names : list of str
+        Sample name per matrix row
+    bed_slices : list of tuple
+        Chromosome, start and end per matrix column
+    depth_matrix : h5py.Dataset
+        Mean depth per sample and slice, read from disk when sliced
+    depth_file : h5py.File
+        Opened depth matrix file, to close after use
+    """
+    depth_file = h5py.File(depthfileloc, 'r')
+    sample_names = [x.decode() if isinstance(x, bytes) else str(x) for x in depth_file[SAMPLES_PATH][...]]
+    slice_chroms = [x.decode() if isinstance(x, bytes) else str(x) for x in depth_file[SLICE_CHROMS_PATH][...]]
+    bed_slices = list(zip(slice_chroms, depth_file[SLICE_STARTS_PATH][...].tolist(), depth_file[SLICE_ENDS_PATH][...].tolist()))
+    return sample_names, bed_slices, depth_file[DEPTHS_PATH], depth_file
+
+
+def main():
+    depth_params = get_parameter_values()
+    bed_slices = read_slices(depth_params["sliced-bed-file"])
+    with os.scandir(depth_params["input-directory"]) as direntries:
+        bam_files = {direntry.name.split(".")[0]: direntry.path for direntry in direntries if direntry.name.endswith(".bam")}
+    bam_files = dict(sorted(bam_files.items()))
+    print(f"Collecting depths of {len(bed_slices)} slices for {len(bam_files)} BAM files")
+
+    sample_names, depth_matrix = collect_depths(bam_files, bed_slices, depth_params["sliced-bed-file"], depth_params)
+    wrote_matrix = write_depth_matrix(depth_params["output-file"], sample_names, bed_slices, depth_matrix)
+    print(f"Wrote depth matrix of {len(sample_names)} samples?: {wrote_matrix}")
+
+
+if __name__ == "__main__":
+    main()
@@ -2,7 +2,34 @@
 import sys
 import os
 
-indirfiles = os.listdir(sys.argv[1])
+
+def read_manifest_files(manifestloc, dirloc):
+    """Return the names of the files in a directory from a manifest file made
+    with file_manifest.py, instead of listing the directory. Returns None if
+    the directory is not in the manifest or changed since it was scanned."""
+    manifest_files = None
+    in_dir = False
+    dir_mtime = os.stat(dirloc).st_mtime_ns
+    with open(manifestloc, 'r') as manifestfile:
+        for fileline in manifestfile:
+            filelinedata = fileline.rstrip("\n").split("\t")
+            if filelinedata[0] == "D":
+                in_dir = filelinedata[1] == os.path.abspath(dirloc) and int(filelinedata[2]) == dir_mtime
+                if in_dir:
+                    manifest_files = []
+            elif in_dir:
+                manifest_files.append(filelinedata[1])
+    return manifest_files
+
+
+# Use the manifest, if supplied and up to date, to not list the BAM directory again
+indirfiles = None
+if len(sys.argv) > 4:
+    indirfiles = read_manifest_files(sys.argv[4], sys.argv[1])
+    if indirfiles is None:
+        print(f"The manifest is missing or outdated for {sys.argv[1]}, listing the directory instead")
+if indirfiles is None:
+    indirfiles = os.listdir(sys.argv[1])
 bamfiles = [f"{sys.argv[1]}/{bamfile}" for bamfile in indirfiles if bamfile.endswith(".bam")]
 jobnum=0
 sbatch_files = []
@@ -0,0 +1,236 @@
+#!/usr/bin/env python
+import argparse
+
+import numpy as np
+
+import collect_depths as cd
+
+
+# Populations used to make the High Confident BED file
+POPULATIONS = ("F1", "F2", "M1", "M2")
+
+
+def get_parameter_values():
+    """Define CLI parameters and return their set values.
+
+    Returns
+    -------
+    dict
+        Set parameter values
+    """
+    stats_args = argparse.ArgumentParser()
+    stats_args.add_argument("-f1", "--female1", type=str, required=True, dest="F1", help="Path to depth matrix of population1 female")
+    stats_args.add_argument("-f2", "--female2", type=str, required=True, dest="F2", help="Path to depth matrix of population2 female")
+    stats_args.add_argument("-m1", "--male1", type=str, required=True, dest="M1", help="Path to depth matrix of population1 male")
+    stats_args.add_argument("-m2", "--male2", type=str, required=True, dest="M2", help="Path to depth matrix of population2 male")
+    stats_args.add_argument("-o", "--output-file", type=str, required=True, dest="output-file", help="Path to write the High Confident BED file to")
+    stats_args.add_argument("-s", "--statistics-directory", type=str, dest="statistics-directory", help="Path to directory to write the statistics per population to")
+    stats_args.add_argument("-c", "--chunk-size", type=int, default=50000, dest="chunk-size", help="Number of slices to process at once [50000]")
+    stats_args.add_argument("-a", "--autosomal-fraction", type=float, default=0.95, dest="autosomal-fraction", help="Fraction of autosomal and X slices with the lowest variation to keep [0.95]")
+    stats_args.add_argument("-y", "--y-fraction", type=float, default=0.33, dest="y-fraction", help="Fraction of Y slices with the lowest variation to keep [0.33]")
+    stats_args.add_argument("-t", "--overlap-threshold", type=float, default=99.0, dest="overlap-threshold", help="Percentage of kept slices both populations should share [99]")
+    stats_args.add_argument("-l", "--loose-overlap-threshold", type=float, default=98.0, dest="loose-overlap-threshold", help="Lower percentage of shared kept slices that is still accepted [98]")
+    return vars(stats_args.parse_args())
+
+
+def get_sample_means(depthmatrix, chunksize):
+    """Determine and return the mean depth over all slices of each sample.
+
+    Parameters
+    ----------
+    depthmatrix : h5py.Dataset or numpy.ndarray
+        Mean depth per sample (rows) and slice (columns)
+    chunksize : int
+        Number of slices to read at once
+
+    Returns
+    -------
+    numpy.ndarray
+        Mean depth per sample
+    """
+    num_of_samples, num_of_slices = depthmatrix.shape
+    depth_sums = np.zeros(num_of_samples, dtype=np.float64)
+    depth_counts = np.zeros(num_of_samples, dtype=np.int64)
+    for chunkstart in range(0, num_of_slices, chunksize):
+        depth_chunk = np.asarray(depthmatrix[:, chunkstart:chunkstart+chunksize], dtype=np.float64)
+        depth_sums += np.nansum(depth_chunk, axis=1)
+        depth_counts += np.sum(~np.isnan(depth_chunk), axis=1)
+    return depth_sums / np.where(depth_counts > 0, depth_counts, 1)
+
+
+def get_slice_statistics(depthmatrix, chunksize):
+    """Determine and return the mean, standard deviation and coefficient of
+    variation of the normalized depth of each slice.
+
+    The depths of each sample are normalized by the mean depth of that
+    sample. The slices are read and processed in chunks, so only a chunk of
+    the depth matrix is in memory at any time.
+
+    Parameters
+    ----------
+    depthmatrix : h5py.Dataset or numpy.ndarray
+        Mean depth per sample (rows) and slice (columns)
+    chunksize : int
+        Number of slices to process at once
+
+    Returns
+    -------
+    slice_means : numpy.ndarray
+        Mean normalized depth per slice
+    slice_sds : numpy.ndarray
+        Standard deviation of the normalized depth per slice
+    slice_cvs : numpy.ndarray
+        Coefficient of variation per slice, infinite for slices without depth
+    """
+    num_of_slices = depthmatrix.shape[1]
+    sample_means = get_sample_means(depthmatrix, chunksize)
+    sample_scales = np.where(sample_means > 0, sample_means, 1)[:, np.newaxis]
+    slice_means = np.zeros(num_of_slices, dtype=np.float64)
+    slice_sds = np.zeros(num_of_slices, dtype=np.float64)
+    for chunkstart in range(0, num_of_slices, chunksize):
+        norm_chunk = np.asarray(depthmatrix[:, chunkstart:chunkstart+chunksize], dtype=np.float64) / sample_scales
+        with np.errstate(invalid="ignore"):
+            slice_means[chunkstart:chunkstart+chunksize] = np.nan_to_num(np.nanmean(norm_chunk, axis=0))
+            slice_sds[chunkstart:chunkstart+chunksize] = np.nan_to_num(np.nanstd(norm_chunk, axis=0, ddof=1))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        slice_cvs = np.where(slice_means > 0, slice_sds / slice_means, np.inf)
+    return slice_means, slice_sds, slice_cvs
+
+
+def select_stable_slices(slicecvs, slicemask, fractiontokeep):
+    """Select and return the slices with the lowest coefficient of variation.
+
+    Parameters
+    ----------
+    slicecvs : numpy.ndarray
+        Coefficient of variation per slice
+    slicemask : numpy.ndarray
+        Slices to select from
+    fractiontokeep : float
+        Fraction of the slices to select from to keep
+
+    Returns
+    -------
+    numpy.ndarray
+        Indices of the kept slices
+    """
+    candidate_slices = np.flatnonzero(slicemask)
+    num_to_keep = int(len(candidate_slices) * fractiontokeep)
+    return candidate_slices[np.argsort(slicecvs[candidate_slices], kind="stable")[:num_to_keep]]
+
+
+def get_chrom_sort_key(chromname):
+    """Return the sort key of a chromosome, sorting X and Y after the
+    autosomes as make_hcbedfile_part2.sh did."""
+    chromname = chromname[3:] if chromname.startswith("chr") else chromname
+    if chromname.isdigit():
+        return (int(chromname), "")
+    return ({"X": 999999999, "Y": 9999999999}.get(chromname, 99999999999), chromname)
+
+
+def write_slice_statistics(outfileloc, bedslices, slicemeans, slicesds, slicecvs):
+    """Write the mean, standard deviation and coefficient of variation of each
+    slice of a population.
+
+    Returns
+    -------
+    file_written : bool
+        True if file has been written, False if not
+    """
+    file_written = False
+    try:
+        with open(outfileloc, 'w') as outfile:
+            outfile.writelines([f"{bedslice[0]}\t{bedslice[1]}\t{bedslice[2]}\t{slicemean}\t{slicesd}\t{slicecv}\n"
+                                for bedslice, slicemean, slicesd, slicecv in zip(bedslices, slicemeans.tolist(), slicesds.tolist(), slicecvs.tolist())])
+        file_written = True
+    except IOError:
+        print(f"Could not write slice statistics to {outfileloc}")
+    finally:
+        return file_written
+
+
+def write_hc_bed_file(outfileloc, hcslices):
+    """Write the High Confident BED file, sorted on chromosome and start.
+
+    Returns
+    -------
+    file_written : bool
+        True if file has been written, False if not
+    """
+    file_written = False
+    try:
+        with open(outfileloc, 'w') as outfile:
+            outfile.writelines([f"{hcslice[0]}\t{hcslice[1]}\t{hcslice[2]}\n"
+                                for hcslice in sorted(hcslices, key=lambda x: (get_chrom_sort_key(x[0]), x[1], x[2]))])
+        file_written = True
+    except IOError:
+        print(f"Could not write High Confident BED file {outfileloc}")
+    finally:
+        return file_written
+
+
+def make_hc_slices(stats_params):
+    """Determine the slice statistics of the four populations and return the
+    slices of the High Confident BED file.
+
+    Autosomal and X slices are selected on the female populations and Y
+    slices on the male populations. The High Confident slices are the slices
+    selected in both population1 and population2.
+
+    Parameters
+    ----------
+    stats_params : dict
+        Set parameter values
+
+    Returns
+    -------
+    hc_slices : list of tuple
+        Chromosome, start and end of the High Confident slices, None if the populations overlap too little
+    """
+    kept_slices = {}
+    bed_slices = None
+    for population in POPULATIONS:
+        sample_names, pop_slices, depth_matrix, depth_file = cd.read_depth_matrix(stats_params[population])
+        if bed_slices is not None and pop_slices != bed_slices:
+            depth_file.close()
+            print(f"Depth matrix of {population} has different slices than the other populations")
+            return None
+        bed_slices = pop_slices
+        slice_means, slice_sds, slice_cvs = get_slice_statistics(depth_matrix, stats_params["chunk-size"])
+        depth_file.close()
+        print(f"Determined statistics of {len(bed_slices)} slices for {len(sample_names)} {population} samples")
+        if stats_params["statistics-directory"] is not None:
+            write_slice_statistics(f"{stats_params['statistics-directory']}/{population}_output_all", bed_slices, slice_means, slice_sds, slice_cvs)
+
+        y_mask = np.array([bedslice[0] in ("Y", "chrY") for bedslice in bed_slices], dtype=bool)
+        if population.startswith("F"):
+            kept_slices[population] = select_stable_slices(slice_cvs, ~y_mask, stats_params["autosomal-fraction"])
+        else:
+            kept_slices[population] = select_stable_slices(slice_cvs, y_mask, stats_params["y-fraction"])
+
+    hc_population1 = set(np.concatenate([kept_slices["F1"], kept_slices["M1"]]).tolist())
+    hc_population2 = set(np.concatenate([kept_slices["F2"], kept_slices["M2"]]).tolist())
+    shared_slices = hc_population1 & hc_population2
+    overlap_percentage = len(shared_slices) / max(len(hc_population1), 1) * 100
+    print(f"Population overlap: {len(shared_slices)} of {len(hc_population1)} slices ({overlap_percentage:.2f}%)")
+    if overlap_percentage >= stats_params["overlap-threshold"]:
+        print(f"Population overlap satisfies {stats_params['overlap-threshold']}% threshold so we can make the High Confident BED file")
+    elif overlap_percentage >= stats_params["loose-overlap-threshold"]:
+        print(f"Population overlap was lower than {stats_params['overlap-threshold']}% but higher than {stats_params['loose-overlap-threshold']}%, "
+              "therefore we will still make the High Confident BED file")
+    else:
+        print("Population overlap too small to properly make a High Confident BED file :(")
+        return None
+    return [bed_slices[sliceindex] for sliceindex in shared_slices]
+
+
+def main():
+    stats_params = get_parameter_values()
+    hc_slices = make_hc_slices(stats_params)
+    if hc_slices is not None:
+        wrote_hc_bed = write_hc_bed_file(stats_params["output-file"], hc_slices)
+        print(f"Wrote High Confident BED file with {len(hc_slices)} slices?: {wrote_hc_bed}")
+
+
+if __name__ == "__main__":
+    main()
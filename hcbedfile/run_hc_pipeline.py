@@ -0,0 +1,384 @@
+#!/usr/bin/env python
+import os
+import argparse
+import subprocess
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+import make_hc_scripts as mhs
+
+
+# Population directories and depth matrix names per population label.
+POPULATION_DIRS = {"F1": "population1/female", "F2": "population2/female", "M1": "population1/male", "M2": "population2/male"}
+
+# Directory within the project directory for the stage scripts, logs and completion markers.
+PIPELINE_DIR = "hc_pipeline/"
+DONE_SUFFIX = ".done"
+
+
+def get_parameter_values():
+    """Define CLI parameters and return their set values.
+
+    Returns
+    -------
+    dict
+        Set parameter values
+    """
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    pipeline_args = argparse.ArgumentParser()
+    pipeline_args.add_argument("-b", "--bed-file", type=str, required=True, dest="bed-file", help="Path to BED file to use as starting point for the High Confident BED file")
+    pipeline_args.add_argument("-m", "--minimum-samples", type=int, default=30, dest="minimum-samples", help="Minimum number of samples each population should have [30]")
+    pipeline_args.add_argument("-p", "--project-directory", type=str, required=True, dest="project-directory", help="Path to directory to use for creating the High Confident BED file")
+    pipeline_args.add_argument("-s", "--samples-to-use", type=str, required=True, dest="samples-to-use", help="Path to file with samples to use for the two populations")
+    pipeline_args.add_argument("-o", "--output-file", type=str, default="HC_target.bed", dest="output-file", help="Name of the High Confident BED file in the project directory [HC_target.bed]")
+    pipeline_args.add_argument("-be", "--backend", type=str, default="local", choices=["local", "sbatch"], dest="backend", help="Run the stages on this machine or submit them as dependent sbatch jobs [local]")
+    pipeline_args.add_argument("-ps", "--parallel-stages", type=int, default=4, dest="parallel-stages", help="Maximum number of stages to run at the same time with the local backend [4]")
+    pipeline_args.add_argument("-r", "--rerun", action="store_true", dest="rerun", help="Run all stages again, also the ones that already completed")
+    pipeline_args.add_argument("-sl", "--slice-size", type=int, default=300, dest="slice-size", help="Targeted length of the BED file slices [300]")
+    pipeline_args.add_argument("-bs", "--bed-slicer", type=str, default=os.path.normpath(f"{script_dir}/../scripts/hcbedfile/bed_slicer.py"), dest="bed-slicer", help="Path to bed_slicer.py")
+    pipeline_args.add_argument("-w", "--workers", type=int, default=4, dest="workers", help="Number of BAM files to process at the same time per population [4]")
+    pipeline_args.add_argument("-t", "--threads", type=int, default=2, dest="threads", help="Number of sambamba threads per BAM file [2]")
+    pipeline_args.add_argument("-q", "--minimum-mapq", type=int, default=20, dest="minimum-mapq", help="Minimum mapping quality of reads to count [20]")
+    pipeline_args.add_argument("-sb", "--sambamba", type=str, default="sambamba", dest="sambamba", help="Path to the sambamba executable [sambamba]")
+    pipeline_args.add_argument("-v", "--venv", type=str, dest="venv", help="Path to a Python Virtual ENV to activate in the sbatch jobs")
+    pipeline_args.add_argument("-mo", "--modules", type=str, nargs="*", default=["sambamba/0.7.0"], dest="modules", help="Environment modules to load in the sbatch jobs, none if set without modules [sambamba/0.7.0]")
+    pipeline_args.add_argument("-jt", "--job-time", type=str, default="04:00:00", dest="job-time", help="Amount of time for each sbatch job [04:00:00]")
+    pipeline_args.add_argument("-jm", "--job-mem", type=str, default="8gb", dest="job-mem", help="Amount of memory for each sbatch job [8gb]")
+    return vars(pipeline_args.parse_args())
+
+
+def check_parameter_values(parameter_values):
+    """Check that the set parameters are correct.
+
+    Parameters
+    ----------
+    parameter_values : dict
+        Set parameter values
+
+    Returns
+    -------
+    incorrect_parameters : list of str
+        Names of incorrect parameters
+    """
+    incorrect_parameters = []
+    if not os.path.isdir(parameter_values["project-directory"]):
+        incorrect_parameters.append("-p / --project-directory")
+    if not os.path.isfile(parameter_values["bed-file"]):
+        incorrect_parameters.append("-b / --bed-file")
+    if not os.path.isfile(parameter_values["samples-to-use"]):
+        incorrect_parameters.append("-s / --samples-to-use")
+    if not os.path.isfile(parameter_values["bed-slicer"]):
+        incorrect_parameters.append("-bs / --bed-slicer")
+    if parameter_values["venv"] is not None and not os.path.isdir(parameter_values["venv"]):
+        incorrect_parameters.append("-v / --venv")
+    return incorrect_parameters
+
+
+def link_populations(populationsamples, projectdir):
+    """Make the four population directories and link the BAM files, and their
+    index files if present, of each population into them.
+
+    Existing links are kept, so the linking can be repeated.
+
+    Parameters
+    ----------
+    populationsamples : dict
+        Paths to the BAM files of each population
+    projectdir : str
+        Path to the directory used for constructing the High Confident BED file
+
+    Returns
+    -------
+    links_made : bool
+        True if all population samples are linked, False if not
+    """
+    links_made = True
+    for population, popsamples in populationsamples.items():
+        popdir = f"{projectdir}{POPULATION_DIRS[population]}/"
+        os.makedirs(popdir, exist_ok=True)
+        for bamfile in popsamples:
+            for linksource in (bamfile, f"{bamfile}.bai", f"{bamfile[:-4]}.bai"):
+                if linksource != bamfile and not os.path.isfile(linksource):
+                    continue
+                linkloc = f"{popdir}{linksource.split('/')[-1]}"
+                try:
+                    if not os.path.lexists(linkloc):
+                        os.symlink(os.path.abspath(linksource), linkloc)
+                except OSError:
+                    print(f"Could not link {linksource} into {popdir}")
+                    links_made = False
+        print(f"Linked {len(popsamples)} {population} samples into {popdir}")
+    return links_made
+
+
+def make_stages(pipelineparams, projectdir):
+    """Make and return the stages of the High Confident BED file pipeline.
+
+    Each stage has the command to run, the output files that should exist
+    afterwards and the stages it depends on. The stages are in an order in
+    which they can be run.
+
+    Parameters
+    ----------
+    pipelineparams : dict
+        Set parameter values
+    projectdir : str
+        Path to the directory used for constructing the High Confident BED file
+
+    Returns
+    -------
+    hc_stages : dict
+        Command, output files and dependencies per stage name
+    """
+    script_dir = mhs.add_dir_slash(os.path.dirname(os.path.abspath(__file__)))
+    sliced_bed_file = mhs.get_sliced_bed_file(projectdir, pipelineparams["bed-file"])
+    hc_stages = {"slice": {"command": f"python {pipelineparams['bed-slicer']} -i {pipelineparams['bed-file']} -o {sliced_bed_file} -s {pipelineparams['slice-size']}",
+                           "outputs": [sliced_bed_file],
+                           "depends": []}}
+
+    depth_files = {}
+    for population, popdir in POPULATION_DIRS.items():
+        depth_files[population] = f"{projectdir}{popdir.replace('/', '_')}.depths.hdf5"
+        hc_stages[f"depths_{population}"] = {"command": f"python {script_dir}collect_depths.py -i {projectdir}{popdir} -b {sliced_bed_file} -o {depth_files[population]} "
+                                                        f"-w {pipelineparams['workers']} -t {pipelineparams['threads']} -q {pipelineparams['minimum-mapq']} -s {pipelineparams['sambamba']}",
+                                             "outputs": [depth_files[population]],
+                                             "depends": ["slice"]}
+
+    hc_bed_file = f"{projectdir}{pipelineparams['output-file']}"
+    hc_stages["statistics"] = {"command": f"python {script_dir}population_statistics.py -f1 {depth_files['F1']} -f2 {depth_files['F2']} "
+                                          f"-m1 {depth_files['M1']} -m2 {depth_files['M2']} -o {hc_bed_file} -s {projectdir}",
+                               "outputs": [hc_bed_file],
+                               "depends": [f"depths_{population}" for population in POPULATION_DIRS]}
+    return hc_stages
+
+
+def is_stage_complete(stagename, stage, pipelinedir):
+    """Return whether a stage completed, which is when its completion marker
+    and all of its output files exist."""
+    return os.path.isfile(f"{pipelinedir}{stagename}{DONE_SUFFIX}") and all([os.path.isfile(outfile) for outfile in stage["outputs"]])
+
+
+def get_completed_stages(hcstages, pipelinedir):
+    """Return the names of the stages that completed and do not need to run
+    again.
+
+    A completed stage is run again when a stage it depends on has to run
+    again, so its outputs are made from the new outputs of that stage.
+
+    Parameters
+    ----------
+    hcstages : dict
+        Command, output files and dependencies per stage name
+    pipelinedir : str
+        Directory with the completion markers
+
+    Returns
+    -------
+    completed_stages : set of str
+        Names of the completed stages
+    """
+    completed_stages = set()
+    for stagename, stage in hcstages.items():
+        if is_stage_complete(stagename, stage, pipelinedir) and all([depstage in completed_stages for depstage in stage["depends"]]):
+            completed_stages.add(stagename)
+            print(f"Stage {stagename} already completed")
+    return completed_stages
+
+
+def make_stage_script(stagename, stage, pipelinedir):
+    """Make and return the shell commands of a stage.
+
+    The completion marker is only written when the command succeeded and all
+    output files of the stage were written.
+
+    Returns
+    -------
+    str
+        Shell commands of the stage
+    """
+    output_checks = "".join([f"test -s {outfile}\n" for outfile in stage["outputs"]])
+    return f"set -e\nrm -f {pipelinedir}{stagename}{DONE_SUFFIX}\n{stage['command']}\n{output_checks}touch {pipelinedir}{stagename}{DONE_SUFFIX}\n"
+
+
+def run_local_stage(stagename, stage, pipelinedir):
+    """Run a single stage locally and write its output to a log file.
+
+    Returns
+    -------
+    int
+        Exit code of the stage
+    """
+    logfileloc = f"{pipelinedir}{stagename}.log"
+    try:
+        with open(logfileloc, "w") as logfile:
+            logfile.write(f"{stage['command']}\n\n")
+            logfile.flush()
+            completed = subprocess.run(make_stage_script(stagename, stage, pipelinedir), shell=True, executable="/bin/bash", stdout=logfile, stderr=subprocess.STDOUT)
+        return completed.returncode
+    except OSError:
+        print(f"Could not run stage or write log file {logfileloc}")
+        return -1
+
+
+def run_local_pipeline(hcstages, pipelinedir, parallelstages):
+    """Run the stages on this machine, each stage as soon as the stages it
+    depends on completed.
+
+    Stages without dependencies between them, such as the depth collection of
+    the four populations, run at the same time. Stages depending on a failed
+    stage are not run.
+
+    Parameters
+    ----------
+    hcstages : dict
+        Command, output files and dependencies per stage name
+    pipelinedir : str
+        Directory to write the stage logs and completion markers to
+    parallelstages : int
+        Maximum number of stages to run at the same time
+
+    Returns
+    -------
+    failed_stages : list of str
+        Names of the stages that failed or were not run
+    """
+    completed_stages = get_completed_stages(hcstages, pipelinedir)
+    waiting_stages = [stagename for stagename in hcstages if stagename not in completed_stages]
+    failed_stages = []
+
+    with ThreadPoolExecutor(max_workers=max(1, parallelstages)) as stage_executor:
+        running = {}
+        while len(waiting_stages) > 0 or len(running) > 0:
+            for stagename in list(waiting_stages):
+                if any([depstage in failed_stages for depstage in hcstages[stagename]["depends"]]):
+                    waiting_stages.remove(stagename)
+                    failed_stages.append(stagename)
+                    print(f"Stage {stagename} not run because a stage it depends on failed")
+                elif all([depstage in completed_stages for depstage in hcstages[stagename]["depends"]]):
+                    waiting_stages.remove(stagename)
+                    running[stage_executor.submit(run_local_stage, stagename, hcstages[stagename], pipelinedir)] = stagename
+                    print(f"Started stage {stagename}")
+            if len(running) == 0:
+                continue
+            finished_stages, not_finished = wait(running, return_when=FIRST_COMPLETED)
+            for future in finished_stages:
+                stagename = running.pop(future)
+                exitcode = future.result()
+                if exitcode == 0 and is_stage_complete(stagename, hcstages[stagename], pipelinedir):
+                    completed_stages.add(stagename)
+                    print(f"Stage {stagename} completed")
+                else:
+                    failed_stages.append(stagename)
+                    print(f"Stage {stagename} failed with exit code {exitcode}, see {pipelinedir}{stagename}.log")
+    return failed_stages
+
+
+def submit_sbatch_pipeline(hcstages, pipelinedir, pipelineparams):
+    """Write an sbatch script per stage and submit the stages that did not
+    complete yet, each depending on the submitted jobs of its stages.
+
+    The jobs run with a clean environment (--export=NONE), so the set
+    environment modules are loaded and the Python Virtual ENV is activated in
+    each job script before the stage commands.
+
+    Parameters
+    ----------
+    hcstages : dict
+        Command, output files and dependencies per stage name
+    pipelinedir : str
+        Directory to write the sbatch scripts, job output and completion markers to
+    pipelineparams : dict
+        Set parameter values
+
+    Returns
+    -------
+    job_ids : dict
+        Slurm job id per submitted stage, None for stages that could not be submitted
+    """
+    completed_stages = get_completed_stages(hcstages, pipelinedir)
+    job_ids = {}
+    for stagename, stage in hcstages.items():
+        if stagename in completed_stages:
+            continue
+        dep_job_ids = [job_ids[depstage] for depstage in stage["depends"] if depstage in job_ids]
+        if None in dep_job_ids:
+            job_ids[stagename] = None
+            print(f"Stage {stagename} not submitted because a stage it depends on was not submitted")
+            continue
+
+        scriptloc = f"{pipelinedir}{stagename}.sh"
+        module_loads = "".join([f"module load {module}\n" for module in pipelineparams["modules"]])
+        venv_activation = f"source {mhs.add_dir_slash(pipelineparams['venv'])}bin/activate\n" if pipelineparams["venv"] is not None else ""
+        stage_script = f"#!/bin/bash\n" \
+            f"#SBATCH --job-name=hc_{stagename}\n" \
+            f"#SBATCH --output={pipelinedir}{stagename}.out\n" \
+            f"#SBATCH --error={pipelinedir}{stagename}.err\n" \
+            f"#SBATCH --time={pipelineparams['job-time']}\n" \
+            f"#SBATCH --cpus-per-task={pipelineparams['workers'] * pipelineparams['threads'] if stagename.startswith('depths') else 1}\n" \
+            f"#SBATCH --mem={pipelineparams['job-mem']}\n" \
+            f"#SBATCH --nodes=1\n" \
+            f"#SBATCH --open-mode=append\n" \
+            f"#SBATCH --export=NONE\n" \
+            f"#SBATCH --get-user-env=L\n\n" \
+            f"{module_loads}{venv_activation}{make_stage_script(stagename, stage, pipelinedir)}"
+        if not mhs.write_script(scriptloc, stage_script):
+            job_ids[stagename] = None
+            continue
+
+        sbatch_command = ["sbatch", "--parsable"]
+        if len(dep_job_ids) > 0:
+            sbatch_command.append(f"--dependency=afterok:{':'.join(dep_job_ids)}")
+        try:
+            submitted = subprocess.run(sbatch_command + [scriptloc], stdout=subprocess.PIPE, stderr=subprocess.PIPE, universal_newlines=True)
+        except OSError:
+            print(f"Could not run sbatch to submit {scriptloc}")
+            job_ids[stagename] = None
+            continue
+        if submitted.returncode != 0:
+            print(f"Could not submit {scriptloc}: {submitted.stderr.strip()}")
+            job_ids[stagename] = None
+            continue
+        job_ids[stagename] = submitted.stdout.strip().split(";")[0]
+        print(f"Submitted stage {stagename} as job {job_ids[stagename]}")
+    return job_ids
+
+
+def main():
+    pipeline_params = get_parameter_values()
+    incorrectparameters = check_parameter_values(pipeline_params)
+    if len(incorrectparameters) > 0:
+        print(f"The following parameters are incorrect: {incorrectparameters}")
+        return
+
+    project_directory = mhs.add_dir_slash(os.path.abspath(pipeline_params["project-directory"]))
+    pipeline_directory = f"{project_directory}{PIPELINE_DIR}"
+    os.makedirs(pipeline_directory, exist_ok=True)
+    pipeline_params["bed-file"] = os.path.abspath(pipeline_params["bed-file"])
+    pipeline_params["bed-slicer"] = os.path.abspath(pipeline_params["bed-slicer"])
+
+    hc_population_samples = mhs.read_sample_list(pipeline_params["samples-to-use"])
+    hc_population_samples = mhs.check_populations(hc_population_samples, pipeline_params["minimum-samples"])
+    if len(hc_population_samples) != 4:
+        print("There were too few samples to use for the male and female populations")
+        return
+    if not link_populations(hc_population_samples, project_directory):
+        return
+
+    hc_stages = make_stages(pipeline_params, project_directory)
+    if pipeline_params["rerun"]:
+        for stagename in hc_stages:
+            if os.path.isfile(f"{pipeline_directory}{stagename}{DONE_SUFFIX}"):
+                os.remove(f"{pipeline_directory}{stagename}{DONE_SUFFIX}")
+
+    if pipeline_params["backend"] == "local":
+        failed_stages = run_local_pipeline(hc_stages, pipeline_directory, pipeline_params["parallel-stages"])
+        if len(failed_stages) == 0:
+            print(f"Made High Confident BED file {hc_stages['statistics']['outputs'][0]}")
+        else:
+            print(f"The following stages failed or were not run: {failed_stages}")
+    else:
+        job_ids = submit_sbatch_pipeline(hc_stages, pipeline_directory, pipeline_params)
+        print(f"Submitted {len([x for x in job_ids.values() if x is not None])} of {len(job_ids)} stages to run")
+
+
+if __name__ == "__main__":
+    main()
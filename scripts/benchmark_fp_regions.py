@@ -0,0 +1,108 @@
+#!/usr/bin/env python
+import argparse
+import random
+import time
+from collections import Counter
+
+from classes.fpoverlap import FpOverlap
+from classes.region import Region
+import generate_totals.fp_regions as gtfr
+
+
+def get_params():
+    """Define parameters, and collect and return the set values.
+
+    Returns
+    -------
+    dict
+        Parameters and their set values
+    """
+    benchmark_args = argparse.ArgumentParser()
+    benchmark_args.add_argument("-n", "--num-of-regions", type=int, dest="numofregions", default=100000, help="Number of synthetic False Positive regions to cluster")
+    benchmark_args.add_argument("-c", "--check-regions", type=int, dest="checkregions", default=2000, help="Number of regions to compare against the pairwise clustering")
+    benchmark_args.add_argument("-po", "--percent-overlap", type=int, dest="percentoverlap", default=50, help="Minimum required percentage overlap")
+    benchmark_args.add_argument("-s", "--seed", type=int, dest="seed", default=1, help="Seed for generating the synthetic regions")
+    return vars(benchmark_args.parse_args())
+
+
+def make_synthetic_regions(numofregions, seed):
+    """Make and return synthetic False Positive regions, with recurring
+    regions and regions around shared hotspots.
+
+    Parameters
+    ----------
+    numofregions : int
+        Number of regions to make
+    seed : int
+        Seed for the random generator
+
+    Returns
+    -------
+    fp_regions : list of Region
+        Synthetic False Positive regions
+    """
+    fp_rng = random.Random(seed)
+    chromosomes = [str(x) for x in range(1, 23)] + ["X", "Y"]
+    hotspots = [(fp_rng.choice(chromosomes), fp_rng.randint(1, 240000000)) for x in range(numofregions // 20)]
+    fp_regions = []
+    while len(fp_regions) < numofregions:
+        if fp_regions and fp_rng.random() < 0.1:
+            fp_regions.append(fp_rng.choice(fp_regions))
+            continue
+        chromname, hotspot = fp_rng.choice(hotspots)
+        startpos = max(1, hotspot + fp_rng.randint(-5000, 5000))
+        fp_regions.append(Region.from_positions(chromname, startpos, startpos + fp_rng.randint(100, 20000)))
+    return fp_regions
+
+
+def pairwise_similar_regions(dupregions, uniregions, min_req_overlap):
+    """Determine similar regions by comparing every unique region with every
+    duplicated and every other unique region."""
+    simfpregions = {}
+    for uregion in uniregions:
+        for dregion in dupregions:
+            perc_overlap = gtfr.get_overlap_percentage(uregion, dregion)
+            if perc_overlap is not None and perc_overlap >= min_req_overlap:
+                simfpregions.setdefault(uregion, FpOverlap(uregion)).add_overlap(dregion, perc_overlap)
+    for uregion in uniregions:
+        for ouregion in uniregions:
+            if ouregion in simfpregions and uregion in simfpregions[ouregion].overlaps:
+                continue
+            perc_overlap = gtfr.get_overlap_percentage(uregion, ouregion)
+            if perc_overlap is not None and perc_overlap >= min_req_overlap:
+                simfpregions.setdefault(uregion, FpOverlap(uregion)).add_overlap(ouregion, perc_overlap)
+    return simfpregions
+
+
+def similar_regions_as_list(simfpregions):
+    return [(simregion, list(simfpregions[simregion].overlaps.items())) for simregion in simfpregions]
+
+
+def cluster_regions(fp_regions, percoverlap, clusterer):
+    """Cluster regions with the provided clusterer and return the similar
+    regions and the runtime in seconds."""
+    fpregion_counts = dict(Counter(fp_regions))
+    dupfpregions = gtfr.get_duplicated_regions(fpregion_counts)
+    unifpregions = gtfr.get_unique_regions(fpregion_counts)
+    start_time = time.perf_counter()
+    simfpregions = clusterer(dupfpregions, unifpregions, percoverlap)
+    return simfpregions, time.perf_counter() - start_time
+
+
+def main():
+    benchmark_params = get_params()
+    percoverlap = benchmark_params["percentoverlap"]
+
+    check_regions = make_synthetic_regions(benchmark_params["checkregions"], benchmark_params["seed"])
+    sweep_similar, sweep_time = cluster_regions(check_regions, percoverlap, gtfr.determine_similar_regions)
+    pairwise_similar, pairwise_time = cluster_regions(check_regions, percoverlap, pairwise_similar_regions)
+    same_output = similar_regions_as_list(sweep_similar) == similar_regions_as_list(pairwise_similar)
+    print(f"{len(check_regions)} regions: sweep {sweep_time:.3f}s, pairwise {pairwise_time:.3f}s, identical output?: {same_output}")
+
+    fp_regions = make_synthetic_regions(benchmark_params["numofregions"], benchmark_params["seed"])
+    sweep_similar, sweep_time = cluster_regions(fp_regions, percoverlap, gtfr.determine_similar_regions)
+    print(f"{len(fp_regions)} regions: sweep {sweep_time:.3f}s, {len(sweep_similar)} regions with similar regions")
+
+
+if __name__ == "__main__":
+    main()
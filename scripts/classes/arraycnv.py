@@ -1,5 +1,8 @@
 #!/usr/bin/env python
-class ArrayCnv:
+from classes.exon import ExonGeneNames
+
+
+class ArrayCnv(ExonGeneNames):
     def __init__(self, samplename, chrom, startpos, endpos, cnvcall, cnvsize, numprobes, numgenes, cnvclass):
         self.cnv_sample = samplename
         self.cnv_chrom = chrom
@@ -27,12 +30,6 @@ class ArrayCnv:
     def num_of_exons(self):
         return len(self.exons)
 
-    def get_gene_names(self):
-        genelist = []
-        for exon in self.exons:
-            genelist.extend(exon.get_gene_names())
-        return list(set(genelist))
-
     def segment_overlap(self, startpos, endpos):
         return self.cnv_start <= endpos and startpos <= self.cnv_end
     
@@ -1,5 +1,8 @@
 #!/usr/bin/env python
-class Cnv:
+from classes.exon import ExonGeneNames
+
+
+class Cnv(ExonGeneNames):
     def __init__(self, samplename, samplepseudo, chrom, startpos, endpos, npcr, mlcr, call):
         self.cnv_sample = samplename
         self.cnv_sample_pseudo = samplepseudo
@@ -50,12 +53,6 @@ class Cnv:
         """
         return len(self.exons)
 
-    def get_gene_names(self):
-        genelist = []
-        for exon in self.exons:
-            genelist.extend(exon.get_gene_names())
-        return list(set(genelist))
-
     def segment_overlap(self, startpos, endpos):
         return self.cnv_start <= endpos and startpos <= self.cnv_end
 
@@ -1,5 +1,8 @@
 #!/usr/bin/env python
-class ConiferCall:
+from classes.exon import ExonGeneNames
+
+
+class ConiferCall(ExonGeneNames):
     def __init__(self, samplepseudo, samplename, cnvchrom, cnvstart, cnvend, callresult):
         self.cnv_sample = samplename
         self.cnv_sample_pseudo = samplepseudo
@@ -54,12 +57,5 @@ class ConiferCall:
         overlap_perc = (overlap_size / acnvlength) * 100
         return round(overlap_perc, 3)
 
-
-    def get_gene_names(self):
-        genelist = []
-        for exon in self.exons:
-            genelist.extend(exon.get_gene_names())
-        return list(set(genelist))
-
     def __str__(self):
         return f"{self.cnv_sample}\t{self.cnv_chrom}\t{self.cnv_start}\t{self.cnv_end}"
@@ -1,5 +1,8 @@
 #!/usr/bin/env python
-class ExomeDepthCall:
+from classes.exon import ExonGeneNames
+
+
+class ExomeDepthCall(ExonGeneNames):
     def __init__(self, samplename, pseudosample, cnvstartp, cnvendp, cnvcall, cnvexonnum, cnvstart, cnvend, cnvchrom, cnvid, cnvbf, cnvreadexp, cnvreadobs, cnvreadratio, cnvconrad):
         self.cnv_sample = samplename
         self.cnv_sample_pseudo = pseudosample
@@ -56,12 +59,5 @@ class ExomeDepthCall:
         overlap_perc = (overlap_size / acnvlength) * 100
         return round(overlap_perc, 3)
 
-
-    def get_gene_names(self):
-        genelist = []
-        for exon in self.exons:
-            genelist.extend(exon.get_gene_names())
-        return list(set(genelist))
-
     def __str__(self):
         return f"{self.startp}\t{self.endp}\t{self.call_type}\t{self.num_exons}\t{self.startpos}\t{self.endpos}\t{self.chrom}\t{self.identifier}\t{self.bf}\t{self.reads_expected}\t{self.reads_observed}\t{self.reads_ratio}\t{self.conrad_hg19}"
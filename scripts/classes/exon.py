@@ -1,16 +1,66 @@
 #!/usr/bin/env python
+import sys
+
+
 class Exon:
     def __init__(self, chrom, startpos, endpos, genename):
         self.exon_chrom = chrom
         self.exon_start = startpos
         self.exon_end = endpos
         self.gene_name = genename
+        # Gene names are interned so equal names of different exons share one string.
+        self.gene_names = tuple([sys.intern(x) for x in genename.split(":")])
 
     def get_length(self):
         return abs(self.exon_end - self.exon_start)
 
     def get_gene_names(self):
-        return self.gene_name.split(":")
+        return self.gene_names
 
     def __str__(self):
         return f"{self.exon_chrom}\t{self.exon_start}\t{self.exon_end}\t{self.gene_name}"
+
+
+def collect_gene_names(exons):
+    """Collect and return the distinct gene names of exons.
+
+    Parameters
+    ----------
+    exons : list of Exon
+        Exons to collect the gene names of
+
+    Returns
+    -------
+    tuple of str
+        Distinct gene names
+    """
+    return tuple(set([genename for exon in exons for genename in exon.get_gene_names()]))
+
+
+class ExonGeneNames:
+    """Mixin for CNV classes with overlapping exons. Provides the exons and
+    the memoized distinct gene names of these exons."""
+    @property
+    def exons(self):
+        return self._exons
+
+    @exons.setter
+    def exons(self, cnvexons):
+        # The exons are stored as a tuple, so they can only change here and the cached gene names stay valid.
+        self._exons = tuple(cnvexons)
+        self._gene_names = None
+
+    def get_gene_names(self):
+        """Return the distinct gene names of the exons overlapping with the CNV.
+
+        The gene names are collected once, and again after new exons have
+        been set.
+
+        Returns
+        -------
+        tuple of str
+            Distinct gene names
+        """
+        if self._gene_names is None:
+            self._gene_names = collect_gene_names(self._exons)
+        return self._gene_names
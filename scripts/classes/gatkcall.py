@@ -1,4 +1,7 @@
 #!/usr/bin/env python
+from classes.region import Region
+
+
 class GatkCall:
     def __init__(self, samplename, gchrom, gstart, gend, gcall, gsize, acnv, gcallres, gclass, nexon, nprobe, genenames, callline):
         self.samplename = samplename
@@ -51,3 +54,6 @@ class GatkCall:
 
     def get_region_str(self):
         return f"{self.chrom}:{self.startpos}-{self.endpos}"
+
+    def get_region(self):
+        return Region.from_positions(self.chrom, self.startpos, self.endpos)
@@ -0,0 +1,63 @@
+#!/usr/bin/env python
+from collections import namedtuple
+
+
+# Chromosome names are interned to small integer ids shared by all regions.
+CHROM_IDS = {}
+CHROM_NAMES = []
+
+
+def get_chrom_id(chromname):
+    """Return the interned id of a chromosome name.
+
+    Parameters
+    ----------
+    chromname : str
+        Chromosome name
+
+    Returns
+    -------
+    int
+        Chromosome id
+    """
+    chrom_id = CHROM_IDS.get(chromname)
+    if chrom_id is None:
+        chrom_id = len(CHROM_NAMES)
+        CHROM_IDS[chromname] = chrom_id
+        CHROM_NAMES.append(chromname)
+    return chrom_id
+
+
+class Region(namedtuple("Region", ["chrom_id", "start", "end"])):
+    """Genomic region with an interned chromosome id and integer positions.
+
+    Regions are hashable and compare equal when chromosome, start and end
+    are equal. Converting a region to a string gives the 'chr:start-end'
+    notation used in the classification files.
+    """
+    __slots__ = ()
+
+    @classmethod
+    def from_str(cls, regionstr):
+        """Parse and return a region from a 'chr:start-end' string."""
+        chromname, positions = regionstr.replace(",", "").split(":")
+        startpos, endpos = positions.split("-")
+        return cls(get_chrom_id(chromname), int(startpos), int(endpos))
+
+    @classmethod
+    def from_positions(cls, chromname, startpos, endpos):
+        """Make and return a region from a chromosome name and positions."""
+        return cls(get_chrom_id(chromname), int(startpos), int(endpos))
+
+    @property
+    def chrom(self):
+        return CHROM_NAMES[self.chrom_id]
+
+    def overlaps(self, other_region):
+        return self.chrom_id == other_region.chrom_id and self.start <= other_region.end and other_region.start <= self.end
+
+    def __str__(self):
+        return f"{CHROM_NAMES[self.chrom_id]}:{self.start}-{self.end}"
+
+    def __repr__(self):
+        return f"Region({self})"
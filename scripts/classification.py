@@ -12,6 +12,7 @@ from classes.exomedepthcall import ExomeDepthCall
 
 # Import classification scripts
 import classification.classification as clcl
+import classification.threshold_sweep as clts
 #import classification.conifer as clfc
 #import classification.exomedepth as clfed
 #import classification.gatk as clfg
@@ -82,7 +83,9 @@ def main():
 
         if len(sample_data) > 0 and len(probe_data) > 0 and len(exon_data) > 0 and len(array_data) > 0:
             # GATK4 CNV CLASSIFCATION
-            if cmd_argvalues["tool"].upper() == "GATK":
+            if cmd_argvalues["tool"].upper() == "GATK" and cmd_argvalues["sweep"]:
+                print("...GATK4 CNVs are classified with fixed thresholds and can not be swept...")
+            elif cmd_argvalues["tool"].upper() == "GATK":
                 print("...Start combining GATK4 .called.seg files...")
                 gatk4_cnv_data = gatk4_combine_seg_files(cmd_argvalues["indir"], sample_data, probe_data, exon_data, "")
                 print(f"...Read GATK4 CNV data for {len(gatk4_cnv_data)} samples")
@@ -106,16 +109,19 @@ def main():
                 conifer_data = read_conifer_data(cmd_argvalues["infile"], sample_data, exon_data, probe_data)
                 print(f"...Read Conifer CNV data for {len(conifer_data)} samples...")
 
-                print("...Evaluating Conifer CNVs...")
-                # conifer_evaluate(conifer_data, array_data, cmd_argvalues["numofexons"], cmd_argvalues["numofprobes"], cmd_argvalues["percentoverlap"], CONIFER_CALL_TRANSLATIONS)
-                evaluate_cnv_calls(conifer_data, array_data, cmd_argvalues["numofexons"], cmd_argvalues["numofprobes"], cmd_argvalues["percentoverlap"], CONIFER_CALL_TRANSLATIONS)
+                if cmd_argvalues["sweep"]:
+                    run_threshold_sweep(conifer_data, array_data, cmd_argvalues)
+                else:
+                    print("...Evaluating Conifer CNVs...")
+                    # conifer_evaluate(conifer_data, array_data, cmd_argvalues["numofexons"], cmd_argvalues["numofprobes"], cmd_argvalues["percentoverlap"], CONIFER_CALL_TRANSLATIONS)
+                    evaluate_cnv_calls(conifer_data, array_data, cmd_argvalues["numofexons"], cmd_argvalues["numofprobes"], cmd_argvalues["percentoverlap"], CONIFER_CALL_TRANSLATIONS)
 
-                print("...Classifying leftover array CNVs...")
-                array_classify_leftovers(array_data)
+                    print("...Classifying leftover array CNVs...")
+                    array_classify_leftovers(array_data)
 
-                print("...Writing all Conifer classifications to file...")
-                file_written = write_cnv_classifications(conifer_data, cmd_argvalues["output"], cmd_argvalues["filterneutrals"], cmd_argvalues["cnvsize"], CONIFER_CALL_TRANSLATIONS, "Conifer")
-                print(f"...Output file written?: {file_written}...")
+                    print("...Writing all Conifer classifications to file...")
+                    file_written = write_cnv_classifications(conifer_data, cmd_argvalues["output"], cmd_argvalues["filterneutrals"], cmd_argvalues["cnvsize"], CONIFER_CALL_TRANSLATIONS, "Conifer")
+                    print(f"...Output file written?: {file_written}...")
 
             # EXOMEDEPTH CNV CLASSIFICATION
             if cmd_argvalues["tool"] == "exomedepth":
@@ -123,18 +129,50 @@ def main():
                 exomedepth_data = read_combined_exomedepth_data(cmd_argvalues["infile"], sample_data, exon_data, probe_data)
                 print(f"...Read ExomeDepth CNV data for {len(exomedepth_data)} samples...")
 
-                print("...Evaluating ExomeDepth CNVs...")
-                evaluate_cnv_calls(exomedepth_data, array_data, cmd_argvalues["numofexons"], cmd_argvalues["numofprobes"], cmd_argvalues["percentoverlap"], EXOMEDEPTH_CALL_TRANSLATIONS)
+                if cmd_argvalues["sweep"]:
+                    run_threshold_sweep(exomedepth_data, array_data, cmd_argvalues)
+                else:
+                    print("...Evaluating ExomeDepth CNVs...")
+                    evaluate_cnv_calls(exomedepth_data, array_data, cmd_argvalues["numofexons"], cmd_argvalues["numofprobes"], cmd_argvalues["percentoverlap"], EXOMEDEPTH_CALL_TRANSLATIONS)
 
-                print("...Classifying leftover array CNVs...")
-                array_classify_leftovers(array_data)
+                    print("...Classifying leftover array CNVs...")
+                    array_classify_leftovers(array_data)
 
-                print("...Writing all ExomeDepth classifications to file...")
-                file_written = write_cnv_classifications(exomedepth_data, cmd_argvalues["output"], cmd_argvalues["filterneutrals"], cmd_argvalues["cnvsize"], EXOMEDEPTH_CALL_TRANSLATIONS, "ExomeDepth")
-                print(f"...Outout file written?: {file_written}...")
+                    print("...Writing all ExomeDepth classifications to file...")
+                    file_written = write_cnv_classifications(exomedepth_data, cmd_argvalues["output"], cmd_argvalues["filterneutrals"], cmd_argvalues["cnvsize"], EXOMEDEPTH_CALL_TRANSLATIONS, "ExomeDepth")
+                    print(f"...Outout file written?: {file_written}...")
             print("DONE!")
 
 
+def run_threshold_sweep(tool_cnvs, array_data, cmd_argvalues):
+    """Evaluate a grid of classification thresholds and write the results.
+
+    Thresholds without sweep values are evaluated at their normal value.
+
+    Parameters
+    ----------
+    tool_cnvs : dict
+        Conifer or ExomeDepth CNV calls with added exons and probes per sample
+    array_data : dict
+        Array CNV data
+    cmd_argvalues : dict
+        Command line parameter values
+    """
+    print("...Determining the CNV call features...")
+    call_features, num_of_arraycnvs = clts.get_call_features(tool_cnvs, array_data, cmd_argvalues["filterneutrals"])
+
+    cnvsizes = cmd_argvalues["sweepsize"] or [cmd_argvalues["cnvsize"] or 0]
+    percentoverlaps = cmd_argvalues["sweepoverlap"] or [cmd_argvalues["percentoverlap"]]
+    numofexons = cmd_argvalues["sweepexons"] or [cmd_argvalues["numofexons"]]
+    numofprobes = cmd_argvalues["sweepprobes"] or [cmd_argvalues["numofprobes"]]
+    print(f"...Evaluating {len(cnvsizes) * len(percentoverlaps) * len(numofexons) * len(numofprobes)} threshold combinations for {len(call_features)} CNV calls...")
+    sweep_results = clts.evaluate_threshold_grid(call_features, num_of_arraycnvs, cnvsizes, percentoverlaps, numofexons, numofprobes)
+
+    print("...Writing the threshold sweep results to file...")
+    file_written = ufw.write_threshold_sweep(cmd_argvalues["output"], clts.SWEEP_HEADER, sweep_results)
+    print(f"...Output file written?: {file_written}...")
+
+
 def read_array_cnvs(arrayfileloc, exondata):
     """Read the array CNV data.
 
@@ -483,57 +521,64 @@ def write_cnv_results_2(gatkcnvdata, outfileloc, filterneutrals, mincnvsize):
     gatk_call_translations["0"] = "Neutral"
 
     try:
-        with open(outfileloc, 'w') as outfile:
-            outfile.write("Sample\tGATK4_CNV\tGATK4_Call\tGATK4_Size\tArray_CNV\tArray_Call\tArray_Size\tHangover_L\tHangover_R\tCall_Result\tClassification\t#_Exons\t#_Probes\tGATK4_genes\tArray_genes\tGATK4_UGenes\tArray_UGenes\n")
-            for samplename in gatkcnvdata:
-                for gatkcnv in gatkcnvdata[samplename]:
-                    write_line = True
+        ufw.write_file_lines(outfileloc, "Sample\tGATK4_CNV\tGATK4_Call\tGATK4_Size\tArray_CNV\tArray_Call\tArray_Size\tHangover_L\tHangover_R\tCall_Result\tClassification\t#_Exons\t#_Probes\tGATK4_genes\tArray_genes\tGATK4_UGenes\tArray_UGenes\n",
+                             make_classification_lines(gatkcnvdata, filterneutrals, mincnvsize, gatk_call_translations))
+    except IOError:
+        print(f"Could not write to output file: {outfileloc}")
 
-                    # Make default values so writing to output file always works.
-                    array_region = "NA"
-                    array_call = "NA"
-                    array_size = "NA"
-                    array_genes = "NA"
-                    array_gene_names = "NA"
-                    array_ugene_names = "NA"
-                    left_hangover = "NA"
-                    right_hangover = "NA"
-                    gatk_genes = gatkcnv.get_gene_names()
-                    gatk_gene_names = ":".join(gatk_genes)
-                    gatk_ugene_names = gatk_gene_names
 
-                    # Replace the default values if there is an array CNV call for the GATK4 CNV.
-                    if gatkcnv.array_cnv is not None:
-                        array_region = gatkcnv.array_cnv.get_region()
-                        array_call = gatkcnv.array_cnv.cnv_call
-                        array_size = gatkcnv.array_cnv.get_length()
-                        array_genes = gatkcnv.array_cnv.get_gene_names()
-                        array_gene_names = ":".join(array_genes)
-                        left_hangover = gatkcnv.left_hangover
-                        right_hangover = gatkcnv.right_hangover
+def make_classification_lines(cnvdata, filterneutrals, mincnvsize, calltranslationtable):
+    """Make and yield the output file lines of classified CNV calls.
 
-                    # Determine unique gatk and array gene names
-                    if array_genes != "NA":
-                        gatk_ugene_names = ":".join(determine_unique_genes(gatk_genes, array_genes))
-                        array_ugene_names = ":".join(determine_unique_genes(array_genes, gatk_genes))
-
-                    # Check whether to filter out neutral GATK4 CNVs
-                    if filterneutrals and gatkcnv.cnv_call == '0':
-                        write_line = False
-
-                    # Check whether to filter out GATK4 CNVs smaller than a certain size
-                    if mincnvsize is not None:
-                        if gatkcnv.get_length() < mincnvsize:
-                            write_line = False
-
-                    # Check whether to write to the output file
-                    if write_line:
-                        outfile.write(f"{samplename}\t{gatkcnv.get_region()}\t{gatk_call_translations[gatkcnv.cnv_call]}\t{gatkcnv.get_length()}\t"
-                                      f"{array_region}\t{array_call}\t{array_size}\t{left_hangover}\t{right_hangover}\t"
-                                      f"{gatkcnv.call_result}\t{gatkcnv.classification[0]}\t{gatkcnv.classification[1]}\t"
-                                      f"{gatkcnv.classification[2]}\t{gatk_gene_names}\t{array_gene_names}\t{gatk_ugene_names}\t{array_ugene_names}\n")
-    except IOError:
-        print(f"Could not write to output file: {outfileloc}")
+    CNV calls that are filtered out are skipped before their gene names are
+    determined.
+
+    Parameters
+    ----------
+    cnvdata : dict
+        Classified GATK4, Conifer or ExomeDepth CNV calls per sample
+    filterneutrals : bool
+        Whether to filter out neutral CNV calls
+    mincnvsize : int
+        Minimal required CNV size
+    calltranslationtable : dict
+        Table to translate tool CNV calls to array CNV calls
+
+    Yields
+    ------
+    str
+        Output file line of a classified CNV call
+    """
+    for samplename in cnvdata:
+        for toolcnv in cnvdata[samplename]:
+            # Check whether to filter out neutral CNV calls or CNV calls smaller than a certain size
+            if filterneutrals and toolcnv.cnv_call == '0':
+                continue
+            if mincnvsize is not None and toolcnv.get_length() < mincnvsize:
+                continue
+
+            # Make default values so writing to output file always works.
+            array_fields = "NA\tNA\tNA"
+            hangover_fields = "NA\tNA"
+            tool_genes = toolcnv.get_gene_names()
+            tool_gene_names = ":".join(tool_genes)
+            array_gene_field = "NA"
+            tool_ugene_names = tool_gene_names
+            array_ugene_names = "NA"
+
+            # Replace the default values if there is an array CNV call for the tool CNV.
+            if toolcnv.array_cnv:
+                arraycnv = toolcnv.array_cnv
+                array_genes = arraycnv.get_gene_names()
+                array_fields = f"{arraycnv.get_region()}\t{arraycnv.cnv_call}\t{arraycnv.get_length()}"
+                hangover_fields = f"{toolcnv.left_hangover}\t{toolcnv.right_hangover}"
+                array_gene_field = ":".join(array_genes)
+                tool_ugene_names = ":".join(determine_unique_genes(tool_genes, array_genes))
+                array_ugene_names = ":".join(determine_unique_genes(array_genes, tool_genes))
+
+            yield (f"{samplename}\t{toolcnv.get_region()}\t{calltranslationtable[toolcnv.cnv_call]}\t{toolcnv.get_length()}\t"
+                   f"{array_fields}\t{hangover_fields}\t{toolcnv.call_result}\t{toolcnv.classification[0]}\t{toolcnv.classification[1]}\t"
+                   f"{toolcnv.classification[2]}\t{tool_gene_names}\t{array_gene_field}\t{tool_ugene_names}\t{array_ugene_names}\n")
 
 
 def write_array_leftovers(arraycnvdata, outfileloc):
@@ -599,6 +644,7 @@ def determine_unique_genes(genelist1, genelist2):
             return []
         else:
             return genelist1
+    genelist2 = set(genelist2)
     return [genename for genename in genelist1 if genename not in genelist2]
 
 
@@ -860,54 +906,8 @@ def write_cnv_classifications(toolcnvdata, outfileloc, filterneutrals, mincnvsiz
     """
     wrote_file = False
     try:
-        with open(outfileloc, 'w') as outfile:
-            outfile.write(f"Sample\t{toolname}_CNV\t{toolname}_Call\t{toolname}_Size\tArray_CNV\tArray_Call\tArray_Size\tHangover_L\tHangover_R\tCall_Result\tClassification\t#_Exons\t#_Probes\t{toolname}_genes\tArray_genes\t{toolname}_UGenes\tArray_UGenes\n")
-            for samplename in toolcnvdata:
-                for toolcnv in toolcnvdata[samplename]:
-                    write_line = True
-
-                    # Make default values so writing to output file always works.
-                    array_region = "NA"
-                    array_call = "NA"
-                    array_size = "NA"
-                    array_genes = "NA"
-                    array_gene_names = "NA"
-                    array_ugene_names = "NA"
-                    left_hangover = "NA"
-                    right_hangover = "NA"
-                    tool_genes = toolcnv.get_gene_names()
-                    tool_gene_names = ":".join(tool_genes)
-                    tool_ugene_names = tool_gene_names
-
-                    # Replace the default values if there is an array CNV call for the tool CNV.
-                    if toolcnv.array_cnv:
-                        array_region = toolcnv.array_cnv.get_region()
-                        array_call = toolcnv.array_cnv.cnv_call
-                        array_size = toolcnv.array_cnv.get_length()
-                        array_genes = toolcnv.array_cnv.get_gene_names()
-                        array_gene_names = ":".join(array_genes)
-                        left_hangover = toolcnv.left_hangover
-                        right_hangover = toolcnv.right_hangover
-                    
-                    # Determine unique gatk and array gene names
-                    if array_genes != "NA":
-                        tool_ugene_names = ":".join(determine_unique_genes(tool_genes, array_genes))
-                        array_ugene_names = ":".join(determine_unique_genes(array_genes, tool_genes))
-
-                    # Check whether to filter out neutral GATK4 CNVs
-                    if filterneutrals and toolcnv.cnv_call == '0':
-                        write_line = False
-
-                    # Check whether to filter out GATK4 CNVs smaller than a certain size
-                    if mincnvsize is not None:
-                        if toolcnv.get_length() < mincnvsize:
-                            write_line = False
-
-                    if write_line:
-                        outfile.write(f"{samplename}\t{toolcnv.get_region()}\t{calltranslationtable[toolcnv.cnv_call]}\t{toolcnv.get_length()}\t"
-                                      f"{array_region}\t{array_call}\t{array_size}\t{left_hangover}\t{right_hangover}\t"
-                                      f"{toolcnv.call_result}\t{toolcnv.classification[0]}\t{toolcnv.classification[1]}\t"
-                                      f"{toolcnv.classification[2]}\t{tool_gene_names}\t{array_gene_names}\t{tool_ugene_names}\t{array_ugene_names}\n")
+        ufw.write_file_lines(outfileloc, f"Sample\t{toolname}_CNV\t{toolname}_Call\t{toolname}_Size\tArray_CNV\tArray_Call\tArray_Size\tHangover_L\tHangover_R\tCall_Result\tClassification\t#_Exons\t#_Probes\t{toolname}_genes\tArray_genes\t{toolname}_UGenes\tArray_UGenes\n",
+                             make_classification_lines(toolcnvdata, filterneutrals, mincnvsize, calltranslationtable))
         wrote_file = True
     except IOError:
         print(f"Could not write {toolname} CNV classification results to {outfileloc}")
@@ -0,0 +1,135 @@
+#!/usr/bin/env python
+from collections import Counter
+from itertools import product
+
+
+SWEEP_HEADER = ["CNV_Size", "Percent_Overlap", "Number_of_Exons", "Number_of_Probes", "Total_Calls",
+                "True Positive", "False Positive", "Array Non-Informative", "WES Non-Informative", "Array & WES Non-Informative", "Not Classified",
+                "Found_Array_CNVs", "Array_CNVs", "Sensitivity", "Precision"]
+
+
+def get_call_features(tool_cnvs, array_cnvs, filterneutrals):
+    """Determine and return the threshold independent features of all CNV
+    calls.
+
+    The overlap percentages with the array CNVs and the numbers of exons and
+    probes are determined once, so any combination of thresholds can be
+    evaluated without classifying the CNV calls again. As with classify_cnv,
+    calls of samples without array CNVs are not classified. Their array
+    overlaps are None.
+
+    Parameters
+    ----------
+    tool_cnvs : dict
+        Conifer or ExomeDepth CNV calls with added exons and probes per sample
+    array_cnvs : dict
+        Array CNV calls per sample
+    filterneutrals : bool
+        Whether to leave out neutral CNV calls
+
+    Returns
+    -------
+    call_features : list of tuple
+        Number of exons, number of probes, size and the overlapping array CNVs with their percentage overlap per CNV call
+    num_of_arraycnvs : int
+        Number of array CNVs of all samples
+    """
+    call_features = []
+    num_of_arraycnvs = sum([len(arraysamplecnvs) for arraysamplecnvs in array_cnvs.values()])
+    for samplepseudo in tool_cnvs:
+        arraysamplecnvs = array_cnvs.get(samplepseudo, [])
+        for toolcnv in tool_cnvs[samplepseudo]:
+            if filterneutrals and toolcnv.cnv_call == '0':
+                continue
+            array_overlaps = None
+            if len(arraysamplecnvs) > 0:
+                array_overlaps = [(f"{samplepseudo}:{arraycnv.get_region()}", toolcnv.get_percent_overlap(arraycnv.cnv_start, arraycnv.cnv_end))
+                                  for arraycnv in arraysamplecnvs if toolcnv.cnv_chrom == arraycnv.cnv_chrom and toolcnv.cnv_overlap(arraycnv)]
+            call_features.append((len(toolcnv.exons), len(toolcnv.probes), toolcnv.get_length(), array_overlaps))
+    return call_features, num_of_arraycnvs
+
+
+def evaluate_threshold_grid(callfeatures, numofarraycnvs, cnvsizes, percentoverlaps, numofexons, numofprobes):
+    """Classify the CNV calls for every combination of thresholds and return
+    the classification totals, sensitivity and precision per combination.
+
+    The size and percentage overlap thresholds determine which calls are
+    evaluated and which are True Positives. The remaining calls are counted
+    per distinct number of exons and probes, so the exon and probe thresholds
+    only need to be applied to these counts. Calls without array overlaps
+    (None) are counted as Not Classified.
+
+    Parameters
+    ----------
+    callfeatures : list of tuple
+        Threshold independent features per CNV call
+    numofarraycnvs : int
+        Number of array CNVs of all samples
+    cnvsizes : list of int
+        Minimum required CNV sizes
+    percentoverlaps : list of int
+        Minimum required percentages overlap with an array CNV to be True Positive
+    numofexons : list of int
+        Minimum required numbers of exons to be WES Informative
+    numofprobes : list of int
+        Minimum required numbers of probes to be Array Informative
+
+    Returns
+    -------
+    sweep_results : list of list
+        Thresholds, classification totals, sensitivity and precision per combination, in SWEEP_HEADER order
+    """
+    sweep_results = []
+    for cnvsize, percoverlap in product(cnvsizes, percentoverlaps):
+        size_features = [callfeature for callfeature in callfeatures if callfeature[2] >= cnvsize]
+        found_arraycnvs = set()
+        num_of_tps = 0
+        num_not_classified = 0
+        exonprobe_counts = Counter()
+        for numexons, numprobes, cnvlength, arrayoverlaps in size_features:
+            if arrayoverlaps is None:
+                num_not_classified += 1
+                continue
+            tp_arraycnvs = [acnvkey for acnvkey, acnvoverlap in arrayoverlaps if acnvoverlap >= percoverlap]
+            if len(tp_arraycnvs) > 0:
+                num_of_tps += 1
+                found_arraycnvs.update(tp_arraycnvs)
+            else:
+                exonprobe_counts[(numexons, numprobes)] += 1
+
+        for minexons, minprobes in product(numofexons, numofprobes):
+            label_counts = {"False Positive": 0, "Array Non-Informative": 0, "WES Non-Informative": 0, "Array & WES Non-Informative": 0}
+            for (numexons, numprobes), numofcalls in exonprobe_counts.items():
+                label_counts[get_non_tp_label(numexons >= minexons, numprobes >= minprobes)] += numofcalls
+            sensitivity = round(len(found_arraycnvs) / numofarraycnvs, 4) if numofarraycnvs > 0 else "NA"
+            precision = round(num_of_tps / (num_of_tps + label_counts["False Positive"]), 4) if num_of_tps + label_counts["False Positive"] > 0 else "NA"
+            sweep_results.append([cnvsize, percoverlap, minexons, minprobes, len(size_features),
+                                  num_of_tps, label_counts["False Positive"], label_counts["Array Non-Informative"],
+                                  label_counts["WES Non-Informative"], label_counts["Array & WES Non-Informative"], num_not_classified,
+                                  len(found_arraycnvs), numofarraycnvs, sensitivity, precision])
+    return sweep_results
+
+
+def get_non_tp_label(wesinformative, arrayinformative):
+    """Determine and return the classification label of a CNV call that is
+    not a True Positive.
+
+    Parameters
+    ----------
+    wesinformative : bool
+        Whether the CNV call has the minimum required number of exons
+    arrayinformative : bool
+        Whether the CNV call has the minimum required number of probes
+
+    Returns
+    -------
+    str
+        Classification label
+    """
+    if wesinformative and arrayinformative:
+        return "False Positive"
+    if wesinformative:
+        return "Array Non-Informative"
+    if arrayinformative:
+        return "WES Non-Informative"
+    return "Array & WES Non-Informative"
@@ -21,7 +21,7 @@ def get_params():
 
 
 def get_call_regions(classificationdata):
-    """Return all calls as regions strings per sample
+    """Return all calls as regions per sample
 
     Parameters
     ----------
@@ -31,19 +31,27 @@ def get_call_regions(classificationdata):
     Returns
     -------
     classification_regions : dict
-        Classified calls as strings per sample
+        Classified calls as Region per sample
     """
     classification_regions = {}
     for samplename in classificationdata:
         for cnvcall in classificationdata[samplename]:
             if samplename not in classification_regions:
                 classification_regions[samplename] = []
-            classification_regions[samplename].append(cnvcall.get_region_str())
+            classification_regions[samplename].append(cnvcall.get_region())
     return classification_regions
 
 
-def get_shared_calls(normaldata, highconfidentdata):
-    """Determine calls that are exactly the same for normal and HC bed file.
+def get_dualbed_labels(normaldata, highconfidentdata, percoverlap):
+    """Determine and return the dualBED label of each normal and High
+    Confident CNV call.
+
+    Calls present in both BED files are labelled Shared. The normal and High
+    Confident calls of each sample and chromosome are merged in order of
+    starting position and swept in a single pass. Each normal call that is
+    not shared is labelled Overlapping together with the High Confident calls
+    it overlaps for at least the minimal percentage. The remaining calls are
+    labelled Unique.
 
     Parameters
     ----------
@@ -51,81 +59,74 @@ def get_shared_calls(normaldata, highconfidentdata):
         Normal CNV calls as regions per sample
     highconfidentdata : dict
         High Confident CNV calls as regions per sample
-    """
-    shared_calls = {}
-    for samplename in set(normaldata.keys()) & set(highconfidentdata.keys()):
-        shared_sample_calls = set(normaldata[samplename]) & set(highconfidentdata[samplename])
-        if len(shared_sample_calls) > 0:
-            shared_calls[samplename] = shared_sample_calls
-    return shared_calls
-
-
-def get_overlapping_calls(normaldata, highconfidentdata, sharedcalls, percoverlap):
-    """Deterine calls in the normal and HC bed file that overlap.
-
-    Parameters
-    ----------
-    normaldata : dict
-    highconfidentdata : dict
-    sharedcalls : dict
-        Shared calls between normal and HC
+    percoverlap : int
+        Minimal percentage overlap required to be considered overlapping
 
     Returns
     -------
-    overlapping_calls : dict
-        Overlapping calls between normal and HC per sample
+    dualbed_labels : dict
+        dualBED labels per region per sample for both normal and High Confident
     """
-    overlapping_calls = {}
-    for samplename in set(normaldata.keys()) & set(highconfidentdata.keys()):
-        for cnvcall in normaldata[samplename]:
-            if samplename not in sharedcalls:
-                overlapregions = regions_overlap(cnvcall, highconfidentdata[samplename], percoverlap)
-                if len(overlapregions) > 0:
-                    if samplename not in overlapping_calls:
-                        overlapping_calls[samplename] = []
-                    overlapping_calls[samplename].extend(overlapregions)
-            else:
-                if cnvcall not in sharedcalls[samplename]:
-                    overlapregions = regions_overlap(cnvcall, highconfidentdata[samplename], percoverlap)
-                    if len(overlapregions) > 0:
-                        if samplename not in overlapping_calls:
-                            overlapping_calls[samplename] = []
-                        overlapping_calls[samplename].extend(overlapregions)
-    return overlapping_calls
-
-
-def regions_overlap(normalregion, hcregions, percoverlap):
-    """Determine and return overlapping regions.
+    dualbed_labels = {"normal": {}, "hc": {}}
+    for samplename in set(normaldata.keys()) | set(highconfidentdata.keys()):
+        normal_regions = set(normaldata.get(samplename, []))
+        hc_regions = set(highconfidentdata.get(samplename, []))
+        shared_regions = normal_regions & hc_regions
+        overlapping_regions = get_overlapping_regions(normal_regions - shared_regions, hc_regions, percoverlap)
+
+        for track, track_regions in (("normal", normal_regions), ("hc", hc_regions)):
+            sample_labels = {}
+            for cnvregion in track_regions:
+                if cnvregion in shared_regions:
+                    sample_labels[cnvregion] = "Shared"
+                elif cnvregion in overlapping_regions:
+                    sample_labels[cnvregion] = "Overlapping"
+                else:
+                    sample_labels[cnvregion] = "Unique"
+            dualbed_labels[track][samplename] = sample_labels
+    return dualbed_labels
+
+
+def get_overlapping_regions(normalregions, hcregions, percoverlap):
+    """Determine and return the normal and High Confident regions of a
+    sample that overlap with each other.
 
     Parameters
     ----------
-    normalregion : str
-        Normal CNV call
-    hcregions : list of str
-        List of High Confident CNV calls for the same sample
+    normalregions : set of Region
+        Normal CNV calls of a sample that are not shared
+    hcregions : set of Region
+        High Confident CNV calls of the same sample
     percoverlap : int
-        Minimum percentage overlap required to be considered 
+        Minimal percentage overlap required to be considered overlapping
 
     Returns
     -------
-    overlapping_calls : list of tuples
-        List of overlapping CNV calls
+    overlapping_regions : set of Region
+        Normal and High Confident regions with at least one overlap
     """
-    overlapping_calls = []
-    normal_c = normalregion.split(":")[0]
-    normal_s = int(normalregion.split(":")[1].split("-")[0])
-    normal_e = int(normalregion.split(":")[1].split("-")[1])
-
-    for hcregion in hcregions:
-        hc_c = hcregion.split(":")[0]
-        if normal_c == hc_c:
-            hc_s = int(hcregion.split(":")[1].split("-")[0])
-            hc_e = int(hcregion.split(":")[1].split("-")[1])
-            if normal_s <= hc_e and hc_s <= normal_e:
-                nhc_overlap = get_percent_overlap(normal_s, normal_e, hc_s, hc_e)
-                if nhc_overlap >= percoverlap:
-                    overlapping_calls.append((normalregion, hcregion))
-    return overlapping_calls
+    overlapping_regions = set()
+    merged_regions = [(cnvregion, True) for cnvregion in normalregions]
+    merged_regions.extend([(cnvregion, False) for cnvregion in hcregions])
+    merged_regions.sort(key=lambda x: (x[0].chrom_id, x[0].start))
+
+    open_regions = {True: [], False: []}
+    current_chrom = None
+    for cnvregion, is_normal in merged_regions:
+        if cnvregion.chrom_id != current_chrom:
+            open_regions = {True: [], False: []}
+            current_chrom = cnvregion.chrom_id
+
+        # Only regions of the other track that have not ended yet can overlap
+        other_regions = [x for x in open_regions[not is_normal] if x.end >= cnvregion.start]
+        open_regions[not is_normal] = other_regions
+        for otherregion in other_regions:
+            normalregion, hcregion = (cnvregion, otherregion) if is_normal else (otherregion, cnvregion)
+            if get_percent_overlap(normalregion.start, normalregion.end, hcregion.start, hcregion.end) >= percoverlap:
+                overlapping_regions.add(normalregion)
+                overlapping_regions.add(hcregion)
+        open_regions[is_normal].append(cnvregion)
+    return overlapping_regions
 
 
 def get_percent_overlap(normal_start, normal_end, hc_start, hc_end):
@@ -164,55 +165,7 @@ def get_percent_overlap(normal_start, normal_end, hc_start, hc_end):
     return round(overlap_perc, 3)
 
 
-def get_unique_calls(normaldata, highconfidentdata, overlappingcalls):
-    """Determine and return the unique normal and HC CNV calls.
-
-    Parameters
-    ----------
-    normaldata
-        Normal CNV call
-    highconfidentdata
-        High Confident CNV calls
-    overlappingcalls
-        Normal and High Confident overlapping CNV calls
-
-    Returns
-    -------
-    unique_calls : dict
-        Unique CNV calls per sample for both normal en High Confident
-    """
-    unique_calls = {}
-    unique_calls["normal"] = {}
-    unique_calls["hc"] = {}
-    
-    for samplename in set(normaldata.keys()) | set(highconfidentdata.keys()):
-        overlapfilter = []
-        if samplename in overlappingcalls:
-            overlapfilter = [x[0] for x in overlappingcalls[samplename]]
-            hcoverlaps = [x[1] for x in overlappingcalls[samplename]]
-            overlapfilter.extend(hcoverlaps)
-
-        normal_regions = []
-        hc_regions = []
-
-        if samplename in normaldata:
-            normal_regions = [cnvcall for cnvcall in normaldata[samplename]]
-        if samplename in highconfidentdata:
-            hc_regions = [cnvcall for cnvcall in highconfidentdata[samplename]]
-
-        normal_unique_calls = set(normal_regions) - set(hc_regions)
-        hc_unique_calls = set(hc_regions) - set(normal_regions)
-        normal_unique_calls = normal_unique_calls - set(overlapfilter)
-        hc_unique_calls = hc_unique_calls - set(overlapfilter)
-
-        if len(normal_unique_calls) > 0:
-            unique_calls["normal"][samplename] = normal_unique_calls
-        if len(hc_unique_calls) > 0:
-            unique_calls["hc"][samplename] = hc_unique_calls
-    return unique_calls
-
-
-def write_dualbed_file(outfilepath, classificationdata, sharedcalls, overlappingcalls, uniquecalls):
+def write_dualbed_file(outfilepath, classificationdata, dualbedlabels):
     """Write classification output file with added dualBED label for each call.
 
     Parameters
@@ -221,34 +174,17 @@ def write_dualbed_file(outfilepath, classificationdata, sharedcalls, overlapping
         Path to write output file to
     classificationdata : dict
         Classification data to write to file with added label
-    sharedcalls : dict
-        Calls shared with the other BED file
-    overlappingcalls : dict
-        Calls overlapping with the other BED file
-    uniquecalls : dict
-        Calls unique to this BED file
+    dualbedlabels : dict
+        dualBED labels per region per sample
     """
     file_written = False
     try:
         with open(outfilepath, 'w') as outfile:
             outfile.write("Sample\tGATK4_CNV\tGATK4_Call\tGATK4_Size\tArray_CNV\tArray_Call\tArray_Size\tHangover_L\tHangover_R\tCall_Result\tClassification\t#_Exons\t#_Probes\tGATK4_genes\tArray_genes\tGATK4_UGenes\tArray_UGenes\tDualBED\n")
             for samplename in classificationdata:
-                shared_sample_calls = set()
-                overlapping_sample_calls = set()
-                unique_sample_calls = set()
-
-                if samplename in sharedcalls:
-                    shared_sample_calls = set(sharedcalls[samplename])
-                if samplename in overlappingcalls:
-                    overlapping_sample_calls = [x[0] for x in overlappingcalls[samplename]]
-                    hc_sample_overlap = [x[1] for x in overlappingcalls[samplename]]
-                    overlapping_sample_calls.extend(hc_sample_overlap)
-                if samplename in uniquecalls:
-                    unique_sample_calls = set(uniquecalls[samplename])
-
+                sample_labels = dualbedlabels.get(samplename, {})
                 for cnvcall in classificationdata[samplename]:
-                    dualbedlabel = get_dualbed_label(cnvcall.get_region_str(), shared_sample_calls, overlapping_sample_calls, unique_sample_calls)
-                    outfile.write(f"{cnvcall.call_line}\t{dualbedlabel}\n")
+                    outfile.write(f"{cnvcall.call_line}\t{sample_labels.get(cnvcall.get_region())}\n")
         file_written = True
     except IOError:
         print("Could not write output file")
@@ -256,28 +192,6 @@ def write_dualbed_file(outfilepath, classificationdata, sharedcalls, overlapping
         return file_written
 
 
-def get_dualbed_label(cnvcallregion, sharedcalls, overlappingcalls, uniquecalls):
-    """Determine and return the dualbed label for a specified CNV call.
-
-    Parameters
-    ----------
-    cnvcallregion : str
-        CNV call region to get dualbed label for
-    sharedcalls : list of str
-        List of shared CNV calls as region strings for a single sample
-    overlappingcalls : lst of str
-        List of overlapping CNV calls as region strings for a single sample
-    uniquecalls : list of str
-        List of unique CNV calls as region strings for a single sample
-    """
-    if cnvcallregion in sharedcalls:
-        return "Shared"
-    elif cnvcallregion in overlappingcalls:
-        return "Overlapping"
-    elif cnvcallregion in uniquecalls:
-        return "Unique"
-
-
 def main():
     """Perform the work"""
     dualbed_params = get_params()
@@ -285,22 +199,20 @@ def main():
     normal_data = ufr.read_classification_file(dualbed_params["infile1"])
     highconfident_data = ufr.read_classification_file(dualbed_params["infile2"])
 
-    # Obtain the normal and high confident calls as region strings
+    # Obtain the normal and high confident calls as regions
     normal_regions = get_call_regions(normal_data)
     hc_regions = get_call_regions(highconfident_data)
 
-    # Determine the shared, overlapping and unique calls between the normal and high confident classification data
-    shared_calls = get_shared_calls(normal_regions, hc_regions)
-    overlapping_calls = get_overlapping_calls(normal_regions, hc_regions, shared_calls, dualbed_params["percent-overlap"])
-    unique_calls = get_unique_calls(normal_regions, hc_regions, overlapping_calls)
+    # Label the calls of the normal and high confident classification data as shared, overlapping or unique
+    dualbed_labels = get_dualbed_labels(normal_regions, hc_regions, dualbed_params["percent-overlap"])
 
     # Write the normal classification data with the added dualbed label (Shared, Overlapping, Unique)
     normal_outpath = dualbed_params["outdir"]+ "/" +dualbed_params["infile1"].split("/")[-1]
-    write_dualbed_file(normal_outpath, normal_data, shared_calls, overlapping_calls, unique_calls["normal"])
+    write_dualbed_file(normal_outpath, normal_data, dualbed_labels["normal"])
 
     # Write the High Confident classification data with the added dualbed label (Shared, Overlapping, Unique)
     highconfident_outpath = dualbed_params["outdir"]+ "/" +dualbed_params["infile2"].split("/")[-1]
-    write_dualbed_file(highconfident_outpath, highconfident_data, shared_calls, overlapping_calls, unique_calls["hc"])
+    write_dualbed_file(highconfident_outpath, highconfident_data, dualbed_labels["hc"])
 
 
 if __name__ == "__main__":
@@ -9,6 +9,7 @@ from classes.gatkcall import GatkCall
 
 # Import comparison scripts
 import comparison.comparison as comcom
+import comparison.multi_comparison as commc
 
 # Import parameter scripts
 import parameters.parameters as parpar
@@ -19,16 +20,19 @@ import utils.filewriters as ufw
 
 
 #Make some parameter defining variables
-TOOL_CHOICES = ["arraycnvs", "false_positives", "true_positives"]
+TOOL_CHOICES = ["arraycnvs", "false_positives", "multitool", "true_positives"]
 REQUIRED_PARAMS = {"arraycnvs": ["arraycnvs", "file1", "file2", "label1", "label2", "outdir", "output-prefix"],
                    "false_positives": ["file1", "file2", "label1", "label2", "outdir", "output-prefix"],
-                   "true_positives": ["file1", "file2", "label1", "label2", "outdir", "output-prefix"]}
-OPTIONAL_PARAMS = {}
+                   "true_positives": ["file1", "file2", "label1", "label2", "outdir", "output-prefix"],
+                   "multitool": ["files", "labels", "outdir", "output-prefix"]}
+OPTIONAL_PARAMS = {"multitool": ["arraycnvs", "tp-per-acnv"]}
 PARAM_TYPES = {"arraycnvs": "inputfile",
                "file1": "inputfile",
                "file2": "inputfile",
                "label1": "string",
                "label2": "string",
+               "files": "inputfiles",
+               "labels": "strings",
                "outdir": "directory",
                "output-prefix": "string"}
 TOOL_USAGE = {"conifer_exomedepth": "python comparison.py -t conifer_exomedepth -c conifer_classifcations.txt -e exomedepth_classifications.txt -o comparison_outdir -op conexo_comparison",
@@ -36,14 +40,17 @@ TOOL_USAGE = {"conifer_exomedepth": "python comparison.py -t conifer_exomedepth
               "gatk4_exomedepth": "python comparison.py -t gatk4_exomedepth -g gatk4_classifications.txt -e exomedepth_classifications.txt -o comparison_outdir -op gatexo_comparison",
               "gatk4_gatk4": "python comparison.py -t gatk4_gatk4 -g gatk4_classifications.txt -g2 gatk4_classifications_2.txt -a array_goldstandard.txt -o comparison_outdir -op gatkgatk_comparison",
               "conifer_conifer": "python comparison.py -t conifer_conifer -c conifer_classifcations.txt -c2 conifer_classifcations_2.txt -a array_goldstandard.txt -o comparison_outdir -op concon_comparison",
-              "exomedepth_exomedepth": "python comparison.py -t exomedepth_exomedepth -e exomedepth_classifications.txt -e2 exomedepth_classifications_2.txt -a array_goldstandard.txt -o comparison_outdir -op exdexd_comparison"}
+              "exomedepth_exomedepth": "python comparison.py -t exomedepth_exomedepth -e exomedepth_classifications.txt -e2 exomedepth_classifications_2.txt -a array_goldstandard.txt -o comparison_outdir -op exdexd_comparison",
+              "multitool": "python comparison.py -t multitool -f gatk4_classifications.txt conifer_classifications.txt exomedepth_classifications.txt -l GATK4 Conifer ExomeDepth -a array_goldstandard.txt -o comparison_outdir -op multitool_comparison"}
 
 
 def main():
     compare_parameters = parpar.get_comparison_parameters(TOOL_CHOICES)
     incorrect_parameters = parpar.parameters_are_ok(compare_parameters, REQUIRED_PARAMS, PARAM_TYPES)
 
-    if len(incorrect_parameters) == 0:
+    if len(incorrect_parameters) == 0 and compare_parameters["tool"] == "multitool":
+        run_multitool(compare_parameters)
+    elif len(incorrect_parameters) == 0:
         tool1_label = compare_parameters["label1"]
         tool2_label = compare_parameters["label2"]
         print(f"...Reading {tool1_label} classification data...")
@@ -80,6 +87,39 @@ def main():
         print("Please set the following parameters: " + ", ".join(incorrect_parameters))
 
 
+def run_multitool(compare_parameters):
+    """Compare the classified CNV calls of all provided tools in a single run.
+
+    Parameters
+    ----------
+    compare_parameters : dict
+        Set CLI parameter values
+    """
+    if len(compare_parameters["files"]) != len(compare_parameters["labels"]):
+        print("Please provide a label for each classification file")
+        return
+
+    # Read and index the classification data of each tool once
+    tool_indices = []
+    for tool_label, tool_fileloc in zip(compare_parameters["labels"], compare_parameters["files"]):
+        print(f"...Reading {tool_label} classification data...")
+        tooldata = ufr.read_classification_file(tool_fileloc)
+        tool_indices.append(commc.index_tool_data(tool_label, tooldata, compare_parameters["tp-per-acnv"]))
+
+    arraydata = {}
+    if compare_parameters["arraycnvs"] is not None:
+        print("...Reading array CNV data...")
+        arraydata = ufr.read_array_cnvs(compare_parameters["arraycnvs"])
+
+    print(f"...Perform the comparison between {', '.join(compare_parameters['labels'])}...")
+    comparisondata = commc.perform_multi_comparison(tool_indices, arraydata)
+
+    outfilepath = compare_parameters["outdir"] + "/" + compare_parameters["output-prefix"] + ".txt"
+    print(f"...Writing comparison data to output file {outfilepath}...")
+    wrote_file = ufw.write_multi_comparison(outfilepath, comparisondata, tool_indices)
+    print(f"...Wrote comparison output file?: {wrote_file}...")
+
+
 if __name__ == "__main__":
     main()
     print("DONE!")
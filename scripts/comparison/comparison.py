@@ -288,8 +288,8 @@ def get_fp_regions(tooldata):
 
     Returns
     -------
-    tool_fps : list of str
-        False Positives for the tool
+    tool_fps : dict
+        False Positive regions per sample for the tool
     """
     tool_fps = {}
     for samplename in tooldata:
@@ -297,7 +297,7 @@ def get_fp_regions(tooldata):
             if cnvcall.classification == "FALSE POSITIVE":
                 if samplename not in tool_fps:
                     tool_fps[samplename] = []
-                tool_fps[samplename].append(cnvcall.get_region_str())
+                tool_fps[samplename].append(cnvcall.get_region())
     return tool_fps
 
 
@@ -343,17 +343,9 @@ def get_overlapping_fps(tool1fps, tool2fps, shared_fps):
 
 def fp_regions_overlap(fp1region, fp2regions):
     overlapping_fps = []
-    fp1_c = fp1region.split(":")[0]
-    fp1_s = int(fp1region.split(":")[1].split("-")[0])
-    fp1_e = int(fp1region.split(":")[1].split("-")[1])
-
     for fp2region in fp2regions:
-        fp2_c = fp2region.split(":")[0]
-        if fp1_c == fp2_c:
-            fp2_s = int(fp2region.split(":")[1].split("-")[0])
-            fp2_e = int(fp2region.split(":")[1].split("-")[1])
-            if fp1_s <= fp2_e and fp2_s <= fp1_e:
-                overlapping_fps.append((fp1region, fp2region))
+        if fp1region.overlaps(fp2region):
+            overlapping_fps.append((fp1region, fp2region))
     return overlapping_fps
 
 
@@ -444,7 +436,7 @@ def compare_tps(tool1_label, tool1_data, tool2_label, tool2_data):
 
 
 def get_tp_regions(tooldata):
-    """Get and return False Positive calls for the selected tool.
+    """Get and return True Positive calls for the selected tool.
 
     Parameters
     ----------
@@ -453,8 +445,8 @@ def get_tp_regions(tooldata):
 
     Returns
     -------
-    tool_fps : list of str
-        False Positives for the tool
+    tool_tps : dict
+        True Positive regions per sample for the tool
     """
     tool_tps = {}
     for samplename in tooldata:
@@ -462,5 +454,5 @@ def get_tp_regions(tooldata):
             if cnvcall.classification == "POSITIVE" or cnvcall.classification == "TRUE POSITIVE":
                 if samplename not in tool_tps:
                     tool_tps[samplename] = []
-                tool_tps[samplename].append(cnvcall.get_region_str())
+                tool_tps[samplename].append(cnvcall.get_region())
     return tool_tps
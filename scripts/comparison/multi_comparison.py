@@ -0,0 +1,271 @@
+#!/usr/bin/env python
+from itertools import combinations
+
+# Import generate totals scripts
+import generate_totals.classifications as gtc
+import generate_totals.array_cnvs as gtac
+
+# Import comparison scripts
+import comparison.comparison as comcom
+
+
+CLASSIFICATION_LABELS = ["True Positive", "False Positive", "Array Non-Informative", "WES Non-Informative", "Array & WES Non-Informative"]
+
+
+def index_tool_data(tool_label, tool_data, tpperacnv):
+    """Index the classified CNV calls of a single tool for comparison.
+
+    Parameters
+    ----------
+    tool_label : str
+        Name for the tool
+    tool_data : dict
+        Classified CNV calls for the tool
+    tpperacnv : bool
+        Count TPs only per array CNV
+
+    Returns
+    -------
+    tool_index : dict
+        Total calls, call types, found array CNVs and False Positive regions of the tool
+    """
+    found_arraycnvs = gtac.array_cnvs_found(tool_data)
+    false_positives = comcom.get_fp_regions(tool_data)
+    classification_totals = gtc.generate_classification_totals(tool_data, tpperacnv)
+    return {"label": tool_label,
+            "Total calls": comcom.determine_total_calls(tool_data),
+            "Call types": {classlabel: classification_totals.get(classlabel, 0) for classlabel in CLASSIFICATION_LABELS},
+            "Found array CNVs": {samplename: set(found_arraycnvs[samplename]) for samplename in found_arraycnvs},
+            "Total fps": sum([len(false_positives[samplename]) for samplename in false_positives]),
+            "False positives": {samplename: set(false_positives[samplename]) for samplename in false_positives}}
+
+
+def perform_multi_comparison(tool_indices, arraydata):
+    """Compare the indexed classified CNV calls of all tools with each other.
+
+    Parameters
+    ----------
+    tool_indices : list of dict
+        Indexed classified CNV calls per tool
+    arraydata : dict
+        Array CNV data, empty if not provided
+
+    Returns
+    -------
+    comparison_data : dict
+        Comparison summary data
+    """
+    comparison_data = {}
+
+    print("COMPARISON: [Determine the number of shared array CNVs for each pair of tools]")
+    comparison_data["Shared array CNVs"] = get_pairwise_matrix(tool_indices, "Found array CNVs", count_shared)
+
+    print("COMPARISON: [Determine the array CNVs found by all tools]")
+    comparison_data["All tools array CNVs"] = get_all_tools_shared(tool_indices, "Found array CNVs")
+    comparison_data["All tools array types"] = comcom.determine_shared_acnv_types(get_known_array_cnvs(comparison_data["All tools array CNVs"], arraydata), arraydata)
+
+    print("COMPARISON: [Determine array CNVs found by only one tool]")
+    comparison_data["Unique array CNVs"] = get_unique_per_tool(tool_indices, "Found array CNVs")
+    comparison_data["Unique array types"] = [comcom.determine_shared_acnv_types(get_known_array_cnvs(unique_acnvs, arraydata), arraydata)
+                                             for unique_acnvs in comparison_data["Unique array CNVs"]]
+
+    print("COMPARISON: [Determine the shared and overlapping False Positives for each pair of tools]")
+    fp_overlaps = get_fp_overlaps(tool_indices)
+    comparison_data["Shared fps"] = get_pairwise_matrix(tool_indices, "False positives", count_shared)
+    comparison_data["Overlapping fps"] = get_pairwise_matrix(tool_indices, "False positives", lambda x, y: count_overlapping(x, y, fp_overlaps))
+
+    print("COMPARISON: [Determine the False Positives found by all tools]")
+    comparison_data["All tools fps"] = get_all_tools_shared(tool_indices, "False positives")
+
+    print("COMPARISON: [Determine the False Positives not shared with or overlapping any other tool]")
+    comparison_data["Unique fps"] = get_unique_fps(tool_indices, fp_overlaps)
+    return comparison_data
+
+
+def get_pairwise_matrix(tool_indices, datakey, countmethod):
+    """Determine and return a tools x tools matrix of counts.
+
+    The diagonal holds the number of distinct entries of each tool.
+
+    Parameters
+    ----------
+    tool_indices : list of dict
+        Indexed classified CNV calls per tool
+    datakey : str
+        Indexed data to compare
+    countmethod : function
+        Method counting the entries of the first tool shared with the second tool
+
+    Returns
+    -------
+    count_matrix : list of list of int
+        Counts per pair of tools
+    """
+    count_matrix = [[0] * len(tool_indices) for x in tool_indices]
+    for toolnum1, toolnum2 in combinations(range(len(tool_indices)), 2):
+        count_matrix[toolnum1][toolnum2] = countmethod(tool_indices[toolnum1][datakey], tool_indices[toolnum2][datakey])
+        count_matrix[toolnum2][toolnum1] = countmethod(tool_indices[toolnum2][datakey], tool_indices[toolnum1][datakey])
+    for toolnum, tool_index in enumerate(tool_indices):
+        count_matrix[toolnum][toolnum] = count_shared(tool_index[datakey], tool_index[datakey])
+    return count_matrix
+
+
+def count_shared(tool1_entries, tool2_entries):
+    """Count and return the entries of the first tool that are also present
+    for the second tool.
+
+    Parameters
+    ----------
+    tool1_entries : dict
+        Set of entries per sample for the first tool
+    tool2_entries : dict
+        Set of entries per sample for the second tool
+
+    Returns
+    -------
+    int
+        Number of shared entries
+    """
+    return sum([len(tool1_entries[samplename] & tool2_entries[samplename]) for samplename in tool1_entries if samplename in tool2_entries])
+
+
+def count_overlapping(tool1_fps, tool2_fps, fpoverlaps):
+    """Count and return the False Positives of the first tool that overlap,
+    but are not identical to, a False Positive of the second tool.
+
+    Parameters
+    ----------
+    tool1_fps : dict
+        False Positive regions per sample for the first tool
+    tool2_fps : dict
+        False Positive regions per sample for the second tool
+    fpoverlaps : dict
+        Overlapping False Positive regions per sample and region
+
+    Returns
+    -------
+    num_of_overlapping : int
+        Number of overlapping False Positives
+    """
+    num_of_overlapping = 0
+    for samplename in tool1_fps:
+        if samplename in tool2_fps:
+            sample_overlaps = fpoverlaps.get(samplename, {})
+            for fpregion in tool1_fps[samplename] - tool2_fps[samplename]:
+                if not tool2_fps[samplename].isdisjoint(sample_overlaps.get(fpregion, ())):
+                    num_of_overlapping += 1
+    return num_of_overlapping
+
+
+def get_all_tools_shared(tool_indices, datakey):
+    """Determine and return the entries present for all tools.
+
+    Parameters
+    ----------
+    tool_indices : list of dict
+        Indexed classified CNV calls per tool
+    datakey : str
+        Indexed data to compare
+
+    Returns
+    -------
+    all_shared : dict
+        Entries present for all tools per sample
+    """
+    all_shared = {}
+    for samplename in set.intersection(*[set(tool_index[datakey].keys()) for tool_index in tool_indices]):
+        shared_entries = set.intersection(*[tool_index[datakey][samplename] for tool_index in tool_indices])
+        if len(shared_entries) > 0:
+            all_shared[samplename] = shared_entries
+    return all_shared
+
+
+def get_unique_per_tool(tool_indices, datakey):
+    """Determine and return the entries present for only a single tool.
+
+    Parameters
+    ----------
+    tool_indices : list of dict
+        Indexed classified CNV calls per tool
+    datakey : str
+        Indexed data to compare
+
+    Returns
+    -------
+    unique_entries : list of dict
+        Entries present for only that tool per sample, for each tool
+    """
+    unique_entries = [{} for x in tool_indices]
+    for toolnum, tool_index in enumerate(tool_indices):
+        for samplename in tool_index[datakey]:
+            other_entries = set().union(*[other_index[datakey].get(samplename, set()) for other_index in tool_indices if other_index is not tool_index])
+            tool_unique_entries = tool_index[datakey][samplename] - other_entries
+            if len(tool_unique_entries) > 0:
+                unique_entries[toolnum][samplename] = tool_unique_entries
+    return unique_entries
+
+
+def get_known_array_cnvs(arraycnvs, arraydata):
+    """Select and return the array CNVs of samples present in the array CNV data."""
+    return {samplename: arraycnvs[samplename] for samplename in arraycnvs if samplename in arraydata}
+
+
+def get_fp_overlaps(tool_indices):
+    """Determine and return all pairs of overlapping False Positive regions.
+
+    The False Positive regions of all tools are merged per sample, sorted by
+    chromosome and starting position and swept once, so each region is only
+    compared with the regions that have not ended yet.
+
+    Parameters
+    ----------
+    tool_indices : list of dict
+        Indexed classified CNV calls per tool
+
+    Returns
+    -------
+    fp_overlaps : dict
+        Set of overlapping, non identical, regions per sample and region
+    """
+    fp_overlaps = {}
+    for samplename in set().union(*[tool_index["False positives"].keys() for tool_index in tool_indices]):
+        sample_regions = set().union(*[tool_index["False positives"].get(samplename, set()) for tool_index in tool_indices])
+        sample_overlaps = {}
+        open_regions = []
+        for fpregion in sorted(sample_regions, key=lambda x: (x.chrom_id, x.start)):
+            open_regions = [x for x in open_regions if x.chrom_id == fpregion.chrom_id and x.end >= fpregion.start]
+            for openregion in open_regions:
+                sample_overlaps.setdefault(openregion, set()).add(fpregion)
+                sample_overlaps.setdefault(fpregion, set()).add(openregion)
+            open_regions.append(fpregion)
+        fp_overlaps[samplename] = sample_overlaps
+    return fp_overlaps
+
+
+def get_unique_fps(tool_indices, fpoverlaps):
+    """Determine and return the False Positives of each tool that are not
+    shared with, or overlapping, a False Positive of any other tool.
+
+    Parameters
+    ----------
+    tool_indices : list of dict
+        Indexed classified CNV calls per tool
+    fpoverlaps : dict
+        Overlapping False Positive regions per sample and region
+
+    Returns
+    -------
+    unique_fps : list of dict
+        Unique False Positive regions per sample, for each tool
+    """
+    unique_fps = get_unique_per_tool(tool_indices, "False positives")
+    for toolnum, tool_index in enumerate(tool_indices):
+        for samplename in list(unique_fps[toolnum].keys()):
+            other_fps = set().union(*[other_index["False positives"].get(samplename, set()) for other_index in tool_indices if other_index is not tool_index])
+            sample_overlaps = fpoverlaps.get(samplename, {})
+            tool_unique_fps = set([fpregion for fpregion in unique_fps[toolnum][samplename] if other_fps.isdisjoint(sample_overlaps.get(fpregion, ()))])
+            if len(tool_unique_fps) > 0:
+                unique_fps[toolnum][samplename] = tool_unique_fps
+            else:
+                del unique_fps[toolnum][samplename]
+    return unique_fps
@@ -1,33 +1,17 @@
 #!/usr/bin/env python
-import os
-import sys
-import argparse
-
-
-# Import required classes
-from classes.conradcnv import ConradCnv
-from classes.conradexon import ConradExon
-from classes.exon import Exon
-from classes.gatkcall import GatkCall
-from classes.umcgcommoncnv import UmcgCommonCnv
+# Import util scripts
+import utils.resource_registry as urr
 
 # Import parameters scripts
 import parameters.parameters as parpar
 
-# Import util scripts
-import utils.filereaders as ufr
-
-# Import filtering scripts
-import filtering.ccnv_filtering as fuccf
-import filtering.conrad_filtering as fcf
-import filtering.na_filtering as fnaf
-import filtering.naremoval as fnar
-import filtering.size_filtering as fsf
+# The filtering scripts and reference files are only imported and read by the filtering that needs them.
 
 
 # Create some general variables
-TOOL_CHOICES = ["ccnvfiltering", "conradfiltering", "nafiltering", "sizefiltering"]
-REQUIRED_PARAMS = {"ccnvfiltering": ["commoncnvs", "infile", "outfile"],
+TOOL_CHOICES = ["callfiltering", "ccnvfiltering", "conradfiltering", "nafiltering", "sizefiltering"]
+REQUIRED_PARAMS = {"callfiltering": ["infile", "outfile"],
+                   "ccnvfiltering": ["commoncnvs", "infile", "outfile"],
                    "conradfiltering": ["conradfile", "exonfile", "infile", "outfile"],
                    "nafiltering": ["infile", "outfile", "colname"],
                    "sizefiltering": ["infile", "outfile", "colname", "cnvsize"]}
@@ -39,16 +23,25 @@ PARAM_TYPES = {"infile": "inputfile",
                "commoncnvs": "inputfile",
                "colname": "string",
                "cnvsize": "integer"}
-TOOL_USAGE = {"ccnvfiltering": "python filtering.py -t ccnvfiltering -u commoncnvs.txt -i cnv_classifications.txt -o filtered_ccnv_classifications.txt",
+TOOL_USAGE = {"callfiltering": "python filtering.py -t callfiltering -i cnv_classifications.txt -o filtered_classifications.txt -C gatk4_Size -S 50000 -N Array_CNV -fn -r removed_classifications.txt",
+              "ccnvfiltering": "python filtering.py -t ccnvfiltering -u commoncnvs.txt -i cnv_classifications.txt -o filtered_ccnv_classifications.txt",
               "conradfiltering": "python filtering.py -t conradfiltering -c cornad_cnvs.txt -e exons.bed -i cnv_classifications.txt -o filtered_cnv_classifications.txt",
               "nafitlering": "python filtering.py -t nafiltering -i cnv_classifications.txt -o nafiltered_cnv_classifications.txt -C ArrayCNV",
               "sizefiltering": "python filtering.py -t sizefiltering -i cnv_classifications.txt -o filtered_classifications.txt -C gatk4Call -S 50000"}
 
 
+# Record the time taken by the imports above, counted from the import of the resource registry.
+urr.record_time("import", "parameters.parameters", urr.STARTUP_TIME)
+
+
 def main():
     filterparams = parpar.get_filtering_parameters(TOOL_CHOICES)
     incorrect_params = parpar.parameters_are_ok(filterparams, REQUIRED_PARAMS, PARAM_TYPES)
     if len(incorrect_params) == 0:
+        # Filter CNV calls by size, NAs and neutral calls at once
+        if filterparams["tool"] == "callfiltering":
+            run_callfiltering(filterparams)
+
         # Perform filtering with a Common CNV list.
         if filterparams["tool"] == "ccnvfiltering":
             run_ccnvfiltering(filterparams)
@@ -69,17 +62,32 @@ def main():
         print(f"Missing parameters: {incorrect_params}")
         parpar.display_tool_usage(filterparams["tool"], TOOL_USAGE)
 
+    if filterparams["profile-startup"]:
+        urr.record_time("total", "filtering.py", urr.STARTUP_TIME)
+        urr.print_load_times()
+
+
+def run_callfiltering(filterparams):
+    fcof = urr.import_module("filtering.column_filtering")
+    print("...Filtering CNV calls by size, NAs and neutral calls...")
+    file_written = fcof.filter_calls(filterparams["infile"], filterparams["outfile"], filterparams["colname"], filterparams["cnvsize"],
+                                     filterparams["nacolname"], filterparams["filterneutrals"], filterparams["removedoutfile"])
+    print(f"...Wrote output file: {file_written}...")
+
 
 def run_ccnvfiltering(filterparams):
-    ccnvdata = ufr.read_umcg_common_cnv_file(filterparams["commoncnvs"])
+    ufr = urr.import_module("utils.filereaders")
+    fuccf = urr.import_module("filtering.ccnv_filtering")
+    ccnvdata = urr.get_resource("commoncnvs", ufr.read_umcg_common_cnv_file, filterparams["commoncnvs"])
     fuccf.filter_classification_results(filterparams["infile"], ccnvdata, filterparams["outfile"])
 
 
 def run_conradfiltering(filterparams):
+    fcf = urr.import_module("filtering.conrad_filtering")
     print("...Reading classification data...")
     gatkresultdata = fcf.read_classification_file(filterparams["infile"])
     print("...Reading Conrad CNV data...")
-    conradcnvs = fcf.read_conrad_data(filterparams["conradfile"])
+    conradcnvs = urr.get_resource("conradcnvs", fcf.read_conrad_data, filterparams["conradfile"])
     print("...Linking exons fropm BED to Conrad CNVs...")
     fcf.add_qxte_exon_data(filterparams["exonfile"], conradcnvs)
     print("...Determining classification calls Conrad overlap...")
@@ -91,12 +99,14 @@ def run_conradfiltering(filterparams):
 
 
 def run_nafiltering(filterparams):
+    fnaf = urr.import_module("filtering.na_filtering")
     print("...Filtering NAs...")
     file_written = fnaf.filter_na(filterparams["infile"], filterparams["outfile"], filterparams["colname"])
     print(f"...Wrote output file: {file_written}...")
 
 
 def run_sizefiltering(filterparams):
+    fsf = urr.import_module("filtering.size_filtering")
     print("...Filtering CNV calls by size...")
     file_written = fsf.filter_by_size(filterparams["infile"], filterparams["outfile"], filterparams["colname"], filterparams["cnvsize"])
     print(f"...Wrote output file: {file_written}...")
@@ -0,0 +1,147 @@
+#!/usr/bin/env python
+# Import util scripts
+import utils.filewriters as ufw
+
+
+# Call values of neutral CNV calls in classification files
+NEUTRAL_CALLS = ("Neutral", "0")
+
+
+def read_file_columns(infileloc):
+    """Read a classification file and return its header, lines and columns.
+
+    Blank lines and lines with fewer fields than the header are skipped, so
+    every column has a value for each returned line.
+
+    Parameters
+    ----------
+    infileloc : str
+        Path to classification file
+
+    Returns
+    -------
+    headerline : str
+        Header line of the file
+    filelines : list of str
+        Lines of the file, without the header line and skipped lines
+    filecolumns : dict
+        Values of each column, in line order, per column name
+    """
+    with open(infileloc, 'r') as infile:
+        headerline = next(infile)
+        filelines = infile.readlines()
+    headerfields = headerline.rstrip("\n").split("\t")
+    filelines = [fileline for fileline in filelines if fileline.strip() != ""]
+    linefields = [fileline.rstrip("\n").split("\t") for fileline in filelines]
+    num_of_short_lines = sum([len(fields) < len(headerfields) for fields in linefields])
+    if num_of_short_lines > 0:
+        print(f"Skipped {num_of_short_lines} lines of {infileloc} with fewer than {len(headerfields)} columns")
+        filelines = [fileline for fileline, fields in zip(filelines, linefields) if len(fields) >= len(headerfields)]
+        linefields = [fields for fields in linefields if len(fields) >= len(headerfields)]
+    filecolumns = {headerfield: () for headerfield in headerfields}
+    if len(filelines) > 0:
+        filecolumns = dict(zip(headerfields, zip(*linefields)))
+    return headerline, filelines, filecolumns
+
+
+def get_call_column(headerfields):
+    """Determine and return the name of the column with the WES CNV calls.
+
+    Parameters
+    ----------
+    headerfields : list of str
+        Column names of a classification file
+
+    Returns
+    -------
+    str or None
+        Name of the CNV call column, None if there is no such column
+    """
+    for headerfield in headerfields:
+        if headerfield.endswith("_Call") and headerfield != "Array_Call":
+            return headerfield
+    return None
+
+
+def get_keep_mask(filecolumns, sizecolumn=None, minimumsize=None, nacolumn=None, callcolumn=None):
+    """Determine and return for each line whether it passes all set filters.
+
+    Each filter is applied to a whole column at once and the results are
+    combined, so the lines are read and split only once for all filters.
+
+    Parameters
+    ----------
+    filecolumns : dict
+        Values of each column per column name
+    sizecolumn : str
+        Name of the column with the CNV sizes, to keep calls of at least the minimum size
+    minimumsize : int
+        Minimum size calls need to have to be kept
+    nacolumn : str
+        Name of the column to keep calls without an NA value for
+    callcolumn : str
+        Name of the column with the CNV calls, to filter out neutral calls
+
+    Returns
+    -------
+    keep_mask : list of bool
+        Whether to keep each line
+    """
+    num_of_lines = len(next(iter(filecolumns.values()), ()))
+    keep_mask = [True] * num_of_lines
+    if sizecolumn is not None and minimumsize is not None:
+        keep_mask = [keepline and int(cnvsize) >= minimumsize for keepline, cnvsize in zip(keep_mask, filecolumns[sizecolumn])]
+    if nacolumn is not None:
+        keep_mask = [keepline and navalue != "NA" for keepline, navalue in zip(keep_mask, filecolumns[nacolumn])]
+    if callcolumn is not None:
+        keep_mask = [keepline and cnvcall not in NEUTRAL_CALLS for keepline, cnvcall in zip(keep_mask, filecolumns[callcolumn])]
+    return keep_mask
+
+
+def filter_calls(infileloc, outfileloc, sizecolumn=None, minimumsize=None, nacolumn=None, filterneutrals=False, removedfileloc=None):
+    """Filter a classification file on size, NA values and neutral calls in
+    a single pass and write the kept, and optionally the removed, calls.
+
+    Parameters
+    ----------
+    infileloc : str
+        Path to classification file to filter
+    outfileloc : str
+        Path to write the kept calls to
+    sizecolumn : str
+        Name of the column with the CNV sizes
+    minimumsize : int
+        Minimum size calls need to have to be kept
+    nacolumn : str
+        Name of the column to keep calls without an NA value for
+    filterneutrals : bool
+        Whether to filter out neutral calls
+    removedfileloc : str
+        Path to write the removed calls to
+
+    Returns
+    -------
+    wrote_file : bool
+        True if output file has been written, False if not
+    """
+    wrote_file = False
+    try:
+        headerline, filelines, filecolumns = read_file_columns(infileloc)
+        callcolumn = get_call_column(list(filecolumns.keys())) if filterneutrals else None
+        missing_columns = [colname for colname in (sizecolumn, nacolumn, callcolumn) if colname is not None and colname not in filecolumns]
+        if filterneutrals and callcolumn is None:
+            print(f"Could not filter neutral calls of {infileloc}, there is no CNV call column")
+        elif len(missing_columns) > 0:
+            print(f"Columns {missing_columns} are not present in {infileloc}")
+        else:
+            keep_mask = get_keep_mask(filecolumns, sizecolumn, minimumsize, nacolumn, callcolumn)
+            ufw.write_file_lines(outfileloc, headerline, (fileline for fileline, keepline in zip(filelines, keep_mask) if keepline))
+            if removedfileloc is not None:
+                ufw.write_file_lines(removedfileloc, headerline, (fileline for fileline, keepline in zip(filelines, keep_mask) if not keepline))
+            wrote_file = True
+    except (IOError, StopIteration):
+        print(f"Could not filter {infileloc}")
+    except ValueError:
+        print(f"Could not filter {infileloc}, column {sizecolumn} contains non numeric sizes")
+    finally:
+        return wrote_file
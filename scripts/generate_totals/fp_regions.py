@@ -1,6 +1,5 @@
 #!/usr/bin/env python
 from classes.fpoverlap import FpOverlap
-import shared_methods.shared_methods as smsm
 
 def get_duplicated_regions(fpregioncounts):
     """Fetch and return false positive regions
@@ -12,7 +11,7 @@ def get_duplicated_regions(fpregioncounts):
 
     Returns
     -------
-    dup_fpregions : list of str
+    dup_fpregions : list of Region
         List of false postive regions with count > 1
     """
     dup_fpregions = {}
@@ -32,7 +31,7 @@ def get_unique_regions(fpregioncounts):
 
     Return
     ------
-    uni_fpregions : list of str
+    uni_fpregions : list of Region
         List of unique false positive regions with count == 1
     """
     uni_fpregions = {}
@@ -45,114 +44,132 @@ def get_unique_regions(fpregioncounts):
 def determine_similar_regions(dupregions, uniregions, min_req_overlap):
     """Determine which False Positive regions have at least a minimum required overlap.
 
+    Unique regions are compared against the duplicated regions first and
+    against the other unique regions second. An A<->B entry between two
+    unique regions is not recorded as B<->A as well.
+
     Parameters
     ----------
     dupregions : dict
-        
+        Duplicated False Positive regions
     uniregions : dict
+        Unique False Positive regions
     min_req_overlap : int
         Minimum percentage overlap
 
     Returns
     -------
     simfpregions : dict
-        False Positive regions with 
+        Unique False Positive regions with their similar regions as FpOverlap
     """
+    dup_overlaps = {}
+    uni_overlaps = {}
+    uni_indices = {uregion: uindex for uindex, uregion in enumerate(uniregions)}
+    dup_indices = {dregion: dindex for dindex, dregion in enumerate(dupregions)}
+
+    for region1, region2 in get_overlapping_pairs(list(uniregions) + list(dupregions)):
+        if region1 in uni_indices and region2 in uni_indices:
+            __add_unique_pair__(region1, region2, uni_indices, uni_overlaps, min_req_overlap)
+        elif region1 in uni_indices:
+            __add_duplicate_pair__(region1, region2, dup_indices, dup_overlaps, min_req_overlap)
+        elif region2 in uni_indices:
+            __add_duplicate_pair__(region2, region1, dup_indices, dup_overlaps, min_req_overlap)
+
+    # Rebuild the similar regions in the order of the pairwise comparison
     simfpregions = {}
-    simfpregions = __similar_with_duplicates__(dupregions, uniregions, simfpregions, min_req_overlap)
-    simfpregions = __similar_with_uniques__(uniregions, simfpregions, min_req_overlap)
+    for regionoverlaps in (dup_overlaps, uni_overlaps):
+        for uregion in sorted(regionoverlaps, key=uni_indices.get):
+            if uregion not in simfpregions:
+                simfpregions[uregion] = FpOverlap(uregion)
+            for overlapindex, overlapregion, perc_overlap in sorted(regionoverlaps[uregion]):
+                simfpregions[uregion].add_overlap(overlapregion, perc_overlap)
     return simfpregions
 
 
-def __similar_with_duplicates__(dupregions, uniregions, simregions, minpercoverlap):
-    """Determine similar 
-
-    Parameters
-    ----------
-    dupregions : dict
-    uniregions : dict
-    simregions : dict
-    minpercoverlap : int
-    """
-    for uregion in uniregions:
-        for dregion in dupregions:
-            fpoverlap = regions_overlap(uregion, dregion, simregions, minpercoverlap)
-
-            if fpoverlap is not None:
-                if uregion not in simregions:
-                    simregions[uregion] = FpOverlap(uregion)
-                simregions[uregion].add_overlap(fpoverlap[0], fpoverlap[1])
-    return simregions
+def __add_duplicate_pair__(uregion, dregion, dupindices, dupoverlaps, minpercoverlap):
+    """Record a duplicated region as similar to a unique region if it has
+    the minimum required overlap."""
+    perc_overlap = get_overlap_percentage(uregion, dregion)
+    if perc_overlap is not None and perc_overlap >= minpercoverlap:
+        dupoverlaps.setdefault(uregion, []).append((dupindices[dregion], dregion, perc_overlap))
 
 
-def __similar_with_uniques__(uniregions, simregions, minpercoverlap):
-    for uregion in uniregions:
-        for ouregion in uniregions:
-            fpoverlap = regions_overlap(uregion, ouregion, simregions, minpercoverlap)
+def __add_unique_pair__(uregion1, uregion2, uniindices, unioverlaps, minpercoverlap):
+    """Record two unique regions as similar if they have the minimum
+    required overlap, keeping only the entry of the earlier region if both
+    directions qualify."""
+    if uniindices[uregion1] > uniindices[uregion2]:
+        uregion1, uregion2 = uregion2, uregion1
+    perc_overlap = get_overlap_percentage(uregion1, uregion2)
+    if perc_overlap is not None and perc_overlap >= minpercoverlap:
+        unioverlaps.setdefault(uregion1, []).append((uniindices[uregion2], uregion2, perc_overlap))
+    else:
+        perc_overlap = get_overlap_percentage(uregion2, uregion1)
+        if perc_overlap is not None and perc_overlap >= minpercoverlap:
+            unioverlaps.setdefault(uregion2, []).append((uniindices[uregion1], uregion1, perc_overlap))
 
-            if fpoverlap is not None:
-                if uregion not in simregions:
-                    simregions[uregion] = FpOverlap(uregion)
-                simregions[uregion].add_overlap(fpoverlap[0], fpoverlap[1])
-    return simregions
 
+def get_overlapping_pairs(fpregions):
+    """Determine and return all pairs of overlapping regions.
 
-def regions_overlap(selected_region, other_region, simregions, min_overlap_percentage):
-    """Check and return whether a selected_region overlaps with the other_region for at least the set overlap_percentage.
+    The regions are sorted per chromosome and swept by start position, so
+    each region is only compared with the regions that are still open.
 
     Parameters
     ----------
-    selected_region : str
-    other_region : str
-    min_overlap_percentage : int
-        Minimum required percentage overlap
+    fpregions : list of Region
+        False Positive regions
 
     Returns
     -------
-    list of str and int or None
-        Overlapping region and percentage overlap ; None if there is no overlap
+    overlapping_pairs : list of tuples
+        Pairs of overlapping regions
     """
-    selected_region_data = smsm.get_gatk_region(selected_region)
-    other_region_data = smsm.get_gatk_region(other_region)
+    overlapping_pairs = []
+    chrom_regions = {}
+    for fpregion in fpregions:
+        chrom_regions.setdefault(fpregion.chrom_id, []).append(fpregion)
 
-    if selected_region != other_region:
-        if selected_region_data[0] == other_region_data[0]:
-            if selected_region_data[1] <= other_region_data[2] and other_region_data[1] <= selected_region_data[2]:
-                print(f"{selected_region} :: {other_region}")
-                print(f"{selected_region_data} :: {other_region_data}")
-
-                if not similarfp_already_found(selected_region, other_region, simregions):
-                    selected_region_size = selected_region_data[2] - selected_region_data[1]
-
-                    # Determine the size of the overlap
-                    non_overlap_size = 0
-                    if selected_region_data[1] < other_region_data[1]:
-                        non_overlap_size += other_region_data[1] - selected_region_data[1]
-                    if selected_region_data[1] > other_region_data[2]:
-                        non_overlap_size += selected_region_data[2] - other_region_data[2]
-
-                    # Determine the overlap percentage
-                    overlap_size = selected_region_size - non_overlap_size
-                    if overlap_size > 0:
-                        perc_overlap = (overlap_size/selected_region_size)*100
-                        if perc_overlap >= min_overlap_percentage:
-                            return [other_region, perc_overlap]
-    return None
+    for chromid in chrom_regions:
+        open_regions = []
+        for fpregion in sorted(chrom_regions[chromid], key=lambda x: x.start):
+            open_regions = [x for x in open_regions if x.end >= fpregion.start]
+            overlapping_pairs.extend([(x, fpregion) for x in open_regions])
+            open_regions.append(fpregion)
+    return overlapping_pairs
 
 
-def similarfp_already_found(selectedregion, otherregion, simfpregions):
-    """Check and return whether a similar fpregion has already been found.
-
-    This is to avoid an A<->B entry to be recorded as B<->A as well.
+def get_overlap_percentage(selected_region, other_region):
+    """Determine and return the percentage of the selected_region covered by
+    the other_region.
 
     Parameters
     ----------
-    selectedregion : str
-    otherregion : str
+    selected_region : Region
+    other_region : Region
+
+    Returns
+    -------
+    float or None
+        Percentage overlap ; None if there is no overlap
     """
-    if otherregion in simfpregions:
-        return selectedregion in simfpregions[otherregion].overlaps
-    return False
+    if selected_region != other_region:
+        if selected_region.chrom_id == other_region.chrom_id:
+            if selected_region.start <= other_region.end and other_region.start <= selected_region.end:
+                selected_region_size = selected_region.end - selected_region.start
+
+                # Determine the size of the overlap
+                non_overlap_size = 0
+                if selected_region.start < other_region.start:
+                    non_overlap_size += other_region.start - selected_region.start
+                if selected_region.start > other_region.end:
+                    non_overlap_size += selected_region.end - other_region.end
+
+                # Determine the overlap percentage
+                overlap_size = selected_region_size - non_overlap_size
+                if overlap_size > 0:
+                    return (overlap_size/selected_region_size)*100
+    return None
 
 
 def filter_uniquefps_with_similars(simfp_filterlist, unifpregions):
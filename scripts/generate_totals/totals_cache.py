@@ -0,0 +1,335 @@
+#!/usr/bin/env python
+import hashlib
+import json
+
+from classes.region import Region
+import generate_totals.classifications as gtcf
+
+
+# Increase when the layout of the per-sample aggregates changes.
+CACHE_VERSION = 1
+CACHE_SUFFIX = ".totals_cache.json"
+
+
+def get_file_hash(infileloc):
+    """Determine and return the SHA1 hash of a file.
+
+    Parameters
+    ----------
+    infileloc : str
+        Path to the file
+
+    Returns
+    -------
+    str
+        SHA1 hex digest of the file
+    """
+    file_hash = hashlib.sha1()
+    with open(infileloc, 'rb') as infile:
+        for filechunk in iter(lambda: infile.read(1024 * 1024), b""):
+            file_hash.update(filechunk)
+    return file_hash.hexdigest()
+
+
+def read_sample_lines(infileloc):
+    """Read and return the lines of a classification file grouped per sample.
+
+    Parameters
+    ----------
+    infileloc : str
+        Path to file with classified CNV calls
+
+    Returns
+    -------
+    sample_lines : dict
+        Lines of the classification file per sample, in order of first appearance
+    """
+    sample_lines = {}
+    with open(infileloc, 'r') as infile:
+        next(infile)
+        for fileline in infile:
+            samplename = fileline.split("\t", 1)[0]
+            if samplename not in sample_lines:
+                sample_lines[samplename] = []
+            sample_lines[samplename].append(fileline)
+    return sample_lines
+
+
+def make_sample_aggregate(samplelines):
+    """Make and return the partial totals of the classified calls of a
+    single sample.
+
+    Parameters
+    ----------
+    samplelines : list of str
+        Classification file lines of the sample
+
+    Returns
+    -------
+    sample_aggregate : dict
+        Classification label counts, True Positive array CNVs, found array CNVs and False Positive regions,
+        and the classification label counts and True Positive array CNVs per dualBED label
+    """
+    sample_aggregate = {"labels": {}, "tp_arraycnvs": [], "found_arraycnvs": [], "fp_regions": [],
+                        "dualbed": {"Shared": {"labels": {}, "tp_arraycnvs": []},
+                                    "Overlapping": {"labels": {}, "tp_arraycnvs": []},
+                                    "Unique": {"labels": {}, "tp_arraycnvs": []}}}
+    for fileline in samplelines:
+        filelinedata = fileline.strip().split("\t")
+        classlabel = gtcf.determine_clasification_totals_label(filelinedata[10])
+        sample_aggregate["labels"][classlabel] = sample_aggregate["labels"].get(classlabel, 0) + 1
+
+        # Calls without the Shared or Overlapping dualBED label are counted as Unique
+        dualbedlabel = filelinedata[-1] if filelinedata[-1] in ("Shared", "Overlapping") else "Unique"
+        dualbed_aggregate = sample_aggregate["dualbed"][dualbedlabel]
+        if classlabel == "True Positive":
+            dualbed_aggregate["tp_arraycnvs"].append(filelinedata[4])
+        else:
+            dualbed_aggregate["labels"][classlabel] = dualbed_aggregate["labels"].get(classlabel, 0) + 1
+
+        if classlabel == "True Positive" and filelinedata[4] not in sample_aggregate["tp_arraycnvs"]:
+            sample_aggregate["tp_arraycnvs"].append(filelinedata[4])
+        if filelinedata[4] != "NA" and filelinedata[4] not in sample_aggregate["found_arraycnvs"]:
+            sample_aggregate["found_arraycnvs"].append(filelinedata[4])
+        if filelinedata[10] == "FALSE POSITIVE":
+            sample_aggregate["fp_regions"].append(filelinedata[1])
+    return sample_aggregate
+
+
+def read_cache(cachefileloc):
+    """Read and return a totals cache, or an empty cache if it can not be used.
+
+    Parameters
+    ----------
+    cachefileloc : str
+        Path to the cache file
+
+    Returns
+    -------
+    dict
+        Cached file hash and per-sample hashes and aggregates
+    """
+    try:
+        with open(cachefileloc, 'r') as cachefile:
+            totals_cache = json.load(cachefile)
+        if totals_cache.get("version") == CACHE_VERSION:
+            return totals_cache
+    except (IOError, ValueError):
+        pass
+    return {"version": CACHE_VERSION, "file_hash": None, "samples": {}}
+
+
+def write_cache(cachefileloc, totalscache):
+    """Write a totals cache.
+
+    Parameters
+    ----------
+    cachefileloc : str
+        Path to write the cache file to
+    totalscache : dict
+        File hash and per-sample hashes and aggregates
+
+    Returns
+    -------
+    file_written : bool
+        True if file has been successfully written, False if not
+    """
+    file_written = False
+    try:
+        with open(cachefileloc, 'w') as cachefile:
+            json.dump(totalscache, cachefile)
+        file_written = True
+    except IOError:
+        print(f"Could not write totals cache {cachefileloc}")
+    finally:
+        return file_written
+
+
+def get_sample_aggregates(infileloc, usecache=True):
+    """Determine and return the partial totals per sample of a classification
+    file.
+
+    The aggregates are cached next to the classification file. If the file
+    is unchanged all aggregates are taken from the cache, otherwise only the
+    samples whose lines have changed are aggregated again.
+
+    Parameters
+    ----------
+    infileloc : str
+        Path to file with classified CNV calls
+    usecache : bool
+        Whether to read and update the cache
+
+    Returns
+    -------
+    sample_aggregates : dict
+        Partial totals per sample, in order of first appearance in the file
+    """
+    cachefileloc = infileloc + CACHE_SUFFIX
+    totals_cache = {"version": CACHE_VERSION, "file_hash": None, "samples": {}}
+    file_hash = None
+    try:
+        if usecache:
+            totals_cache = read_cache(cachefileloc)
+            file_hash = get_file_hash(infileloc)
+            if totals_cache["file_hash"] == file_hash:
+                print("...Using cached totals for all samples...")
+                return {samplename: totals_cache["samples"][samplename]["aggregate"] for samplename in totals_cache["samples"]}
+        sample_lines = read_sample_lines(infileloc)
+    except (IOError, StopIteration):
+        print(f"Could not read input file {infileloc}")
+        return {}
+
+    sample_aggregates = {}
+    cached_samples = {}
+    num_of_reused = 0
+    for samplename, samplelines in sample_lines.items():
+        sample_hash = hashlib.sha1("".join(samplelines).encode()).hexdigest()
+        cached_sample = totals_cache["samples"].get(samplename)
+        if cached_sample is not None and cached_sample["hash"] == sample_hash:
+            num_of_reused += 1
+        else:
+            cached_sample = {"hash": sample_hash, "aggregate": make_sample_aggregate(samplelines)}
+        cached_samples[samplename] = cached_sample
+        sample_aggregates[samplename] = cached_sample["aggregate"]
+
+    if usecache:
+        print(f"...Reused cached totals for {num_of_reused} of {len(sample_aggregates)} samples...")
+        write_cache(cachefileloc, {"version": CACHE_VERSION, "file_hash": file_hash, "samples": cached_samples})
+    return sample_aggregates
+
+
+def merge_classification_totals(sampleaggregates, tpperacnv):
+    """Merge and return the totals per classification label of all samples.
+
+    Parameters
+    ----------
+    sampleaggregates : dict
+        Partial totals per sample
+    tpperacnv : bool
+        Count TPs per array CNV or not
+
+    Returns
+    -------
+    classificationtotals : dict
+        Totals for each classification label
+    """
+    classificationtotals = {}
+    for samplename in sampleaggregates:
+        for classlabel, labelcount in sampleaggregates[samplename]["labels"].items():
+            classificationtotals[classlabel] = classificationtotals.get(classlabel, 0) + labelcount
+    if tpperacnv:
+        classificationtotals["True Positive"] = sum([len(sampleaggregates[samplename]["tp_arraycnvs"]) for samplename in sampleaggregates])
+    return classificationtotals
+
+
+def merge_found_arraycnvs(sampleaggregates, arraycnvs):
+    """Merge and return the found array CNVs of all samples.
+
+    Parameters
+    ----------
+    sampleaggregates : dict
+        Partial totals per sample
+    arraycnvs : dict
+        Read array CNV data from array CNV file
+
+    Returns
+    -------
+    array_cnvs_found : dict
+        Found array CNVs saved per sample
+    """
+    array_cnvs_found = {}
+    for samplename in sampleaggregates:
+        if len(sampleaggregates[samplename]["found_arraycnvs"]) > 0:
+            array_cnvs_found[samplename] = [arraycnvs[samplename][acnvregion] for acnvregion in sampleaggregates[samplename]["found_arraycnvs"]]
+    return array_cnvs_found
+
+
+def merge_fp_regions(sampleaggregates):
+    """Merge and return the False Positive regions of all samples.
+
+    Parameters
+    ----------
+    sampleaggregates : dict
+        Partial totals per sample
+
+    Returns
+    -------
+    list of Region
+        False Positive regions
+    """
+    return [Region.from_str(fpregion) for samplename in sampleaggregates for fpregion in sampleaggregates[samplename]["fp_regions"]]
+
+
+def merge_dualbed_totals(sampleaggregates, dualbedlabel, tpperacnv):
+    """Merge and return the totals per classification label of all calls
+    with a specified dualBED label.
+
+    Parameters
+    ----------
+    sampleaggregates : dict
+        Partial totals per sample of a dualBED file
+    dualbedlabel : str
+        dualBED label (Shared or Unique)
+    tpperacnv : bool
+        Count TPs per array CNV or not
+
+    Returns
+    -------
+    dualbedtotals : dict
+        Totals for each classification label
+    """
+    dualbedtotals = {}
+    num_of_tps = 0
+    for samplename in sampleaggregates:
+        dualbed_aggregate = sampleaggregates[samplename]["dualbed"][dualbedlabel]
+        for classlabel, labelcount in dualbed_aggregate["labels"].items():
+            dualbedtotals[classlabel] = dualbedtotals.get(classlabel, 0) + labelcount
+        if tpperacnv:
+            num_of_tps += len(set(dualbed_aggregate["tp_arraycnvs"]))
+        else:
+            num_of_tps += len(dualbed_aggregate["tp_arraycnvs"])
+    if num_of_tps > 0 or tpperacnv:
+        dualbedtotals["True Positive"] = num_of_tps
+    return dualbedtotals
+
+
+def merge_overlapping_totals(normalaggregates, hcaggregates, tpperacnv):
+    """Merge and return the totals per classification label of the normal and
+    High Confident Overlapping calls.
+
+    True Positives with an array CNV also found by a normal Shared call are
+    not counted.
+
+    Parameters
+    ----------
+    normalaggregates : dict
+        Partial totals per sample of the normal dualBED file
+    hcaggregates : dict
+        Partial totals per sample of the High Confident dualBED file
+    tpperacnv : bool
+        Count TPs per array CNV or not
+
+    Returns
+    -------
+    overlapping_totals : dict
+        Overlapping totals
+    """
+    overlapping_totals = {}
+    for samplename in list(normalaggregates) + [x for x in hcaggregates if x not in normalaggregates]:
+        shared_filter = set()
+        sample_tps = []
+        for sampleaggregates in (normalaggregates, hcaggregates):
+            if samplename in sampleaggregates:
+                overlapping_aggregate = sampleaggregates[samplename]["dualbed"]["Overlapping"]
+                for classlabel, labelcount in overlapping_aggregate["labels"].items():
+                    overlapping_totals[classlabel] = overlapping_totals.get(classlabel, 0) + labelcount
+                sample_tps.extend(overlapping_aggregate["tp_arraycnvs"])
+        if samplename in normalaggregates:
+            shared_filter = set(normalaggregates[samplename]["dualbed"]["Shared"]["tp_arraycnvs"])
+
+        sample_tps = [x for x in sample_tps if x not in shared_filter]
+        if len(sample_tps) > 0:
+            num_of_tps = len(set(sample_tps)) if tpperacnv else len(sample_tps)
+            overlapping_totals["True Positive"] = overlapping_totals.get("True Positive", 0) + num_of_tps
+    return overlapping_totals
@@ -1,30 +1,105 @@
 #!/usr/bin/env python
 # USAGE:
 # THIS SCRIPT LINKS GENE NAMES BACK TO THE REGIONS IN THE HC_target.bed FILE.
-# FIRST MAKE AN ALT_SLICED_BED FILE USING MY `alt_slice_bed_file.py` TO MAKE A SLICED BED FILE WITH GENE NAMES RETAINED
+# FIRST MAKE AN ALT_SLICED_BED FILE USING MY `alt_slice_bed_file.py` OR `bed_slicer.py` TO MAKE A SLICED BED FILE WITH GENE NAMES RETAINED
+# python add_genenames_to_hcbedfile.py alt_sliced.bed HC_target.bed > HC_target_genes.bed
+import os
 import sys
+from itertools import groupby
 
-# Read the alt_sliced_merged.bed file.
-alt_sliced_bed = {}
-try:
-    with open(sys.argv[1], 'r') as altsliced:
-        for altline in altsliced:
-            altlinedata = altline.strip().split("\t")
-            region_str = f"{altlinedata[0]}:{altlinedata[1]}-{altlinedata[2]}"
-            if region_str not in alt_sliced_bed:
-                alt_sliced_bed[region_str] = altlinedata[3]
-except IOError:
-    print(f"Could not open {sys.argv[1]}")
-
-
-# Check that alt sliced data has been read. If so loink gene names to regions in HC_target.bed
-if len(alt_sliced_bed) > 0:
+import bed_slicer as bs
+
+
+def read_hc_chromosomes(hcbedloc):
+    """Read the HC BED file and yield the regions per chromosome.
+
+    Parameters
+    ----------
+    hcbedloc : str
+        Path to HC BED file, with the regions of each chromosome together
+
+    Yields
+    ------
+    chromname : str
+        Chromosome name
+    iterator of tuple
+        Chromosome, start and end of each region on the chromosome
+    """
+    with open(hcbedloc, 'r') as hcbedfile:
+        hc_regions = ((hclinedata[0], int(hclinedata[1]), int(hclinedata[2]))
+                      for hclinedata in (hcline.strip().split("\t") for hcline in hcbedfile) if len(hclinedata) >= 3)
+        yield from groupby(hc_regions, key=lambda hcregion: hcregion[0])
+
+
+def annotate_chrom_regions(hcregions, genedslices):
+    """Add the gene names of the overlapping gene annotated slices to the HC
+    regions of a single chromosome.
+
+    Both the HC regions and the gene annotated slices are sorted on start and
+    are read in a single pass, keeping only the slices overlapping the current
+    HC region in memory.
+
+    Parameters
+    ----------
+    hcregions : iterable of tuple
+        Chromosome, start and end of the HC regions, sorted on start
+    genedslices : iterable of list of str
+        Fields of the gene annotated slices, sorted on start
+
+    Yields
+    ------
+    tuple
+        Chromosome, start, end and comma separated gene names of each HC region with at least one overlapping slice
+    """
+    genedslices = iter(genedslices)
+    next_slice = next(genedslices, None)
+    active_slices = []
+    for chromname, hcstart, hcend in hcregions:
+        while next_slice is not None and int(next_slice[1]) < hcend:
+            active_slices.append((int(next_slice[1]), int(next_slice[2]), next_slice[3] if len(next_slice) > 3 else ""))
+            next_slice = next(genedslices, None)
+        active_slices = [activeslice for activeslice in active_slices if activeslice[1] > hcstart]
+        gene_names = []
+        for slicestart, sliceend, slicenames in active_slices:
+            if slicestart < hcend:
+                gene_names.extend([genename for genename in slicenames.split(",") if genename != "" and genename not in gene_names])
+        if len(gene_names) > 0:
+            yield chromname, hcstart, hcend, ",".join(gene_names)
+
+
+def is_sorted_copy_current(altslicedloc, sortedloc):
+    """Return whether the sorted copy of the alt sliced BED file and its index
+    exist and are not older than the alt sliced BED file."""
+    sortedindexloc = f"{sortedloc}{bs.INDEX_SUFFIX}"
+    if not os.path.isfile(sortedloc) or not os.path.isfile(sortedindexloc):
+        return False
+    return min(os.path.getmtime(sortedloc), os.path.getmtime(sortedindexloc)) >= os.path.getmtime(altslicedloc)
+
+
+def main():
+    altslicedloc = sys.argv[1]
+    # The alt sliced BED file needs to be sorted and indexed to read it per chromosome. A sorted copy made
+    # by an earlier run is reused as long as it is not older than the alt sliced BED file.
+    sortedloc = f"{altslicedloc}.sorted"
+    if not os.path.isfile(f"{altslicedloc}{bs.INDEX_SUFFIX}"):
+        if not is_sorted_copy_current(altslicedloc, sortedloc):
+            print(f"Sorting and indexing {altslicedloc} into {sortedloc}", file=sys.stderr)
+            try:
+                bs.sort_and_index_bed(altslicedloc, sortedloc)
+            except IOError as ioerr:
+                print(f"Could not sort and index {altslicedloc} into {sortedloc}: {ioerr.strerror}")
+                return
+        altslicedloc = sortedloc
+    slice_index = bs.read_slice_index(f"{altslicedloc}{bs.INDEX_SUFFIX}")
+
+    # Link the gene names to the regions in HC_target.bed, one chromosome at a time.
     try:
-        with open(sys.argv[2]) as hcbedfile:
-            for hcline in hcbedfile:
-                hclinedata = hcline.strip().split("\t")
-                hcregion = f"{hclinedata[0]}:{hclinedata[1]}-{hclinedata[2]}"
-                if hcregion in alt_sliced_bed:
-                    print(f"{hclinedata[0]}\t{hclinedata[1]}\t{hclinedata[2]}\t{alt_sliced_bed[hcregion]}")
+        for chromname, hcregions in read_hc_chromosomes(sys.argv[2]):
+            for hcregion in annotate_chrom_regions(hcregions, bs.read_chrom_slices(altslicedloc, chromname, slice_index)):
+                print(f"{hcregion[0]}\t{hcregion[1]}\t{hcregion[2]}\t{hcregion[3]}")
     except IOError:
         print(f"Could not open HC_target bed file {sys.argv[2]}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,23 +1,15 @@
 #! /usr/bin/env python
 import sys
 
-bed_file = open(sys.argv[1],"r")  # BED file
-tlen = float(sys.argv[2]) # targeted length of target/exons
+import bed_slicer as bs
 
-for line in bed_file:
-    splitline = line.split()
-    leng = float(splitline[2]) - float(splitline[1])
-    if leng >= (2 * tlen):
-        regions = round(leng / tlen)
-        chunk = round(leng / regions)
-        start = int(splitline[1])
-        name = splitline[3]
-        for i in range(0, regions - 1):
-            stop = start + chunk
-            print("{chr}\t{start}\t{stop}\t{name}".format(chr=splitline[0], start=start, stop=stop, name=name))
-            start += chunk
-        print("{chr}\t{start}\t{stop}\t{name}".format(chr=splitline[0], start=start, stop=splitline[2], name=name))
-    else:
-        print(line.rstrip())
 
-bed_file.close()
+def main():
+    """Slice the BED file (sys.argv[1]) into regions of the targeted length
+    (sys.argv[2]) while retaining the gene names and print the slices."""
+    for bedslice in bs.slice_regions(bs.read_bed_regions(sys.argv[1]), float(sys.argv[2])):
+        print("\t".join(bedslice))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,323 @@
+#!/usr/bin/env python
+import struct
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+
+
+# Layout of the binary index of a sliced BED file.
+INDEX_MAGIC = b"BSI\1"
+INDEX_SUFFIX = ".bsi"
+
+# How overlapping regions are handled before slicing
+OVERLAP_POLICIES = ("keep", "merge")
+
+
+def get_params():
+    """Define CLI parameters and return the set values.
+
+    Returns
+    -------
+    dict
+        Set parameter values
+    """
+    slicer_args = argparse.ArgumentParser()
+    slicer_args.add_argument("-i", "--infile", type=str, required=True, dest="infile", help="Path to the BED file to slice")
+    slicer_args.add_argument("-o", "--outfile", type=str, required=True, dest="outfile", help="Path to write the sorted sliced BED file to, the index is written next to it")
+    slicer_args.add_argument("-s", "--slice-size", type=int, default=300, dest="slice-size", help="Targeted length of the slices [300]")
+    slicer_args.add_argument("-p", "--overlap-policy", type=str, default="keep", choices=OVERLAP_POLICIES, dest="overlap-policy", help="Slice overlapping regions separately (keep) or merge them first (merge) [keep]")
+    slicer_args.add_argument("-w", "--workers", type=int, default=1, dest="workers", help="Number of chromosomes to slice at the same time [1]")
+    return vars(slicer_args.parse_args())
+
+
+def read_bed_regions(bedfileloc):
+    """Read and yield the regions of a BED file one at a time.
+
+    Parameters
+    ----------
+    bedfileloc : str
+        Path to BED file
+
+    Yields
+    ------
+    list of str
+        Fields of a BED region
+    """
+    with open(bedfileloc, 'r') as bedfile:
+        for fileline in bedfile:
+            if fileline.strip() != "" and not fileline.startswith(("#", "track", "browser")):
+                yield fileline.split()
+
+
+def slice_region(regionfields, slicesize):
+    """Slice a single BED region and yield the slices.
+
+    As in slice_bed_file.py, regions of at least twice the slice size are
+    divided into equally sized slices of about the slice size, with the last
+    slice ending at the region end. Smaller regions are yielded unchanged.
+
+    Parameters
+    ----------
+    regionfields : list of str
+        Fields of the BED region, the name is kept if present
+    slicesize : float
+        Targeted length of the slices
+
+    Yields
+    ------
+    list of str
+        Fields of a slice
+    """
+    region_length = float(regionfields[2]) - float(regionfields[1])
+    if region_length < 2 * slicesize:
+        yield regionfields
+        return
+    num_of_slices = round(region_length / slicesize)
+    chunk = round(region_length / num_of_slices)
+    start = int(regionfields[1])
+    for slicenum in range(0, num_of_slices - 1):
+        yield [regionfields[0], str(start), str(start + chunk)] + regionfields[3:4]
+        start += chunk
+    yield [regionfields[0], str(start), regionfields[2]] + regionfields[3:4]
+
+
+def merge_regions(regions):
+    """Merge overlapping regions of a single chromosome sorted on start and
+    yield the merged regions, joining the names of the merged regions.
+
+    Parameters
+    ----------
+    regions : iterable of list of str
+        Fields of the BED regions, sorted on start
+
+    Yields
+    ------
+    list of str
+        Fields of a merged region
+    """
+    merged_region = None
+    for region in regions:
+        if merged_region is not None and int(region[1]) < int(merged_region[2]):
+            merged_region[2] = str(max(int(merged_region[2]), int(region[2])))
+            # A region without a name takes the name of the first named region merged into it
+            if len(region) > 3 and len(merged_region) < 4:
+                merged_region.append(region[3])
+            elif len(region) > 3 and region[3] not in merged_region[3].split(","):
+                merged_region[3] = f"{merged_region[3]},{region[3]}"
+            continue
+        if merged_region is not None:
+            yield merged_region
+        merged_region = region[:4]
+    if merged_region is not None:
+        yield merged_region
+
+
+def slice_regions(regions, slicesize, overlappolicy="keep"):
+    """Slice BED regions and yield the slices.
+
+    Parameters
+    ----------
+    regions : iterable of list of str
+        Fields of the BED regions, for the merge policy of a single chromosome sorted on start
+    slicesize : float
+        Targeted length of the slices
+    overlappolicy : str
+        Slice overlapping regions separately (keep) or merge them first (merge)
+
+    Yields
+    ------
+    list of str
+        Fields of a slice
+    """
+    if overlappolicy == "merge":
+        regions = merge_regions(regions)
+    for region in regions:
+        yield from slice_region(region, slicesize)
+
+
+def get_chrom_sort_key(chromname):
+    """Return the sort key of a chromosome, sorting numbered chromosomes
+    numerically followed by X, Y and any other contigs."""
+    chromname_nochr = chromname[3:] if chromname.startswith("chr") else chromname
+    if chromname_nochr.isdigit():
+        return (0, int(chromname_nochr), chromname)
+    return (1, {"X": 0, "Y": 1, "M": 2, "MT": 2}.get(chromname_nochr, 3), chromname)
+
+
+def slice_chromosome(chromregions, slicesize, overlappolicy):
+    """Sort, slice and return the BED lines of the regions of one chromosome.
+
+    Parameters
+    ----------
+    chromregions : list of list of str
+        Fields of the BED regions of one chromosome
+    slicesize : float
+        Targeted length of the slices
+    overlappolicy : str
+        Slice overlapping regions separately (keep) or merge them first (merge)
+
+    Returns
+    -------
+    list of str
+        BED lines of the slices, sorted on start
+    """
+    chromregions.sort(key=lambda region: (int(region[1]), int(region[2])))
+    chrom_slices = list(slice_regions(chromregions, slicesize, overlappolicy))
+    chrom_slices.sort(key=lambda bedslice: (int(bedslice[1]), int(bedslice[2])))
+    return ["\t".join(bedslice) + "\n" for bedslice in chrom_slices]
+
+
+def write_sliced_bed(bedfileloc, outfileloc, slicesize, overlappolicy="keep", numofworkers=1):
+    """Slice a BED file per chromosome and write the sorted slices and a
+    binary index with the location of each chromosome in the output file.
+
+    With more than one worker the chromosomes are sliced in parallel.
+
+    Parameters
+    ----------
+    bedfileloc : str
+        Path to BED file to slice
+    outfileloc : str
+        Path to write the sliced BED file to
+    slicesize : float
+        Targeted length of the slices
+    overlappolicy : str
+        Slice overlapping regions separately (keep) or merge them first (merge)
+    numofworkers : int
+        Number of chromosomes to slice at the same time
+
+    Returns
+    -------
+    slice_index : dict
+        Byte offset and number of slices per chromosome in the output file
+    """
+    chrom_regions = {}
+    for region in read_bed_regions(bedfileloc):
+        chrom_regions.setdefault(region[0], []).append(region)
+    chrom_names = sorted(chrom_regions, key=get_chrom_sort_key)
+
+    slice_index = {}
+    with open(outfileloc, 'wb') as outfile:
+        if numofworkers > 1:
+            with ProcessPoolExecutor(max_workers=numofworkers) as slice_executor:
+                chrom_slices = slice_executor.map(slice_chromosome, [chrom_regions[chromname] for chromname in chrom_names],
+                                                  [slicesize] * len(chrom_names), [overlappolicy] * len(chrom_names))
+                write_chrom_slices(outfile, chrom_names, chrom_slices, slice_index)
+        else:
+            chrom_slices = (slice_chromosome(chrom_regions[chromname], slicesize, overlappolicy) for chromname in chrom_names)
+            write_chrom_slices(outfile, chrom_names, chrom_slices, slice_index)
+    write_slice_index(f"{outfileloc}{INDEX_SUFFIX}", slice_index)
+    return slice_index
+
+
+def write_chrom_slices(outfile, chromnames, chromslices, sliceindex):
+    """Write the slices of each chromosome and add their byte offset and
+    number of slices to the slice index.
+
+    Parameters
+    ----------
+    outfile : file
+        Binary output file to write the slices to
+    chromnames : list of str
+        Chromosome names in output order
+    chromslices : iterable of list of str
+        BED lines of the slices per chromosome, in the order of the chromosome names
+    sliceindex : dict
+        Byte offset and number of slices per chromosome, updated while writing
+    """
+    for chromname, slicelines in zip(chromnames, chromslices):
+        sliceindex[chromname] = (outfile.tell(), len(slicelines))
+        outfile.write("".join(slicelines).encode())
+
+
+def sort_and_index_bed(bedfileloc, outfileloc):
+    """Write a sorted copy of an already sliced BED file with its binary
+    index, without slicing the regions again.
+
+    Returns
+    -------
+    slice_index : dict
+        Byte offset and number of slices per chromosome in the output file
+    """
+    return write_sliced_bed(bedfileloc, outfileloc, float("inf"))
+
+
+def write_slice_index(indexfileloc, sliceindex):
+    """Write the binary index of a sliced BED file.
+
+    Parameters
+    ----------
+    indexfileloc : str
+        Path to write the index to
+    sliceindex : dict
+        Byte offset and number of slices per chromosome
+    """
+    with open(indexfileloc, 'wb') as indexfile:
+        indexfile.write(INDEX_MAGIC + struct.pack("<I", len(sliceindex)))
+        for chromname, (chromoffset, numofslices) in sliceindex.items():
+            chrombytes = chromname.encode()
+            indexfile.write(struct.pack("<H", len(chrombytes)) + chrombytes + struct.pack("<QQ", chromoffset, numofslices))
+
+
+def read_slice_index(indexfileloc):
+    """Read and return the binary index of a sliced BED file.
+
+    Parameters
+    ----------
+    indexfileloc : str
+        Path to the index
+
+    Returns
+    -------
+    slice_index : dict
+        Byte offset and number of slices per chromosome, in file order
+    """
+    slice_index = {}
+    with open(indexfileloc, 'rb') as indexfile:
+        if indexfile.read(4) != INDEX_MAGIC:
+            raise ValueError(f"{indexfileloc} is not a sliced BED index")
+        num_of_chroms = struct.unpack("<I", indexfile.read(4))[0]
+        for chromnum in range(num_of_chroms):
+            chromname_length = struct.unpack("<H", indexfile.read(2))[0]
+            chromname = indexfile.read(chromname_length).decode()
+            slice_index[chromname] = struct.unpack("<QQ", indexfile.read(16))
+    return slice_index
+
+
+def read_chrom_slices(slicedbedloc, chromname, sliceindex=None):
+    """Read and yield the slices of a single chromosome from a sliced BED
+    file, using its index to seek to the chromosome.
+
+    Parameters
+    ----------
+    slicedbedloc : str
+        Path to the sliced BED file
+    chromname : str
+        Chromosome to read the slices of
+    sliceindex : dict
+        Index of the sliced BED file, read from disk if not supplied
+
+    Yields
+    ------
+    list of str
+        Fields of a slice
+    """
+    if sliceindex is None:
+        sliceindex = read_slice_index(f"{slicedbedloc}{INDEX_SUFFIX}")
+    if chromname not in sliceindex:
+        return
+    chromoffset, numofslices = sliceindex[chromname]
+    with open(slicedbedloc, 'rb') as slicedbedfile:
+        slicedbedfile.seek(chromoffset)
+        for slicenum in range(numofslices):
+            yield slicedbedfile.readline().decode().rstrip("\n").split("\t")
+
+
+def main():
+    slicer_params = get_params()
+    slice_index = write_sliced_bed(slicer_params["infile"], slicer_params["outfile"], float(slicer_params["slice-size"]),
+                                   slicer_params["overlap-policy"], slicer_params["workers"])
+    print(f"Wrote {sum([x[1] for x in slice_index.values()])} slices on {len(slice_index)} chromosomes to {slicer_params['outfile']}")
+
+
+if __name__ == "__main__":
+    main()
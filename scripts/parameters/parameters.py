@@ -31,6 +31,11 @@ def get_classification_parameters(tool_choices):
     cmd_args.add_argument("-fn", "--filter-neutrals", dest="filterneutrals", action="store_true", help="Filter out neutrals calls (GATK4 specific)?")
     cmd_args.add_argument("-cs", "--cnv-size", type=int, dest="cnvsize", help="Minimum required CNV size")
     cmd_args.add_argument("-ed", "--edsamples", type=str, dest="exomedepthsamples", help="Path to table linking samples and ExomeDepth output files")
+    cmd_args.add_argument("-sw", "--sweep", dest="sweep", action="store_true", help="Evaluate a grid of classification thresholds instead of writing classifications")
+    cmd_args.add_argument("-snp", "--sweep-probes", type=int, nargs="+", dest="sweepprobes", help="Minimum required numbers of probes to evaluate in the sweep")
+    cmd_args.add_argument("-sne", "--sweep-exons", type=int, nargs="+", dest="sweepexons", help="Minimum required numbers of exons to evaluate in the sweep")
+    cmd_args.add_argument("-spo", "--sweep-overlap", type=int, nargs="+", dest="sweepoverlap", help="Percentages overlap to evaluate in the sweep")
+    cmd_args.add_argument("-scs", "--sweep-size", type=int, nargs="+", dest="sweepsize", help="Minimum required CNV sizes to evaluate in the sweep")
     return vars(cmd_args.parse_args())
 
 
@@ -63,6 +68,8 @@ def get_comparison_parameters(tool_choices):
     compare_args.add_argument("-2", "--file2", type=str, dest="file2", help="Path to second CNV calling classification file")
     compare_args.add_argument("-l1", "--label1", type=str, dest="label1", help="Label to use for the first tool")
     compare_args.add_argument("-l2", "--label2", type=str, dest="label2", help="Label to use for the second tool")
+    compare_args.add_argument("-f", "--files", type=str, nargs="+", dest="files", help="Paths to the CNV calling classification files of all tools to compare")
+    compare_args.add_argument("-l", "--labels", type=str, nargs="+", dest="labels", help="Labels to use for the tools, in the same order as the files")
     compare_args.add_argument("--tp-per-acnv", dest="tp-per-acnv", action="store_true", help="Count TPs only per array CNV")
     return vars(compare_args.parse_args())
 
@@ -109,6 +116,10 @@ def get_filtering_parameters(tool_choices):
     filter_args.add_argument("-u", "--commoncnvs", dest="commoncnvs", type=str, help="Path to file with Common CNVs")
     filter_args.add_argument("-C", "--colname", dest="colname", type=str, help="Column name for size filtering")
     filter_args.add_argument("-S", "--cnvsize", dest="cnvsize", type=int, help="Minimum size for CNVs to be retained")
+    filter_args.add_argument("-N", "--na-colname", dest="nacolname", type=str, help="Column name for NA filtering with callfiltering")
+    filter_args.add_argument("-fn", "--filter-neutrals", dest="filterneutrals", action="store_true", help="Filter out neutral calls with callfiltering")
+    filter_args.add_argument("-r", "--removed-outfile", dest="removedoutfile", type=str, help="Path to write the calls removed by callfiltering to")
+    filter_args.add_argument("--profile-startup", dest="profile-startup", action="store_true", help="Report the import and load time per module and reference file")
     return vars(filter_args.parse_args())
 
 
@@ -134,6 +145,7 @@ def get_totals_parameters(tool_choices):
     totals_args.add_argument("-op", "--outprefix", dest="outprefix", type=str, help="Prefix to use for output file names")
     totals_args.add_argument("-po", "--percent-overlap", dest="percentoverlap", type=int, help="Minimum required percentage overlap")
     totals_args.add_argument("--tp-per-acnv", dest="tp-per-acnv", action="store_true", help="Count TPs only per array CNV")
+    totals_args.add_argument("-nc", "--no-cache", dest="no-cache", action="store_true", help="Do not read or update the cached per-sample totals next to the input file")
     return vars(totals_args.parse_args())
 
 
@@ -212,6 +224,11 @@ def parameters_are_ok(paramvalues, required_params, param_types):
                 if not os.path.isfile(paramvalues[paramname]):
                     incorrect_parameters.append(paramname)
 
+            # Check if all provided files exist.
+            elif param_types[paramname] == "inputfiles":
+                if not all([os.path.isfile(x) for x in paramvalues[paramname]]):
+                    incorrect_parameters.append(paramname)
+
             # Check whether the folder to write an output file to exists.
             elif param_types[paramname] == "outputfile":
                 outputdir = ""
@@ -229,6 +246,11 @@ def parameters_are_ok(paramvalues, required_params, param_types):
                 elif paramvalues[paramname] == "":
                     incorrect_parameters.append(paramname)
 
+            # Check to make sure that the parameter that should be a list of strings has no empty strings
+            elif param_types[paramname] == "strings":
+                if "" in paramvalues[paramname]:
+                    incorrect_parameters.append(paramname)
+
             # Check to make sure that the parameter that should be an integer is indeed an integer
             elif param_types[paramname] == "integer":
                 if not type(paramvalues[paramname]) == int:
@@ -14,6 +14,7 @@ import generate_totals.array_cnvs as gtac
 import generate_totals.classifications as gtcf
 import generate_totals.fp_regions as gtfr
 import generate_totals.total_calls as gttc
+import generate_totals.totals_cache as gttca
 import generate_totals.dualbed_acnvs as gtdbac
 import generate_totals.dualbed_ratios as gtdbr
 
@@ -94,7 +95,8 @@ def run_arraycnv(totalsparams):
     outpath = totalsparams["outfile"] + "/" + totalsparams["outprefix"]
     arraydata = ufr.read_array_cnvs(totalsparams["arrayfile"])
 
-    found_arraycnvs = gtac.determine_arraycnvs_found(totalsparams["infile"], arraydata)
+    sample_aggregates = gttca.get_sample_aggregates(totalsparams["infile"], not totalsparams["no-cache"])
+    found_arraycnvs = gttca.merge_found_arraycnvs(sample_aggregates, arraydata)
     found_summary = gtac.summarize_arraycnv_types(found_arraycnvs)
     missed_arraycnvs = gtac.determine_arraycnvs_missed(found_arraycnvs, arraydata)
     missed_summary = gtac.summarize_arraycnv_types(missed_arraycnvs)
@@ -147,9 +149,9 @@ def run_classification(totalsparams):
         Set CLI parameter values
     """
     print("...Reading classified CNV calls...")
-    gatkresults = ufr.read_classification_file(totalsparams["infile"])
+    sample_aggregates = gttca.get_sample_aggregates(totalsparams["infile"], not totalsparams["no-cache"])
     print("...Generating classification label totals...")
-    totalsdata = gtcf.generate_classification_totals(gatkresults, totalsparams["tp-per-acnv"])
+    totalsdata = gttca.merge_classification_totals(sample_aggregates, totalsparams["tp-per-acnv"])
     filewritten = ufw.write_classification_totals(totalsdata, totalsparams["outfile"])
     print(f"...Wrote outfile?: {filewritten}...")
 
@@ -162,20 +164,18 @@ def run_dualbed_classification_ratios(totalsparams):
     totalsparams : dict
         Set CLI parameter values
     """
-    normal_data = gtdbr.read_dualbed_data(totalsparams["infile"])
-    hc_data = gtdbr.read_dualbed_data(totalsparams["infile2"])
+    normal_aggregates = gttca.get_sample_aggregates(totalsparams["infile"], not totalsparams["no-cache"])
+    hc_aggregates = gttca.get_sample_aggregates(totalsparams["infile2"], not totalsparams["no-cache"])
 
     # Generate totals for Shared dualBED calls
-    shared_totals = gtcf.generate_classification_totals(normal_data["Shared"], totalsparams["tp-per-acnv"])
+    shared_totals = gttca.merge_dualbed_totals(normal_aggregates, "Shared", totalsparams["tp-per-acnv"])
 
     # Generate totals for Overlapping dualBED calls
-    overlapping_calls = gtdbr.merge_overlapping(normal_data["Overlapping"], hc_data["Overlapping"])
-    sharedfilter = gtdbr.form_shared_filter(normal_data["Shared"])
-    overlapping_totals = gtdbr.generate_overlapping_totals(overlapping_calls, sharedfilter, totalsparams["tp-per-acnv"])
+    overlapping_totals = gttca.merge_overlapping_totals(normal_aggregates, hc_aggregates, totalsparams["tp-per-acnv"])
 
     # Generate totals for Unique dualBED calls
-    nunique_totals = gtcf.generate_classification_totals(normal_data["Unique"], totalsparams["tp-per-acnv"])
-    hcunique_totals = gtcf.generate_classification_totals(hc_data["Unique"], totalsparams["tp-per-acnv"])
+    nunique_totals = gttca.merge_dualbed_totals(normal_aggregates, "Unique", totalsparams["tp-per-acnv"])
+    hcunique_totals = gttca.merge_dualbed_totals(hc_aggregates, "Unique", totalsparams["tp-per-acnv"])
 
     # Write the results to file
     gtdbr.write_dualbed_ratios(totalsparams["outfile"], shared_totals, overlapping_totals, nunique_totals, hcunique_totals)
@@ -190,7 +190,7 @@ def run_fpregions(totalsparams):
         Set CLI parameter values
     """
     # Read False Positive regions and count there occurences
-    fpregions = ufr.read_fp_classifications(totalsparams["infile"])
+    fpregions = gttca.merge_fp_regions(gttca.get_sample_aggregates(totalsparams["infile"], not totalsparams["no-cache"]))
     fpregion_counts = dict(Counter(fpregions))
 
     # Split the fpregion_counts into unique and duplicated regions. Also similar regions if needed
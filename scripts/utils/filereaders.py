@@ -3,6 +3,7 @@ from classes.arraycnv import ArrayCnv
 from classes.exon import Exon
 from classes.probe import Probe
 from classes.gatkcall import GatkCall
+from classes.region import Region
 
 
 def read_sample_table(samplefileloc):
@@ -224,6 +225,18 @@ def read_umcg_common_cnv_file(ccnvfileloc):
 
 
 def read_fp_classifications(classifications_fileloc):
+    """Read and return the False Positive regions of a classification file.
+
+    Parameters
+    ----------
+    classifications_fileloc : str
+        Path to file with classified CNV calls
+
+    Returns
+    -------
+    fp_data : list of Region
+        False Positive regions
+    """
     fp_data = []
     try:
         with open(classifications_fileloc, 'r') as infile:
@@ -231,7 +244,7 @@ def read_fp_classifications(classifications_fileloc):
             for fileline in infile:
                 filelinedata = fileline.strip().split("\t")
                 if filelinedata[10] == "FALSE POSITIVE":
-                    fp_data.append(filelinedata[1])
+                    fp_data.append(Region.from_str(filelinedata[1]))
     except IOError:
         print("Could not read supplied classifications file")
     finally:
@@ -1,4 +1,61 @@
 #!/usr/bin/env python
+import gzip
+
+# Import util scripts
+import utils.select_plot_region as uspr
+
+
+# Size of the write buffer of output files, so rows reach the disk in large chunks.
+WRITE_BUFFER_SIZE = 1024 * 1024
+
+
+def open_output_file(outfilepath):
+    """Open and return an output file for writing text.
+
+    Output files with a path ending in .gz are gzip compressed.
+
+    Parameters
+    ----------
+    outfilepath : str
+        Path to the output file
+
+    Returns
+    -------
+    file object
+        Opened output file with a large write buffer
+    """
+    if outfilepath.endswith(".gz"):
+        return gzip.open(outfilepath, 'wt', compresslevel=6)
+    return open(outfilepath, 'w', buffering=WRITE_BUFFER_SIZE)
+
+
+def make_file_line(linefields):
+    """Make and return a tab separated output file line."""
+    return "\t".join([str(x) for x in linefields]) + "\n"
+
+
+def write_file_lines(outfilepath, headerline, filelines):
+    """Write a header line and the lines produced by an iterable to an
+    output file.
+
+    The lines are not written one by one but handed to the buffered output
+    file at once, so lines can be produced by a generator without building
+    the whole file in memory.
+
+    Parameters
+    ----------
+    outfilepath : str
+        Path to the output file
+    headerline : str
+        Header line to write first
+    filelines : iterable of str
+        Lines to write
+    """
+    with open_output_file(outfilepath) as outfile:
+        outfile.write(headerline)
+        outfile.writelines(filelines)
+
+
 def write_output_file(outfilepath, headerline, intervaldata):
     """Write intervals overlapping with a genomic region to an output file.
 
@@ -10,17 +67,18 @@ def write_output_file(outfilepath, headerline, intervaldata):
         Overlapping intervals to write.
     """
     try:
-        with open(outfilepath, "w") as outfile:
-            outfile.write(headerline)
-            for region in intervaldata:
-                for overlapinterval in intervaldata[region]:
-                    interval_genomicpos = overlapinterval.split("\t")[0:3]
-                    intervallabel = make_interval_label(interval_genomicpos[0], interval_genomicpos[1], interval_genomicpos[2])
-                    outfile.write(f"{overlapinterval}\t{region}\t{intervallabel}\n")
+        write_file_lines(outfilepath, headerline, (make_interval_file_line(overlapinterval, region) for region in intervaldata for overlapinterval in intervaldata[region]))
     except IOError:
         print(f"Could not write to output file {outfilepath}")
 
 
+def make_interval_file_line(overlapinterval, region):
+    """Make and return the output file line for an interval."""
+    interval_genomicpos = overlapinterval.split("\t")[0:3]
+    intervallabel = uspr.make_interval_label(interval_genomicpos[0], interval_genomicpos[1], interval_genomicpos[2])
+    return f"{overlapinterval}\t{region}\t{intervallabel}\n"
+
+
 def write_seg_output_file(outfilepath, intervaldata):
     """Writes the output file for a SEG input file.
     
@@ -60,25 +118,24 @@ def write_cac_output_file(outfilepath, intervaldata):
         Overlapping intervals to write.
     """
     try:
-        with open(outfilepath, "w") as outfile:
-            outfile.write("CONTIG\tPOSITION\tREF_COUNT\tALT_COUNT\tREF_NUCLEOTIDE\tALT_NUCLEOTIDE\tOVERLAP\tLABEL\n")
-            for region in intervaldata:
-                for overlapinterval in intervaldata[region]:
-                    interval_genomicpos = overlapinterval.split("\t")[0:2]
-                    intervallabel = make_interval_label(interval_genomicpos[0], interval_genomicpos[1], interval_genomicpos[1])
-                    outfile.write(f"{overlapinterval}\t{region}\t{intervallabel}\n")
+        write_file_lines(outfilepath, "CONTIG\tPOSITION\tREF_COUNT\tALT_COUNT\tREF_NUCLEOTIDE\tALT_NUCLEOTIDE\tOVERLAP\tLABEL\n",
+                         (make_cac_file_line(overlapinterval, region) for region in intervaldata for overlapinterval in intervaldata[region]))
     except IOError:
         print(f"Could not write to output file {outfilepath}")
 
 
+def make_cac_file_line(overlapinterval, region):
+    """Make and return the output file line for an allelic count interval."""
+    interval_genomicpos = overlapinterval.split("\t")[0:2]
+    intervallabel = uspr.make_interval_label(interval_genomicpos[0], interval_genomicpos[1], interval_genomicpos[1])
+    return f"{overlapinterval}\t{region}\t{intervallabel}\n"
+
+
 def write_missedfound_arraycnvs(missedfound_arraycnvs, outfileloc):
     file_written = False
     try:
-        with open(outfileloc, 'w') as outfile:
-            outfile.write("Sample\tArray_CNV\t#_Probes\n")
-            for samplename in missedfound_arraycnvs:
-                for mfa_cnv in missedfound_arraycnvs[samplename]:
-                    outfile.write(f"{samplename}\t{mfa_cnv.get_region()}\t{mfa_cnv.num_of_probes()}\n")
+        write_file_lines(outfileloc, "Sample\tArray_CNV\t#_Probes\n",
+                         (f"{samplename}\t{mfa_cnv.get_region()}\t{mfa_cnv.num_of_probes()}\n" for samplename in missedfound_arraycnvs for mfa_cnv in missedfound_arraycnvs[samplename]))
         file_written = True
     except IOError:
         print(f"Could not write missed/found array cnv data to output file: {outfileloc}")
@@ -134,20 +191,14 @@ def write_duplicate_fpregions(outfileloc, dupfpregions):
         False Positive regions and counts
     """
     try:
-        with open(outfileloc, 'w') as outfile:
-            outfile.write("Region\tCount\n")
-            for dupregion in dupfpregions:
-                outfile.write(f"{dupregion}\t{dupfpregions[dupregion]}\n")
+        write_file_lines(outfileloc, "Region\tCount\n", (f"{dupregion}\t{dupfpregions[dupregion]}\n" for dupregion in dupfpregions))
     except IOError:
         print(f"Could not write duplicate False Positive regions to {outfileloc}")
 
 
 def write_unique_fpregions(outfileloc, unifpregions):
     try:
-        with open(outfileloc, 'w') as outfile:
-            outfile.write("Region\tCount\n")
-            for uniregion in unifpregions:
-                outfile.write(f"{uniregion}\t{unifpregions[uniregion]}\n")
+        write_file_lines(outfileloc, "Region\tCount\n", (f"{uniregion}\t{unifpregions[uniregion]}\n" for uniregion in unifpregions))
     except IOError:
         print(f"Could not write unique False Positive regions to {outfileloc}")
 
@@ -163,11 +214,8 @@ def write_similar_fpregions(outfileloc, simfpregions):
         Similar False Positive regions and overlapping regions
     """
     try:
-        with open(outfileloc, 'w') as outfile:
-            outfile.write("Region\tOverlap_Region\tOverlap_Percentage\n")
-            for simregion in simfpregions:
-                for overlapregion in simfpregions[simregion].overlaps:
-                    outfile.write(f"{simregion}\t{overlapregion}\t{simfpregions[simregion].overlaps[overlapregion]}\n")
+        write_file_lines(outfileloc, "Region\tOverlap_Region\tOverlap_Percentage\n",
+                         (f"{simregion}\t{overlapregion}\t{overlappercentage}\n" for simregion in simfpregions for overlapregion, overlappercentage in simfpregions[simregion].overlaps.items()))
     except IOError:
         print(f"Could not write similar False Positive region to {outfileloc}")
 
@@ -292,7 +340,7 @@ def write_fp_comparison(outfilepath, comparisondata, tool1_label, tool2_label):
                     for samplename in comparisondata[comparepoint]:
                         shared_sample_fps = len(comparisondata[comparepoint][samplename])
                         num_of_shared_fps += shared_sample_fps
-                        outfile.write("* [" + samplename + "]: {" +str(shared_sample_fps)+ "}\t" + ", ".join(comparisondata[comparepoint][samplename]) + "\n")
+                        outfile.write("* [" + samplename + "]: {" +str(shared_sample_fps)+ "}\t" + ", ".join(str(x) for x in comparisondata[comparepoint][samplename]) + "\n")
                     outfile.write(f"{tool1_label} and {tool2_label} both identified {num_of_shared_fps} False Positive calls\n")
                     outfile.write("\n\n")
 
@@ -304,7 +352,7 @@ def write_fp_comparison(outfilepath, comparisondata, tool1_label, tool2_label):
                         num_of_overlaps += sample_overlaps
                         outfile.write("* [" +samplename+ "]: {" +str(sample_overlaps)+ "}\t")
                         for overlappingfps in comparisondata[comparepoint][samplename]:
-                            outfile.write("(" +overlappingfps[0]+ " - " +overlappingfps[1]+ "), ")
+                            outfile.write(f"({overlappingfps[0]} - {overlappingfps[1]}), ")
                         outfile.write("\n")
                     outfile.write(f"{tool1_label} and {tool2_label} have {num_of_overlaps} overlapping False Positive calls\n")
                     outfile.write("\n\n")
@@ -315,7 +363,7 @@ def write_fp_comparison(outfilepath, comparisondata, tool1_label, tool2_label):
                     for samplename in comparisondata[comparepoint]["tool1"]:
                         tool1_sample_ufps = len(comparisondata[comparepoint]["tool1"][samplename])
                         num_of_tool1_fps += tool1_sample_ufps
-                        outfile.write("* [" +samplename+ "]: {" +str(tool1_sample_ufps)+ "}\t" + ", ".join(comparisondata[comparepoint]["tool1"][samplename]) + "\n")
+                        outfile.write("* [" +samplename+ "]: {" +str(tool1_sample_ufps)+ "}\t" + ", ".join(str(x) for x in comparisondata[comparepoint]["tool1"][samplename]) + "\n")
                     outfile.write(f"{tool1_label} found {num_of_tool1_fps} unique False Positive calls\n\n")
 
                     outfile.write(f"[-Unique False Positive calls found by {tool2_label}-]\n")
@@ -323,7 +371,7 @@ def write_fp_comparison(outfilepath, comparisondata, tool1_label, tool2_label):
                     for samplename in comparisondata[comparepoint]["tool2"]:
                         tool2_sample_ufps = len(comparisondata[comparepoint]["tool2"][samplename])
                         num_of_tool2_fps += tool2_sample_ufps
-                        outfile.write("* [" +samplename+ "]: {" +str(tool2_sample_ufps)+ "}\t" + ", ".join(comparisondata[comparepoint]["tool2"][samplename]) + "\n")
+                        outfile.write("* [" +samplename+ "]: {" +str(tool2_sample_ufps)+ "}\t" + ", ".join(str(x) for x in comparisondata[comparepoint]["tool2"][samplename]) + "\n")
                     outfile.write(f"{tool2_label} found {num_of_tool2_fps} unique False Positive calls\n\n")
         file_written = True
     except IOError:
@@ -353,7 +401,7 @@ def write_tp_comparison(outfilepath, comparisondata, tool1_label, tool2_label):
                     for samplename in comparisondata[comparepoint]:
                         shared_sample_fps = len(comparisondata[comparepoint][samplename])
                         num_of_shared_fps += shared_sample_fps
-                        outfile.write("* [" + samplename + "]: {" +str(shared_sample_fps)+ "}\t" + ", ".join(comparisondata[comparepoint][samplename]) + "\n")
+                        outfile.write("* [" + samplename + "]: {" +str(shared_sample_fps)+ "}\t" + ", ".join(str(x) for x in comparisondata[comparepoint][samplename]) + "\n")
                     outfile.write(f"{tool1_label} and {tool2_label} both identified {num_of_shared_fps} True Positive calls\n")
                     outfile.write("\n\n")
 
@@ -365,7 +413,7 @@ def write_tp_comparison(outfilepath, comparisondata, tool1_label, tool2_label):
                         num_of_overlaps += sample_overlaps
                         outfile.write("* [" +samplename+ "]: {" +str(sample_overlaps)+ "}\t")
                         for overlappingfps in comparisondata[comparepoint][samplename]:
-                            outfile.write("(" +overlappingfps[0]+ " - " +overlappingfps[1]+ "), ")
+                            outfile.write(f"({overlappingfps[0]} - {overlappingfps[1]}), ")
                         outfile.write("\n")
                     outfile.write(f"{tool1_label} and {tool2_label} have {num_of_overlaps} overlapping True Positive calls\n")
                     outfile.write("\n\n")
@@ -376,7 +424,7 @@ def write_tp_comparison(outfilepath, comparisondata, tool1_label, tool2_label):
                     for samplename in comparisondata[comparepoint]["tool1"]:
                         tool1_sample_ufps = len(comparisondata[comparepoint]["tool1"][samplename])
                         num_of_tool1_fps += tool1_sample_ufps
-                        outfile.write("* [" +samplename+ "]: {" +str(tool1_sample_ufps)+ "}\t" + ", ".join(comparisondata[comparepoint]["tool1"][samplename]) + "\n")
+                        outfile.write("* [" +samplename+ "]: {" +str(tool1_sample_ufps)+ "}\t" + ", ".join(str(x) for x in comparisondata[comparepoint]["tool1"][samplename]) + "\n")
                     outfile.write(f"{tool1_label} found {num_of_tool1_fps} unique True Positive calls\n\n")
 
                     outfile.write(f"[-Unique True Positive calls found by {tool2_label}-]\n")
@@ -384,10 +432,131 @@ def write_tp_comparison(outfilepath, comparisondata, tool1_label, tool2_label):
                     for samplename in comparisondata[comparepoint]["tool2"]:
                         tool2_sample_ufps = len(comparisondata[comparepoint]["tool2"][samplename])
                         num_of_tool2_fps += tool2_sample_ufps
-                        outfile.write("* [" +samplename+ "]: {" +str(tool2_sample_ufps)+ "}\t" + ", ".join(comparisondata[comparepoint]["tool2"][samplename]) + "\n")
+                        outfile.write("* [" +samplename+ "]: {" +str(tool2_sample_ufps)+ "}\t" + ", ".join(str(x) for x in comparisondata[comparepoint]["tool2"][samplename]) + "\n")
                     outfile.write(f"{tool2_label} found {num_of_tool2_fps} unique True Positive calls\n\n")
         file_written = True
     except IOError:
         print("Could not write false positive comparison data to output file")
     finally:
         return file_written
+
+
+def write_multi_comparison(outfilepath, comparisondata, tool_indices):
+    """Write the comparison results of multiple tools as a consolidated
+    matrix report.
+
+    Parameters
+    ----------
+    outfilepath : str
+        Path to write output file to
+    comparisondata : dict
+        Comparison data to write to file
+    tool_indices : list of dict
+        Indexed classified CNV calls per tool
+
+    Returns
+    -------
+    file_written : bool
+        True if file has been written, False if not
+    """
+    file_written = False
+    tool_labels = [tool_index["label"] for tool_index in tool_indices]
+    classification_labels = list(tool_indices[0]["Call types"].keys())
+    try:
+        with open(outfilepath, 'w') as outfile:
+            outfile.write(f"Results for comparison between {', '.join(tool_labels)}\n\n")
+
+            outfile.write("[-Total calls made-]\n")
+            outfile.write("Tool\tTotal calls\t" + "\t".join(classification_labels) + "\tTotal fps\n")
+            for tool_index in tool_indices:
+                call_types = [str(tool_index["Call types"][classlabel]) for classlabel in classification_labels]
+                outfile.write(f"{tool_index['label']}\t{tool_index['Total calls']}\t" + "\t".join(call_types) + f"\t{tool_index['Total fps']}\n")
+            outfile.write("\n\n")
+
+            outfile.write("[-Array CNVs found by both tools (diagonal: array CNVs found by the tool)-]\n")
+            write_count_matrix(outfile, tool_labels, comparisondata["Shared array CNVs"])
+
+            outfile.write("[-Array CNVs found by all tools-]\n")
+            write_sample_entries(outfile, comparisondata["All tools array CNVs"])
+            outfile.write(f"All tools identified {count_sample_entries(comparisondata['All tools array CNVs'])} array CNVs\n")
+            for acnvtype in comparisondata["All tools array types"]:
+                outfile.write(f"{acnvtype}: {comparisondata['All tools array types'][acnvtype]}\n")
+            outfile.write("\n\n")
+
+            outfile.write("[-Unique array CNVs found per tool-]\n")
+            for toolnum, tool_label in enumerate(tool_labels):
+                outfile.write(f"Unique array CNVs found by {tool_label}\n")
+                write_sample_entries(outfile, comparisondata["Unique array CNVs"][toolnum])
+                outfile.write(f"{tool_label} found {count_sample_entries(comparisondata['Unique array CNVs'][toolnum])} unique array CNVs\n")
+                for acnvtype in comparisondata["Unique array types"][toolnum]:
+                    outfile.write(f"{acnvtype}: {comparisondata['Unique array types'][toolnum][acnvtype]}\n")
+                outfile.write("\n")
+            outfile.write("\n")
+
+            outfile.write("[-False Positive calls of the row tool shared with the column tool (diagonal: distinct False Positive calls)-]\n")
+            write_count_matrix(outfile, tool_labels, comparisondata["Shared fps"])
+
+            outfile.write("[-False Positive calls of the row tool overlapping a False Positive call of the column tool (diagonal: distinct False Positive calls)-]\n")
+            write_count_matrix(outfile, tool_labels, comparisondata["Overlapping fps"])
+
+            outfile.write("[-False Positive calls found by all tools-]\n")
+            write_sample_entries(outfile, comparisondata["All tools fps"])
+            outfile.write(f"All tools identified {count_sample_entries(comparisondata['All tools fps'])} False Positive calls\n")
+            outfile.write("\n\n")
+
+            outfile.write("[-Unique False Positive calls per tool (not shared with or overlapping any other tool)-]\n")
+            for toolnum, tool_label in enumerate(tool_labels):
+                outfile.write(f"Unique False Positive calls found by {tool_label}\n")
+                write_sample_entries(outfile, comparisondata["Unique fps"][toolnum])
+                outfile.write(f"{tool_label} found {count_sample_entries(comparisondata['Unique fps'][toolnum])} unique False Positive calls\n\n")
+        file_written = True
+    except IOError:
+        print("Could not write multi tool comparison data to output file")
+    finally:
+        return file_written
+
+
+def write_count_matrix(outfile, tool_labels, count_matrix):
+    """Write a tools x tools matrix of counts to an opened output file."""
+    outfile.write("\t" + "\t".join(tool_labels) + "\n")
+    for tool_label, matrix_row in zip(tool_labels, count_matrix):
+        outfile.write(tool_label + "\t" + "\t".join([str(x) for x in matrix_row]) + "\n")
+    outfile.write("\n\n")
+
+
+def write_sample_entries(outfile, sample_entries):
+    """Write the entries per sample to an opened output file."""
+    for samplename in sorted(sample_entries):
+        outfile.write("* [" +samplename+ "]: {" +str(len(sample_entries[samplename]))+ "}\t" + ", ".join(sorted(str(x) for x in sample_entries[samplename])) + "\n")
+
+
+def count_sample_entries(sample_entries):
+    return sum([len(sample_entries[samplename]) for samplename in sample_entries])
+
+
+def write_threshold_sweep(outfileloc, headerfields, sweepresults):
+    """Write the classification totals, sensitivity and precision per
+    combination of classification thresholds.
+
+    Parameters
+    ----------
+    outfileloc : str
+        Path to write output file to
+    headerfields : list of str
+        Column names
+    sweepresults : list of list
+        Thresholds and results per combination of thresholds
+
+    Returns
+    -------
+    file_written : bool
+        True if file has been written, False if not
+    """
+    file_written = False
+    try:
+        write_file_lines(outfileloc, make_file_line(headerfields), (make_file_line(sweepresult) for sweepresult in sweepresults))
+        file_written = True
+    except IOError:
+        print(f"Could not write threshold sweep results to {outfileloc}")
+    finally:
+        return file_written
@@ -1,8 +1,21 @@
 #!/usr/bin/env python
+# Import filtering scripts
+import filtering.column_filtering as fcof
+
+
 def filter_neutrals(infileloc, outfileloc):
-    try:
-        outfile = open(outfile, 'w')
-        with open(infileloc, 'r') as infile:
-        outfile.close()
-    except:
-        print(f"Could not filter neutrals from {infileloc}")
+    """Filter out neutral calls from a classification file.
+
+    Parameters
+    ----------
+    infileloc : str
+        Path to classification file
+    outfileloc : str
+        Path to write output file to
+
+    Returns
+    -------
+    bool
+        True if output file has been written, False if not
+    """
+    return fcof.filter_calls(infileloc, outfileloc, filterneutrals=True)
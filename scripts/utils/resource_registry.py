@@ -0,0 +1,72 @@
+#!/usr/bin/env python
+import importlib
+import sys
+import time
+
+
+# Start of the run, as this module is imported before any other module of the script.
+STARTUP_TIME = time.perf_counter()
+
+# Loaded resources and the recorded import and load times of this run.
+LOADED_RESOURCES = {}
+LOAD_TIMES = []
+
+
+def import_module(modulename):
+    """Import and return a module, recording the time the import took.
+
+    Parameters
+    ----------
+    modulename : str
+        Full name of the module to import
+
+    Returns
+    -------
+    module
+        Imported module
+    """
+    if modulename in sys.modules:
+        return sys.modules[modulename]
+    start_time = time.perf_counter()
+    imported_module = importlib.import_module(modulename)
+    LOAD_TIMES.append(("import", modulename, time.perf_counter() - start_time))
+    return imported_module
+
+
+def get_resource(resourcename, loadmethod, *loadargs):
+    """Load a resource on first use and return it.
+
+    A resource is loaded only once per run, any later request returns the
+    already loaded resource. The load method should only read and return the
+    resource, as it is not called again for later requests.
+
+    Parameters
+    ----------
+    resourcename : str
+        Name to register the resource under
+    loadmethod : function
+        Method loading the resource
+    loadargs
+        Arguments for the load method
+
+    Returns
+    -------
+    Loaded resource
+    """
+    if resourcename not in LOADED_RESOURCES:
+        start_time = time.perf_counter()
+        LOADED_RESOURCES[resourcename] = loadmethod(*loadargs)
+        LOAD_TIMES.append(("load", resourcename, time.perf_counter() - start_time))
+    return LOADED_RESOURCES[resourcename]
+
+
+def record_time(timetype, timename, starttime):
+    """Record the time passed since a start time."""
+    LOAD_TIMES.append((timetype, timename, time.perf_counter() - starttime))
+
+
+def print_load_times():
+    """Print the recorded import and load times."""
+    print("Type\tName\tSeconds")
+    for timetype, timename, timetaken in LOAD_TIMES:
+        print(f"{timetype}\t{timename}\t{timetaken:.4f}")
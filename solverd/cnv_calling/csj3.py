@@ -1,6 +1,16 @@
 #!/usr/bin/env python
 import os
+import sys
 import argparse
+import subprocess
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import file_manifest as fm
+import memory_model as mm
+
+
+# Memory reserved per local command for the java VM outside of the heap.
+LOCAL_JVM_OVERHEAD = "512m"
 
 
 def add_dir_slash(dirtomodify):
@@ -21,6 +31,24 @@ def add_dir_slash(dirtomodify):
     return dirtomodify
 
 
+def memory_string(memstring):
+    """Check and return a memory string for argparse.
+
+    Parameters
+    ----------
+    memstring : str
+        Memory string (e.g. 4g)
+
+    Returns
+    -------
+    str
+        The memory string, if it is a number followed by k, m, g or t
+    """
+    if len(memstring) < 2 or not memstring[0:-1].isdigit() or memstring[-1].lower() not in "kmgt":
+        raise argparse.ArgumentTypeError(f"invalid memory value {memstring}, use a number followed by k, m, g or t (e.g. 4g)")
+    return memstring
+
+
 def get_parameters():
     """Obtain and return set command line parameters
 
@@ -31,11 +59,14 @@ def get_parameters():
     """
     # Make a list of valid generators
     valid_generators = ["ppi", "crc", "pon", "drc", "drc_n", "drc_p", "pdcr", "cac", "ms", "ccrs", "pms"]
+    valid_backends = ["sbatch", "local"]
 
     sbatch_parameters = argparse.ArgumentParser()
     # Parameters related to sbatch job creation.
-    sbatch_parameters.add_argument("-no", "--numofjobs", dest="numofjobs", required=True, type=int, help="Number of jobs to create.")
+    sbatch_parameters.add_argument("-no", "--numofjobs", dest="numofjobs", type=int, help="Number of jobs to create, required with the sbatch backend.")
     sbatch_parameters.add_argument("-o", "--outdir", dest="outdir", required=True, help="Directory to write cluster jobs to.")
+    sbatch_parameters.add_argument("-be", "--backend", dest="backend", default="sbatch", choices=valid_backends, help="Write sbatch job scripts or run the job commands locally.")
+    sbatch_parameters.add_argument("-w", "--workers", dest="workers", type=int, help="Maximum number of commands to run at the same time with the local backend.")
 
     # Parameters related to input directories.
     sbatch_parameters.add_argument("-ib", "--inaligments", dest="inalignments", help="Input directory with BAM/CRAM files.")
@@ -44,6 +75,7 @@ def get_parameters():
     sbatch_parameters.add_argument("-ia", "--inallelic", dest="inallelic", help="Directory with allelic tsv count files.")
     sbatch_parameters.add_argument("-ig", "--insegments", dest="insegments", help="Directory with segment files.")
     sbatch_parameters.add_argument("-il", "--intervallist", dest="intervallist", help="Interval list required for many processes by GATK4.")
+    sbatch_parameters.add_argument("-mf", "--manifest", dest="manifest", help="Manifest file (file_manifest.py) to take the input files from instead of listing the input directories.")
 
     # Parameter related to the GATK4 commands themselves.
     sbatch_parameters.add_argument("-g", "--generate", dest="generate", required=True, choices=valid_generators, help="GATK4 tool sbatch scripts to generate.")
@@ -55,7 +87,7 @@ def get_parameters():
     sbatch_parameters.add_argument("-pn", "--panelofnormals", dest="panelofnormals", help="GATK4 created Panel of Normals.")
 
     # Parameters related to the GATK4 commands themselves.
-    sbatch_parameters.add_argument("-gm", "--gatkmem", dest="gatkmem", default="4g", help="Amount of memory for java VM running GATK4.")
+    sbatch_parameters.add_argument("-gm", "--gatkmem", dest="gatkmem", default="4g", type=memory_string, help="Amount of memory for java VM running GATK4 (e.g. 4g).")
     sbatch_parameters.add_argument("-bl", "--binlength", dest="binlength", default="0", help="Bin length to use for GATK commands where applicable.")
     sbatch_parameters.add_argument("-imr", "--intervalmergingrule", dest="intervalmergingrule", default="OVERLAPPING_ONLY", help="Interval merging rule to use for GATK jobs where applicable.")
     sbatch_parameters.add_argument("-mimp", "--minintervalmedianpercentile", dest="minimumintervalmedianpercentile", default="5.0", help="Minimum interval median percentile to use.")
@@ -69,6 +101,8 @@ def get_parameters():
     sbatch_parameters.add_argument("-c", "--cpus", dest="cpus", default="1", help="Number of cpus to use for each job")
     sbatch_parameters.add_argument("-m", "--mem", dest="mem", default="4gb", help="Amount of memory to use for each job (e.g. 4gb)")
     sbatch_parameters.add_argument("-n", "--nodes", dest="nodes", default="1", help="Number of nodes to use for each job")
+    sbatch_parameters.add_argument("-am", "--automem", dest="automem", action="store_true", help="Size job memory and GATK4 java memory from the interval count and input size instead of --mem and --gatkmem")
+    sbatch_parameters.add_argument("-js", "--jobstats", dest="jobstats", help="Job telemetry database (jobtelemetry.py) with earlier jobs of the same stage to calibrate --automem with")
 
     # Parameters related to loading of modules.
     sbatch_parameters.add_argument("-gv", "--gatkver", dest="gatkver", default="4.1.4.0-Java-8-LTS", help="GATK4 module to load and use")
@@ -113,7 +147,13 @@ def check_parameters(scriptparameters):
             if not os.path.isfile(scriptparameters[genpar]):
                 gen_params_ok = False
                 print(f"File {scriptparameters[genpar]} for parameter {genpar} does not seem to exist.")
-    return dirparams_ok and gen_params_ok
+
+    # Check whether the number of job scripts is set for the sbatch backend.
+    numofjobs_ok = True
+    if scriptparameters["backend"] == "sbatch" and (scriptparameters["numofjobs"] is None or scriptparameters["numofjobs"] < 1):
+        numofjobs_ok = False
+        print("Parameter -no / --numofjobs should be set to at least 1 with the sbatch backend.")
+    return dirparams_ok and gen_params_ok and numofjobs_ok
 
 
 def check_dir_parameters(dirparams):
@@ -201,6 +241,230 @@ def check_gatk_memory_to_job_memory(gatkmem, jobmem):
     return f"{gmem_num}{gmem_measure}"
 
 
+def memory_to_bytes(memstring):
+    """Convert a memory string (e.g. 4g or 4gb) to a number of bytes. A
+    memory string without unit is a number of bytes, as for java.
+
+    Parameters
+    ----------
+    memstring : str
+        Memory string as used for GATK4 java memory or job memory
+
+    Returns
+    -------
+    int
+        Memory in bytes
+    """
+    mem_measure_level = {"k": 1, "m": 2, "g": 3, "t": 4}
+    memstring = memstring.lower()
+    if memstring.endswith("b"):
+        memstring = memstring[0:-1]
+    if memstring.isdigit():
+        return int(memstring)
+    return int(memstring[0:-1]) * (1024 ** mem_measure_level[memstring[-1]])
+
+
+def get_available_memory():
+    """Obtain and return the amount of available memory on this machine.
+
+    Returns
+    -------
+    int or None
+        Available memory in bytes, None if it could not be determined
+    """
+    try:
+        return os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_AVPHYS_PAGES")
+    except (ValueError, OSError, AttributeError):
+        return None
+
+
+def determine_local_workers(gatkmem, requestedworkers=None):
+    """Determine and return the number of commands that can run at the same
+    time on this machine.
+
+    The number of workers is limited by the number of available cores and by
+    the number of GATK4 java VMs that fit in the available memory.
+
+    Parameters
+    ----------
+    gatkmem : str
+        GATK4 java memory per command (e.g. 4g)
+    requestedworkers : int
+        Maximum number of workers requested by the user
+
+    Returns
+    -------
+    numofworkers : int
+        Number of commands to run at the same time
+    """
+    numofworkers = len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else (os.cpu_count() or 1)
+    available_mem = get_available_memory()
+    if available_mem is not None:
+        # Reserve some memory for the java VM overhead outside of the heap.
+        command_mem = memory_to_bytes(gatkmem) + memory_to_bytes(LOCAL_JVM_OVERHEAD)
+        numofworkers = min(numofworkers, available_mem // command_mem)
+    if requestedworkers is not None:
+        numofworkers = min(numofworkers, requestedworkers)
+    return max(1, numofworkers)
+
+
+def run_local_command(jobcommand, logfileloc):
+    """Run a single job command locally and write its output to a log file.
+
+    Parameters
+    ----------
+    jobcommand : str
+        Job command to run
+    logfileloc : str
+        Path to write the stdout and stderr of the command to
+
+    Returns
+    -------
+    int
+        Exit code of the command
+    """
+    try:
+        with open(logfileloc, "w") as logfile:
+            logfile.write(f"{jobcommand}\n\n")
+            logfile.flush()
+            completed = subprocess.run(jobcommand, shell=True, executable="/bin/bash", stdout=logfile, stderr=subprocess.STDOUT)
+        return completed.returncode
+    except OSError:
+        print(f"Could not run command or write log file {logfileloc}")
+        return -1
+
+
+def get_local_module_loads(gatkver, rversion):
+    """Return the module load commands to run before each local command.
+
+    The same GATK and RPlus modules as in the sbatch scripts are loaded if
+    environment modules are available on this machine. Otherwise gatk and
+    Rscript need to be on the PATH already.
+
+    Parameters
+    ----------
+    gatkver : str
+        Version of GATK4 module to use
+    rversion : str
+        Version of RPlus module to use
+
+    Returns
+    -------
+    str
+        Module load commands, empty if environment modules are not available
+    """
+    if "MODULESHOME" not in os.environ:
+        print("Environment modules are not available, gatk and Rscript should be on the PATH")
+        return ""
+    return f"source \"$MODULESHOME/init/bash\" && module load GATK/{gatkver} && module load RPlus/{rversion} && "
+
+
+def run_local_jobs(jobname, jobcommands, gatkmem, requestedworkers, outdir, moduleloads=""):
+    """Run job commands on this machine instead of writing sbatch scripts.
+
+    Commands are run in parallel with the number of workers determined from
+    the available cores and memory. Progress and failed commands are
+    reported while running.
+
+    Parameters
+    ----------
+    jobname : str
+        Name prefix for the command log files
+    jobcommands : list of str
+        Job commands to run
+    gatkmem : str
+        GATK4 java memory per command
+    requestedworkers : int
+        Maximum number of workers requested by the user
+    outdir : str
+        Directory to write the command log files to
+    moduleloads : str
+        Module load commands to run before each command
+
+    Returns
+    -------
+    failed_commands : list of str
+        Job commands that exited with a non-zero exit code
+    """
+    numofworkers = determine_local_workers(gatkmem, requestedworkers)
+    num_of_jobcoms = len(jobcommands)
+    print(f"Running {num_of_jobcoms} commands locally with {numofworkers} workers")
+
+    failed_commands = []
+    with ThreadPoolExecutor(max_workers=numofworkers) as local_executor:
+        running = {local_executor.submit(run_local_command, f"{moduleloads}{jobcom}", f"{outdir}{jobname}_{x}.log"): (x, jobcom)
+                   for x, jobcom in enumerate(jobcommands, start=1)}
+        for finished, future in enumerate(as_completed(running), start=1):
+            comnum, jobcom = running[future]
+            exitcode = future.result()
+            if exitcode != 0:
+                failed_commands.append(jobcom)
+                print(f"[{finished}/{num_of_jobcoms}] Command {comnum} failed with exit code {exitcode}, see {outdir}{jobname}_{comnum}.log")
+            else:
+                print(f"[{finished}/{num_of_jobcoms}] Command {comnum} finished")
+    print(f"Finished running {num_of_jobcoms} commands, {len(failed_commands)} failed")
+    return failed_commands
+
+
+def get_stage_input_files(scriptparameters, inputdir):
+    """Collect and return the input files for the requested generator.
+
+    Parameters
+    ----------
+    scriptparameters : dict
+        Script command line parameters
+    inputdir : str
+        Input directory with a trailing '/'
+
+    Returns
+    -------
+    list of str
+        Paths to the input files of the generator
+    """
+    generator = scriptparameters["generate"]
+    if generator == "ppi":
+        return [scriptparameters["intervallist"]]
+    if generator in ("crc", "cac"):
+        return get_required_files(inputdir, (".bam", ".cram"), scriptparameters["manifest"])
+    if generator in ("pon", "drc", "drc_n", "drc_p"):
+        return get_required_files(inputdir, ".hdf5", scriptparameters["manifest"])
+    if generator == "pdcr":
+        return get_required_files(f"{inputdir}denoised/", ".tsv", scriptparameters["manifest"])
+    if generator in ("ms", "pms"):
+        return get_required_files(add_dir_slash(scriptparameters["indenoised"]), ".tsv", scriptparameters["manifest"])
+    return get_required_files(inputdir, ".cr.seg", scriptparameters["manifest"])
+
+
+def size_job_memory(scriptparameters, inputdir):
+    """Size and return the job memory and GATK4 java memory for the requested
+    generator from the number of intervals and the input files.
+
+    Parameters
+    ----------
+    scriptparameters : dict
+        Script command line parameters
+    inputdir : str
+        Input directory with a trailing '/'
+
+    Returns
+    -------
+    jobmem : str
+        Job memory request
+    gatkmem : str
+        GATK4 java memory
+    """
+    generator = scriptparameters["generate"]
+    num_of_intervals = 0
+    if scriptparameters["intervallist"] is not None:
+        num_of_intervals = mm.count_intervals(scriptparameters["intervallist"]) or 0
+    inputfiles = get_stage_input_files(scriptparameters, inputdir)
+    num_of_inputs = len(inputfiles) if generator == "pon" else 1
+    jobmem, gatkmem = mm.size_stage_memory(generator, num_of_intervals, num_of_inputs,
+                                           mm.get_largest_input_mb(inputfiles), scriptparameters["jobstats"])
+    print(f"Sized {generator} jobs for {num_of_intervals} intervals and {len(inputfiles)} inputs: job memory {jobmem}, GATK4 java memory {gatkmem}")
+    return jobmem, gatkmem
+
+
 def generate_preprocess_intervals(intervallistloc, genomerefloc, imr, outdirloc, reqgatkmem):
     """Generate a command to pre-process an interval list
 
@@ -605,7 +869,7 @@ def generate_plot_modeled_segments(tsv_denoised, tsv_allelic, segfiles, sequence
     return pms_coms
 
 
-def get_required_files(filesdir, fileext):
+def get_required_files(filesdir, fileext, manifestloc=None):
     """Extract and return the list of HDF5 count files in the provided
     directory.
 
@@ -615,6 +879,8 @@ def get_required_files(filesdir, fileext):
         Directory containing HDF5 count files within the project directory
     fileext : str or tuple of str
         File extension(s) to select specific files
+    manifestloc : str
+        Path to manifest file to take the files from, None to list the directory
 
     Returns
     -------
@@ -622,7 +888,9 @@ def get_required_files(filesdir, fileext):
         Paths to input files
     """
     directory_files = []
-    if os.path.isdir(filesdir):
+    if manifestloc is not None:
+        directory_files = fm.get_manifest_files(manifestloc, filesdir, fileext)
+    elif os.path.isdir(filesdir):
         directory_files = os.listdir(filesdir)
         directory_files = [f"{filesdir}{x}" for x in directory_files if x.endswith(fileext)]
     return directory_files
@@ -769,12 +1037,15 @@ if __name__ == "__main__":
     inputdir = add_dir_slash(sbatch_gen_params["indir"])
     sbatch_outdir = add_dir_slash(sbatch_gen_params["outdir"])
     gatkjob_outdir = add_dir_slash(sbatch_gen_params["joboutdir"])
+    if sbatch_gen_params["automem"]:
+        sbatch_gen_params["mem"], sbatch_gen_params["gatkmem"] = size_job_memory(sbatch_gen_params, inputdir)
     requested_gatkmem = check_gatk_memory_to_job_memory(sbatch_gen_params["gatkmem"], sbatch_gen_params["mem"])
     optparams = sbatch_gen_params["optionalargs"]
     job_commands = []
 
     # Check whether the parameters are ok and decide which generator to run
-    if check_parameters(sbatch_gen_params):
+    parameters_ok = check_parameters(sbatch_gen_params)
+    if parameters_ok:
         indirfiles = []
 
         # Generate sbatch command for PreprocessIntervals
@@ -786,41 +1057,41 @@ if __name__ == "__main__":
 
         # Generate sbatch commands for CollectReadCounts
         elif sbatch_gen_params["generate"] == "crc":
-            indirfiles = get_required_files(inputdir, (".bam", ".cram"))
+            indirfiles = get_required_files(inputdir, (".bam", ".cram"), sbatch_gen_params["manifest"])
             job_commands = generate_collect_read_counts(indirfiles, sbatch_gen_params["intervallist"],
                                                         sbatch_gen_params["intervalmergingrule"], gatkjob_outdir,
                                                         requested_gatkmem, sbatch_gen_params["solverd"])
 
         # Generate sbatch commands for CreatePanelOfNormals
         elif sbatch_gen_params["generate"] == "pon":
-            indirfiles = get_required_files(inputdir, ".hdf5")
+            indirfiles = get_required_files(inputdir, ".hdf5", sbatch_gen_params["manifest"])
             job_commands = generate_panel_of_normals(indirfiles, sbatch_gen_params["minimumintervalmedianpercentile"],
                                                      gatkjob_outdir, requested_gatkmem)
 
         # Generate sbatch commands for DenoiseReadCounts
         elif sbatch_gen_params["generate"] == "drc":
-            indirfiles = get_required_files(inputdir, ".hdf5")
+            indirfiles = get_required_files(inputdir, ".hdf5", sbatch_gen_params["manifest"])
             job_commands = generate_denoise_read_counts(indirfiles, sbatch_gen_params["panelofnormals"], gatkjob_outdir,
                                                         requested_gatkmem)
 
         # Generate sbatch commands for DenoiseReadCounts without a PoN.
         elif sbatch_gen_params["generate"] == "drc_n":
-            indirfiles = get_required_files(inputdir, ".hdf5")
+            indirfiles = get_required_files(inputdir, ".hdf5", sbatch_gen_params["manifest"])
             job_commands = generate_denoise_read_counts_nopon(indirfiles,
                                                               gatkjob_outdir,
                                                               requested_gatkmem)
 
         # Generate sbatch commands for DenoiseReadCounts with eigensamples
         elif sbatch_gen_params["generate"] == "drc_p":
-            indirfiles = get_required_files(inputdir, ".hdf5")
+            indirfiles = get_required_files(inputdir, ".hdf5", sbatch_gen_params["manifest"])
             job_commands = generate_denoise_read_counts_pcs(indirfiles, sbatch_gen_params["panelofnormals"],
                                                             sbatch_gen_params["eigensamples"], gatkjob_outdir,
                                                             requested_gatkmem)
 
         # Generate sbatch commands for PlotDenoisedReadCounts
         elif sbatch_gen_params["generate"] == "pdcr":
-            standardized_infiles = get_required_files(f"{inputdir}standardized/", ".tsv")
-            denoised_infiles = get_required_files(f"{inputdir}denoised/", ".tsv")
+            standardized_infiles = get_required_files(f"{inputdir}standardized/", ".tsv", sbatch_gen_params["manifest"])
+            denoised_infiles = get_required_files(f"{inputdir}denoised/", ".tsv", sbatch_gen_params["manifest"])
             job_commands = generate_plot_denoised_copy_ratios(standardized_infiles, denoised_infiles,
                                                               sbatch_gen_params["refdict"],
                                                               sbatch_gen_params["minimumcontiglength"], gatkjob_outdir,
@@ -828,7 +1099,7 @@ if __name__ == "__main__":
 
         # Generate sbatch commands for CollectAllelicCounts
         elif sbatch_gen_params["generate"] == "cac":
-            indirfiles = get_required_files(inputdir, (".bam", ".cram"))
+            indirfiles = get_required_files(inputdir, (".bam", ".cram"), sbatch_gen_params["manifest"])
             job_commands = generate_collect_allelic_counts(indirfiles, sbatch_gen_params["intervallist"],
                                                            sbatch_gen_params["genomeref"], gatkjob_outdir,
                                                            requested_gatkmem)
@@ -836,9 +1107,9 @@ if __name__ == "__main__":
         # Generate sbatch command for ModelSegments
         elif sbatch_gen_params["generate"] == "ms":
             denoised_dir = add_dir_slash(sbatch_gen_params["indenoised"])
-            denoised_infiles = get_required_files(denoised_dir, ".tsv")
+            denoised_infiles = get_required_files(denoised_dir, ".tsv", sbatch_gen_params["manifest"])
             allelic_dir = add_dir_slash(sbatch_gen_params["inallelic"])
-            allelic_infiles = get_required_files(allelic_dir, ".tsv")
+            allelic_infiles = get_required_files(allelic_dir, ".tsv", sbatch_gen_params["manifest"])
 
             denoised_infiles.sort()
             allelic_infiles.sort()
@@ -850,7 +1121,7 @@ if __name__ == "__main__":
 
         # Generate sbatch commands for CallCopyRatioSegments
         elif sbatch_gen_params["generate"] == "ccrs":
-            indirfiles = get_required_files(inputdir, ".cr.seg")
+            indirfiles = get_required_files(inputdir, ".cr.seg", sbatch_gen_params["manifest"])
             job_commands = generate_call_copy_ratio_segments(indirfiles,
                                                              gatkjob_outdir,
                                                              requested_gatkmem)
@@ -863,12 +1134,12 @@ if __name__ == "__main__":
             segments_dir = add_dir_slash(sbatch_gen_params["insegments"])
 
             # Get the required files.
-            denoised_infiles = get_required_files(denoised_dir, ".tsv")
-            allelic_infiles = get_required_files(allelic_dir, ".tsv")
-            segment_infiles = get_required_files(segments_dir, ".cr.seg")
+            denoised_infiles = get_required_files(denoised_dir, ".tsv", sbatch_gen_params["manifest"])
+            allelic_infiles = get_required_files(allelic_dir, ".tsv", sbatch_gen_params["manifest"])
+            segment_infiles = get_required_files(segments_dir, ".cr.seg", sbatch_gen_params["manifest"])
             refdict = sbatch_gen_params["refdict"]
             mcl = sbatch_gen_params["minimumcontiglength"]
-            gatkmem = sbatch_gen_params["gatkmem"]
+            gatkmem = requested_gatkmem
 
             # Sort the input files they are in the same order.
             denoised_infiles.sort()
@@ -886,8 +1157,19 @@ if __name__ == "__main__":
     if optparams is not None and optparams != "":
         job_commands = add_optional_parameters(job_commands, optparams)
 
-    # Generate the sbatch scripts with the constructed commands
-    make_sbatch_jobs(sbatch_gen_params["jobname"], sbatch_gen_params,
-                     sbatch_gen_params["numofjobs"], job_commands,
-                     sbatch_gen_params["gatkver"],
-                     sbatch_gen_params["rversion"], sbatch_outdir)
+    if not parameters_ok:
+        sys.exit(1)
+
+    # Run the constructed commands locally or generate the sbatch scripts
+    if sbatch_gen_params["backend"] == "local":
+        failed_job_commands = run_local_jobs(sbatch_gen_params["jobname"], job_commands,
+                                             requested_gatkmem, sbatch_gen_params["workers"],
+                                             sbatch_outdir,
+                                             get_local_module_loads(sbatch_gen_params["gatkver"], sbatch_gen_params["rversion"]))
+        if failed_job_commands:
+            sys.exit(1)
+    else:
+        make_sbatch_jobs(sbatch_gen_params["jobname"], sbatch_gen_params,
+                         sbatch_gen_params["numofjobs"], job_commands,
+                         sbatch_gen_params["gatkver"],
+                         sbatch_gen_params["rversion"], sbatch_outdir)
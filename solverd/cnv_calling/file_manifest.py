@@ -0,0 +1,217 @@
+#!/usr/bin/env python
+import os
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+
+
+# Record types of the manifest lines
+MANIFEST_DIR = "D"
+MANIFEST_FILE = "F"
+
+
+def get_params():
+    """Define CLI parameters and return the set values.
+
+    Returns
+    -------
+    dict
+        Set parameter values
+    """
+    manifest_args = argparse.ArgumentParser()
+    manifest_args.add_argument("-d", "--dirs", type=str, nargs="+", required=True, dest="dirs", help="Directories to scan")
+    manifest_args.add_argument("-m", "--manifest", type=str, required=True, dest="manifest", help="Path to the manifest file to create or refresh")
+    manifest_args.add_argument("-w", "--workers", type=int, default=8, dest="workers", help="Number of directories to scan at the same time [8]")
+    return vars(manifest_args.parse_args())
+
+
+def get_dir_key(dirloc):
+    """Return the normalized absolute path of a directory."""
+    return os.path.abspath(dirloc)
+
+
+def scan_directory(dirloc):
+    """Scan a directory and return its modification time and the size and
+    modification time of its files.
+
+    Parameters
+    ----------
+    dirloc : str
+        Path to the directory
+
+    Returns
+    -------
+    dir_mtime : int
+        Modification time of the directory in nanoseconds
+    dir_files : list of tuple
+        Name, size and modification time of each file in the directory, in directory order
+    """
+    dir_mtime = os.stat(dirloc).st_mtime_ns
+    dir_files = []
+    with os.scandir(dirloc) as direntries:
+        for direntry in direntries:
+            if direntry.is_file():
+                entrystat = direntry.stat()
+                dir_files.append((direntry.name, entrystat.st_size, entrystat.st_mtime_ns))
+    return dir_mtime, dir_files
+
+
+def read_manifest(manifestloc):
+    """Read and return a manifest file.
+
+    Parameters
+    ----------
+    manifestloc : str
+        Path to the manifest file
+
+    Returns
+    -------
+    manifest_data : dict
+        Modification time and files per directory
+    """
+    manifest_data = {}
+    try:
+        with open(manifestloc, 'r') as manifestfile:
+            dir_data = None
+            for fileline in manifestfile:
+                filelinedata = fileline.rstrip("\n").split("\t")
+                if filelinedata[0] == MANIFEST_DIR:
+                    dir_data = {"mtime": int(filelinedata[2]), "files": []}
+                    manifest_data[filelinedata[1]] = dir_data
+                elif filelinedata[0] == MANIFEST_FILE and dir_data is not None:
+                    dir_data["files"].append((filelinedata[1], int(filelinedata[2]), int(filelinedata[3])))
+    except IOError:
+        pass
+    return manifest_data
+
+
+def write_manifest(manifestloc, manifestdata):
+    """Write a manifest file.
+
+    Parameters
+    ----------
+    manifestloc : str
+        Path to write the manifest file to
+    manifestdata : dict
+        Modification time and files per directory
+
+    Returns
+    -------
+    file_written : bool
+        True if file has been written, False if not
+    """
+    file_written = False
+    try:
+        with open(f"{manifestloc}.tmp", 'w') as manifestfile:
+            for dirkey, dirdata in manifestdata.items():
+                manifestfile.write(f"{MANIFEST_DIR}\t{dirkey}\t{dirdata['mtime']}\n")
+                manifestfile.writelines([f"{MANIFEST_FILE}\t{filename}\t{filesize}\t{filemtime}\n" for filename, filesize, filemtime in dirdata["files"]])
+        os.replace(f"{manifestloc}.tmp", manifestloc)
+        file_written = True
+    except IOError:
+        print(f"Could not write manifest {manifestloc}")
+    finally:
+        return file_written
+
+
+def is_changed(dirkey, manifestdata):
+    """Return whether a directory is missing from the manifest or has changed
+    since it was scanned.
+
+    A directory has changed when its modification time differs, which happens
+    when files are added, removed or renamed, or when one of its listed files
+    has a different size or modification time, which happens when a file is
+    rewritten in place.
+
+    Parameters
+    ----------
+    dirkey : str
+        Normalized absolute path of the directory
+    manifestdata : dict
+        Modification time and files per directory
+
+    Returns
+    -------
+    bool
+        True if the directory needs to be scanned again, False if not
+    """
+    if dirkey not in manifestdata or not os.path.isdir(dirkey) or os.stat(dirkey).st_mtime_ns != manifestdata[dirkey]["mtime"]:
+        return True
+    for filename, filesize, filemtime in manifestdata[dirkey]["files"]:
+        try:
+            filestat = os.stat(f"{dirkey}/{filename}")
+        except OSError:
+            return True
+        if filestat.st_size != filesize or filestat.st_mtime_ns != filemtime:
+            return True
+    return False
+
+
+def refresh_manifest(manifestloc, dirlocs, numofworkers=8):
+    """Refresh the manifest for the given directories and return it.
+
+    Only directories that are not in the manifest yet, or that changed since
+    they were scanned (see is_changed), are scanned again. These are
+    scanned in parallel. The manifest file is only rewritten if a directory
+    was scanned.
+
+    Parameters
+    ----------
+    manifestloc : str
+        Path to the manifest file
+    dirlocs : list of str
+        Directories the manifest should be up to date for
+    numofworkers : int
+        Number of directories to scan at the same time
+
+    Returns
+    -------
+    manifest_data : dict
+        Modification time and files per directory
+    """
+    manifest_data = read_manifest(manifestloc)
+    changed_dirs = [dirkey for dirkey in dict.fromkeys(get_dir_key(dirloc) for dirloc in dirlocs)
+                    if os.path.isdir(dirkey) and is_changed(dirkey, manifest_data)]
+    if len(changed_dirs) > 0:
+        with ThreadPoolExecutor(max_workers=max(1, min(numofworkers, len(changed_dirs)))) as scan_executor:
+            for dirkey, (dir_mtime, dir_files) in zip(changed_dirs, scan_executor.map(scan_directory, changed_dirs)):
+                manifest_data[dirkey] = {"mtime": dir_mtime, "files": dir_files}
+        write_manifest(manifestloc, manifest_data)
+        print(f"Scanned {len(changed_dirs)} changed directories into manifest {manifestloc}")
+    return manifest_data
+
+
+def get_manifest_files(manifestloc, dirloc, fileext):
+    """Return the paths to the files with a certain extension in a directory,
+    using the manifest instead of listing the directory.
+
+    Parameters
+    ----------
+    manifestloc : str
+        Path to the manifest file
+    dirloc : str
+        Directory to get the files of, paths are returned with this directory as prefix
+    fileext : str or tuple of str
+        File extension(s) to select specific files
+
+    Returns
+    -------
+    list of str
+        Paths to the files, in directory order
+    """
+    dirkey = get_dir_key(dirloc)
+    manifest_data = refresh_manifest(manifestloc, [dirloc])
+    if dirkey not in manifest_data:
+        return []
+    dirprefix = dirloc if dirloc.endswith("/") else f"{dirloc}/"
+    return [f"{dirprefix}{filename}" for filename, filesize, filemtime in manifest_data[dirkey]["files"] if filename.endswith(fileext)]
+
+
+def main():
+    manifest_params = get_params()
+    manifest_data = refresh_manifest(manifest_params["manifest"], manifest_params["dirs"], manifest_params["workers"])
+    num_of_files = sum([len(manifest_data[get_dir_key(dirloc)]["files"]) for dirloc in manifest_params["dirs"] if get_dir_key(dirloc) in manifest_data])
+    print(f"Manifest {manifest_params['manifest']} lists {num_of_files} files for {len(manifest_params['dirs'])} directories")
+
+
+if __name__ == "__main__":
+    main()
@@ -2,11 +2,14 @@
 import os
 import argparse
 
+import file_manifest as fm
+
 
 def get_params():
     cac_args = argparse.ArgumentParser()
     cac_args.add_argument("-i", "--indir", type=str, dest="indir", required=True, help="Path to the directory with BAM files for a single BED file")
     cac_args.add_argument("-j", "--job-outdir", type=str, required=True, dest="job-outdir", help="Path to folder the job should write the output to")
+    cac_args.add_argument("-m", "--manifest", type=str, dest="manifest", help="Manifest file (file_manifest.py) to take the BAM files from instead of listing the input directory")
     cac_args.add_argument("-o", "--outdir", type=str, dest="outdir", help="Path to directory to write script files to")
     cac_args.add_argument("-p", "--prefix", type=str, required=True, dest="prefix", help="Prefix to use for job and output")
     cac_args.add_argument("-r", "--genome-reference", type=str, required=True, dest="genome-reference", help="Path to genome reference to use")
@@ -78,7 +81,10 @@ def main():
     joboutdir = f"{joboutdir}/" if not joboutdir.endswith("/") else joboutdir
 
     # Gather the BAM files
-    bamfiles = [f"{bamdir}{bamfile}" for bamfile in os.listdir(bamdir) if bamfile.endswith(".bam")]
+    if cac_params["manifest"] is not None:
+        bamfiles = fm.get_manifest_files(cac_params["manifest"], bamdir, ".bam")
+    else:
+        bamfiles = [f"{bamdir}{bamfile}" for bamfile in os.listdir(bamdir) if bamfile.endswith(".bam")]
 
     # Start writing the job scripts
     cac_job_scripts = []
@@ -11,7 +11,7 @@ for ponfile in ponfiles:
     ponname = ponfile.split(".")[0]
     outfilepath = f"{sys.argv[2]}/svd_{ponname}.txt"
     hdf5pon = h5py.File(f"{sys.argv[1]}/{ponfile}", 'r')
-    pon_svd = hdf5pon["/panel/singular_values"].value
+    pon_svd = hdf5pon["/panel/singular_values"][()]
 
     try:
         with open(outfilepath, 'w') as outfile:
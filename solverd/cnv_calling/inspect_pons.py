@@ -0,0 +1,193 @@
+#!/usr/bin/env python
+import os
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+
+import h5py
+
+
+# Dataset paths within a GATK4 CreateReadCountPanelOfNormals HDF5 file.
+PON_SINGULAR_VALUES_PATH = "/panel/singular_values"
+PON_SAMPLE_FILENAMES_PATH = "/panel/sample_filenames"
+PON_INTERVALS_PATH = "/panel/intervals/transposed_index_start_end"
+
+
+def get_params():
+    """Define CLI parameters and return the set values.
+
+    Returns
+    -------
+    dict
+        Set parameter values
+    """
+    inspect_args = argparse.ArgumentParser()
+    inspect_args.add_argument("-i", "--indir", type=str, nargs="+", required=True, dest="indir", help="Path to one or more directories with PanelOfNormals .hdf5 files")
+    inspect_args.add_argument("-o", "--outfile", type=str, required=True, dest="outfile", help="Path to write the consolidated PoN table to")
+    inspect_args.add_argument("-n", "--samples-outfile", type=str, dest="samples-outfile", help="Path to write the samples of each PoN to")
+    inspect_args.add_argument("-v", "--variance", type=float, default=0.9, dest="variance", help="Fraction of the squared singular values the suggested number of eigensamples should explain")
+    inspect_args.add_argument("-w", "--workers", type=int, default=8, dest="workers", help="Number of PoN files to read at the same time")
+    return vars(inspect_args.parse_args())
+
+
+def get_pon_files(indirlocs):
+    """Collect and return the PanelOfNormals files in the provided directories.
+
+    Parameters
+    ----------
+    indirlocs : list of str
+        Paths to directories with PanelOfNormals files
+
+    Returns
+    -------
+    ponfiles : list of str
+        Paths to PanelOfNormals files
+    """
+    ponfiles = []
+    for indirloc in indirlocs:
+        with os.scandir(indirloc) as direntries:
+            ponfiles.extend([direntry.path for direntry in direntries if direntry.name.endswith(".hdf5")])
+    ponfiles.sort()
+    return ponfiles
+
+
+def read_pon_data(ponfileloc, readsamples):
+    """Read and return the singular values, number of intervals and samples
+    of a single PanelOfNormals.
+
+    Only the singular values (and sample names if requested) are read, the
+    number of intervals and samples are taken from the dataset shapes.
+
+    Parameters
+    ----------
+    ponfileloc : str
+        Path to the PanelOfNormals file
+    readsamples : bool
+        Whether to read the sample names of the PanelOfNormals
+
+    Returns
+    -------
+    pon_data : dict
+        PoN name, singular values, number of intervals and samples
+    """
+    pon_data = {"pon": ponfileloc.split("/")[-1].split(".")[0], "path": ponfileloc,
+                "singular_values": [], "intervals": None, "samples": None, "sample_names": []}
+    try:
+        with h5py.File(ponfileloc, 'r') as hdf5pon:
+            pon_data["singular_values"] = [float(x) for x in hdf5pon[PON_SINGULAR_VALUES_PATH][:]]
+            if PON_INTERVALS_PATH in hdf5pon:
+                pon_data["intervals"] = hdf5pon[PON_INTERVALS_PATH].shape[-1]
+            if PON_SAMPLE_FILENAMES_PATH in hdf5pon:
+                sample_dataset = hdf5pon[PON_SAMPLE_FILENAMES_PATH]
+                pon_data["samples"] = sample_dataset.size
+                if readsamples:
+                    pon_data["sample_names"] = [x.decode() if isinstance(x, bytes) else str(x) for x in sample_dataset[...].ravel()]
+    except (IOError, KeyError) as pon_error:
+        print(f"Could not read PanelOfNormals {ponfileloc}: {pon_error}")
+    finally:
+        return pon_data
+
+
+def suggest_eigensamples(singularvalues, variancefraction):
+    """Determine and return the smallest number of eigensamples that explain
+    the requested fraction of the squared singular values.
+
+    Parameters
+    ----------
+    singularvalues : list of float
+        Singular values of the PanelOfNormals
+    variancefraction : float
+        Fraction of the squared singular values to explain
+
+    Returns
+    -------
+    int
+        Suggested number of eigensamples
+    """
+    squared_values = [x * x for x in singularvalues]
+    squared_total = sum(squared_values)
+    explained = 0.0
+    for eigensamples, squared_value in enumerate(squared_values, start=1):
+        explained += squared_value
+        if squared_total > 0 and explained / squared_total >= variancefraction:
+            return eigensamples
+    return len(squared_values)
+
+
+def write_pon_table(pondata, variancefraction, outfileloc):
+    """Write the consolidated PanelOfNormals table.
+
+    Parameters
+    ----------
+    pondata : list of dict
+        Data read from each PanelOfNormals
+    variancefraction : float
+        Fraction of the squared singular values for the suggested eigensamples
+    outfileloc : str
+        Path to write the table to
+
+    Returns
+    -------
+    file_written : bool
+        True if file has been successfully written, False if not
+    """
+    file_written = False
+    try:
+        with open(outfileloc, 'w') as outfile:
+            outfile.write("PoN\tSamples\tIntervals\tSingular_values\tSuggested_eigensamples\tSingular_value_list\n")
+            outfile.writelines(f"{pon['pon']}\t{pon['samples']}\t{pon['intervals']}\t{len(pon['singular_values'])}\t"
+                               f"{suggest_eigensamples(pon['singular_values'], variancefraction)}\t"
+                               f"{','.join(str(x) for x in pon['singular_values'])}\n"
+                               for pon in pondata)
+        file_written = True
+    except IOError:
+        print(f"Could not write PoN table {outfileloc}")
+    finally:
+        return file_written
+
+
+def write_pon_samples(pondata, outfileloc):
+    """Write the samples of each PanelOfNormals.
+
+    Parameters
+    ----------
+    pondata : list of dict
+        Data read from each PanelOfNormals
+    outfileloc : str
+        Path to write the samples to
+
+    Returns
+    -------
+    file_written : bool
+        True if file has been successfully written, False if not
+    """
+    file_written = False
+    try:
+        with open(outfileloc, 'w') as outfile:
+            outfile.write("PoN\tSample\n")
+            outfile.writelines(f"{pon['pon']}\t{samplename}\n" for pon in pondata for samplename in pon["sample_names"])
+        file_written = True
+    except IOError:
+        print(f"Could not write PoN samples file {outfileloc}")
+    finally:
+        return file_written
+
+
+def main():
+    inspect_params = get_params()
+    ponfiles = get_pon_files(inspect_params["indir"])
+    readsamples = inspect_params["samples-outfile"] is not None
+
+    # h5py serializes access within a process, so PoNs are read in separate processes.
+    with ProcessPoolExecutor(max_workers=inspect_params["workers"]) as pon_executor:
+        pondata = list(pon_executor.map(read_pon_data, ponfiles, [readsamples] * len(ponfiles), chunksize=4))
+    print(f"Read {len(pondata)} PanelOfNormals files")
+
+    wrote_table = write_pon_table(pondata, inspect_params["variance"], inspect_params["outfile"])
+    print(f"Wrote PoN table?: {wrote_table}")
+    if readsamples:
+        wrote_samples = write_pon_samples(pondata, inspect_params["samples-outfile"])
+        print(f"Wrote PoN samples file?: {wrote_samples}")
+
+
+if __name__ == "__main__":
+    main()
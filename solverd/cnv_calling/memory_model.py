@@ -0,0 +1,232 @@
+#!/usr/bin/env python
+import math
+import os
+import sqlite3
+
+
+# Linear model of the peak resident memory per GATK4 stage. The peak memory
+# in MB is predicted as:
+#   base + intervals * per_interval + intervals * inputs * per_matrix_cell
+#        + input_mb * per_input_mb
+# where inputs is the number of input files combined in a single command
+# (only > 1 for CreateReadCountPanelOfNormals) and input_mb the size of the
+# largest input of a single command (e.g. the BAM/CRAM file for crc and cac).
+GATK_MEMORY_MODEL = {"ppi": {"base": 1024, "per_interval": 0.0005, "per_matrix_cell": 0.0, "per_input_mb": 0.0},
+                     "crc": {"base": 1024, "per_interval": 0.001, "per_matrix_cell": 0.0, "per_input_mb": 0.02},
+                     "pon": {"base": 1024, "per_interval": 0.001, "per_matrix_cell": 0.00005, "per_input_mb": 0.0},
+                     "drc": {"base": 1024, "per_interval": 0.002, "per_matrix_cell": 0.0, "per_input_mb": 0.0},
+                     "drc_n": {"base": 1024, "per_interval": 0.001, "per_matrix_cell": 0.0, "per_input_mb": 0.0},
+                     "drc_p": {"base": 1024, "per_interval": 0.002, "per_matrix_cell": 0.0, "per_input_mb": 0.0},
+                     "pdcr": {"base": 1024, "per_interval": 0.0, "per_matrix_cell": 0.0, "per_input_mb": 4.0},
+                     "cac": {"base": 1024, "per_interval": 0.0005, "per_matrix_cell": 0.0, "per_input_mb": 0.05},
+                     "ms": {"base": 1024, "per_interval": 0.0, "per_matrix_cell": 0.0, "per_input_mb": 4.0},
+                     "ccrs": {"base": 512, "per_interval": 0.0, "per_matrix_cell": 0.0, "per_input_mb": 4.0},
+                     "pms": {"base": 1024, "per_interval": 0.0, "per_matrix_cell": 0.0, "per_input_mb": 4.0}}
+
+# Headroom on top of the predicted peak memory for the job memory request.
+JOB_MEMORY_HEADROOM = 1.25
+# Smallest job memory request in GB.
+MIN_JOB_MEMORY_GB = 2
+# Part of the job memory that is kept outside of the java heap.
+NON_HEAP_FRACTION = 0.2
+MIN_NON_HEAP_MB = 512
+
+
+def count_intervals(intervallistloc):
+    """Count and return the number of intervals in an interval list or BED
+    file.
+
+    Parameters
+    ----------
+    intervallistloc : str
+        Path to the interval list
+
+    Returns
+    -------
+    num_of_intervals : int or None
+        Number of intervals, None if the file could not be read
+    """
+    try:
+        with open(intervallistloc, 'r') as intervalfile:
+            return sum(1 for intervalline in intervalfile if not intervalline.startswith(("@", "#", "track", "browser")) and intervalline.strip() != "")
+    except IOError:
+        print(f"Could not read interval list {intervallistloc}")
+        return None
+
+
+def get_largest_input_mb(inputfiles):
+    """Determine and return the size of the largest input file in MB.
+
+    Parameters
+    ----------
+    inputfiles : list of str
+        Paths to input files
+
+    Returns
+    -------
+    float
+        Size of the largest input file in MB
+    """
+    largest_input = 0
+    for inputfile in inputfiles:
+        try:
+            largest_input = max(largest_input, os.path.getsize(inputfile))
+        except OSError:
+            print(f"Could not determine size of {inputfile}")
+    return largest_input / (1024 ** 2)
+
+
+def predict_peak_memory(stage, numofintervals, numofinputs, inputmb):
+    """Predict and return the peak memory in MB of a single GATK4 command.
+
+    Parameters
+    ----------
+    stage : str
+        GATK4 stage (generator name as used by csj3.py)
+    numofintervals : int
+        Number of intervals in the interval list
+    numofinputs : int
+        Number of input files combined in a single command
+    inputmb : float
+        Size of the largest input file in MB
+
+    Returns
+    -------
+    float
+        Predicted peak memory in MB
+    """
+    stage_model = GATK_MEMORY_MODEL[stage]
+    return stage_model["base"] \
+        + numofintervals * stage_model["per_interval"] \
+        + numofintervals * numofinputs * stage_model["per_matrix_cell"] \
+        + inputmb * stage_model["per_input_mb"]
+
+
+def read_stage_jobs(telemetryloc, stage):
+    """Read and return the sizes and MaxRSS of the earlier jobs of a stage
+    from a job telemetry database made with solverd/jobstats/jobtelemetry.py.
+
+    Jobs without the interval count or input size that the model of the
+    stage uses are skipped, as their prediction would only be the base
+    memory.
+
+    Parameters
+    ----------
+    telemetryloc : str
+        Path to the job telemetry database
+    stage : str
+        GATK4 stage the jobs were ingested as (generator name as used by csj3.py)
+
+    Returns
+    -------
+    stage_jobs : list of tuple
+        Number of intervals, number of inputs, input size in MB and MaxRSS in MB per job
+    """
+    stage_jobs = []
+    if not os.path.isfile(telemetryloc):
+        print(f"Could not find job telemetry database {telemetryloc}")
+        return stage_jobs
+    stage_model = GATK_MEMORY_MODEL[stage]
+    uses_intervals = stage_model["per_interval"] > 0 or stage_model["per_matrix_cell"] > 0
+    uses_input_size = stage_model["per_input_mb"] > 0
+    num_of_skipped = 0
+    try:
+        telemetry_db = sqlite3.connect(f"file:{telemetryloc}?mode=ro", uri=True)
+        job_rows = telemetry_db.execute("SELECT intervals, inputs, input_bytes, maxrss_mb FROM jobs WHERE stage = ? AND maxrss_mb > 0", (stage,)).fetchall()
+        telemetry_db.close()
+    except sqlite3.Error:
+        print(f"Could not read job telemetry database {telemetryloc}")
+        return stage_jobs
+    for intervals, inputs, inputbytes, maxrss in job_rows:
+        if (uses_intervals and intervals is None) or (uses_input_size and inputbytes is None):
+            num_of_skipped += 1
+            continue
+        stage_jobs.append((intervals or 0, inputs or 1, (inputbytes or 0) / (1024 ** 2), maxrss))
+    if num_of_skipped > 0:
+        print(f"Skipped {num_of_skipped} earlier {stage} jobs without interval count or input size")
+    return stage_jobs
+
+
+def calibrate_scale(stage, stagejobs, percentile=95):
+    """Determine and return the factor to scale the model predictions with
+    based on the observed MaxRSS of earlier jobs of the same stage.
+
+    For each earlier job the ratio of its observed MaxRSS to the model
+    prediction for its own number of intervals, inputs and input size is
+    determined. The scale is the given percentile of these ratios, so the
+    model keeps scaling with the size of the new jobs.
+
+    Parameters
+    ----------
+    stage : str
+        GATK4 stage (generator name as used by csj3.py)
+    stagejobs : list of tuple
+        Number of intervals, number of inputs, input size in MB and MaxRSS in MB per earlier job
+    percentile : int
+        Percentile of the ratios to calibrate to
+
+    Returns
+    -------
+    float
+        Scale factor, 1.0 if no jobs have been observed
+    """
+    job_ratios = sorted([maxrss / predict_peak_memory(stage, intervals, inputs, inputmb)
+                         for intervals, inputs, inputmb, maxrss in stagejobs])
+    if not job_ratios:
+        return 1.0
+    # Nearest-rank percentile of the ratios
+    return job_ratios[max(1, math.ceil(len(job_ratios) * percentile / 100)) - 1]
+
+
+def determine_memory(peakmb, minjobmemgb=MIN_JOB_MEMORY_GB):
+    """Determine and return the job memory and java heap for a predicted
+    peak memory.
+
+    Parameters
+    ----------
+    peakmb : float
+        Predicted peak memory in MB
+    minjobmemgb : int
+        Smallest job memory request in GB
+
+    Returns
+    -------
+    jobmem : str
+        Job memory request (e.g. 6gb)
+    gatkmem : str
+        GATK4 java heap (e.g. 4915m)
+    """
+    jobmem_gb = max(minjobmemgb, math.ceil(peakmb * JOB_MEMORY_HEADROOM / 1024))
+    non_heap_mb = max(MIN_NON_HEAP_MB, int(jobmem_gb * 1024 * NON_HEAP_FRACTION))
+    return f"{jobmem_gb}gb", f"{jobmem_gb * 1024 - non_heap_mb}m"
+
+
+def size_stage_memory(stage, numofintervals, numofinputs, inputmb, telemetryloc=None, minjobmemgb=MIN_JOB_MEMORY_GB):
+    """Size and return the job memory and java heap for a GATK4 stage.
+
+    Parameters
+    ----------
+    stage : str
+        GATK4 stage (generator name as used by csj3.py)
+    numofintervals : int
+        Number of intervals in the interval list
+    numofinputs : int
+        Number of input files combined in a single command
+    inputmb : float
+        Size of the largest input file in MB
+    telemetryloc : str
+        Path to a job telemetry database with earlier jobs of this stage
+    minjobmemgb : int
+        Smallest job memory request in GB
+
+    Returns
+    -------
+    jobmem : str
+        Job memory request
+    gatkmem : str
+        GATK4 java heap
+    """
+    predicted_mb = predict_peak_memory(stage, numofintervals, numofinputs, inputmb)
+    if telemetryloc is not None:
+        predicted_mb = predicted_mb * calibrate_scale(stage, read_stage_jobs(telemetryloc, stage))
+    return determine_memory(predicted_mb, minjobmemgb)
@@ -2,6 +2,15 @@
 import os
 import argparse
 
+import file_manifest as fm
+import memory_model as mm
+import pon_planner as pp
+
+
+# Memory and time every PoN job used to get, kept as the lower limit.
+MIN_PON_JOB_MEMORY_GB = 4
+MIN_PON_JOB_SECONDS = 7200
+
 
 def get_params():
     pon_args = argparse.ArgumentParser()
@@ -12,6 +21,14 @@ def get_params():
     pon_args.add_argument("-o", "--outdir", required=True, dest="outdir", help="Path to write PanelOfNormals jobs to")
     pon_args.add_argument("-j", "--jobout", required=True, dest="jobout", help="Path for the job to write PoN to")
     pon_args.add_argument("--persample", dest="persample", action="store_true")
+    pon_args.add_argument("-l", "--intervallist", dest="intervallist", help="Interval list used for the read counts, to scale job memory and time with")
+    pon_args.add_argument("-m", "--max-samples", type=int, dest="maxsamples", help="Maximum number of samples per PanelOfNormals, larger clusters are subsampled")
+    pon_args.add_argument("-a", "--array", dest="array", action="store_true", help="Write all PoN jobs as a single slurm array job")
+    pon_args.add_argument("-t", "--throttle", type=int, default=10, dest="throttle", help="Maximum number of array tasks to run at the same time")
+    pon_args.add_argument("-gv", "--gatkver", dest="gatkver", default="4.1.4.1-Java-8-LTS", help="GATK4 module to load and use")
+    pon_args.add_argument("-rv", "--rversion", dest="rversion", default="3.6.1-foss-2018b-v19.11.1", help="RPlus module to load and use")
+    pon_args.add_argument("-mimp", "--minintervalmedianpercentile", dest="mimp", default="5.0", help="Minimum interval median percentile to use")
+    pon_args.add_argument("-mf", "--manifest", dest="manifest", help="Manifest file (file_manifest.py) to take the count files from instead of listing the counts directory")
     return vars(pon_args.parse_args())
 
 
@@ -21,9 +38,16 @@ def add_dir_slash(dirloc):
     return dirloc
 
 
-def get_count_files(countsdirloc):
+def get_count_files(countsdirloc, manifestloc=None):
     """Return paths to counts files per sample name.
 
+    Parameters
+    ----------
+    countsdirloc : str
+        Path to directory with HDF5 count files
+    manifestloc : str
+        Path to manifest file to take the count files from, None to list the directory
+
     Returns
     -------
     count_files : dict
@@ -31,8 +55,11 @@ def get_count_files(countsdirloc):
     """
     count_files = {}
     countsdirloc = add_dir_slash(countsdirloc)
-    dirfiles = os.listdir(countsdirloc)
-    hdf5_files = [hdffile for hdffile in dirfiles if hdffile.endswith(".hdf5")]
+    if manifestloc is not None:
+        hdf5_files = [hdffile.split("/")[-1] for hdffile in fm.get_manifest_files(manifestloc, countsdirloc, ".hdf5")]
+    else:
+        dirfiles = os.listdir(countsdirloc)
+        hdf5_files = [hdffile for hdffile in dirfiles if hdffile.endswith(".hdf5")]
     for hdffile in hdf5_files:
         count_files[hdffile.split(".")[0]] = f"{countsdirloc}{hdffile}"
     return count_files
@@ -89,46 +116,62 @@ def determine_pons(clusterfileloc):
         return batch_clusters
 
 
-def make_single_pon(batchname, batchclusters, countfiles, joboutdirloc, outdirloc):
+def make_single_pon(batchname, batchclusters, countfiles, joboutdirloc, outdirloc, gatkver, rversion, mimp,
+                    numofintervals=0, maxsamples=None, asarray=False, throttle=10):
     outdirloc = add_dir_slash(outdirloc)
     joboutdirloc = add_dir_slash(joboutdirloc)
+    ponjobs = []
     for batchnum in batchclusters:
-        outfilename = f"{outdirloc}createpon_{batchname}_{batchnum}.sh"
+        ponjob = pp.plan_pon_job(f"pon_{batchname}_{batchnum}", batchclusters[batchnum], list(countfiles.values()),
+                                 f"{joboutdirloc}pon_{batchname}_{batchnum}.hdf5", numofintervals, maxsamples,
+                                 MIN_PON_JOB_MEMORY_GB, MIN_PON_JOB_SECONDS)
+        if ponjob["inputs"]:
+            ponjobs.append(ponjob)
+
+    if asarray:
+        if ponjobs:
+            pp.write_pon_array_job(ponjobs, f"{outdirloc}createpon_{batchname}_array.sh", f"pon_{batchname}",
+                                   throttle, gatkver, mimp, rversion)
+        return
+
+    for ponjob in ponjobs:
+        jobname = ponjob["jobname"]
+        outfilename = f"{outdirloc}create{jobname}.sh"
         try:
             with open(outfilename, 'w') as outfile:
                 outfile.write("#!/bin/bash\n")
-                outfile.write(f"#SBATCH --job-name=pon_{batchname}_{batchnum}\n")
-                outfile.write(f"#SBATCH --output=pon_{batchname}_{batchnum}.out\n")
-                outfile.write(f"#SBATCH --error=pon_{batchname}_{batchnum}.err\n")
-                outfile.write("#SBATCH --time=02:00:00\n")
+                outfile.write(f"#SBATCH --job-name={jobname}\n")
+                outfile.write(f"#SBATCH --output={jobname}.out\n")
+                outfile.write(f"#SBATCH --error={jobname}.err\n")
+                outfile.write(f"#SBATCH --time={ponjob['time']}\n")
                 outfile.write("#SBATCH --cpus-per-task=1\n")
-                outfile.write("#SBATCH --mem=4gb\n")
+                outfile.write(f"#SBATCH --mem={ponjob['jobmem']}\n")
                 outfile.write("#SBATCH --nodes=1\n")
                 outfile.write("#SBATCH --open-mode=append\n")
                 outfile.write("#SBATCH --export=NONE\n")
                 outfile.write("#SBATCH --get-user-env=L\n\n")
 
-                outfile.write("module load GATK/4.1.4.1-Java-8-LTS\n")
-                outfile.write("module load RPlus/3.6.1-foss-2018b-v19.11.1\n")
+                outfile.write(f"module load GATK/{gatkver}\n")
+                outfile.write(f"module load RPlus/{rversion}\n")
                 outfile.write("module list\n\n")
 
-                outfile.write("gatk CreateReadCountPanelOfNormals \\\n")
-                for samplename in batchclusters[batchnum]:
-                    if samplename in countfiles:
-                        outfile.write(f"\t-I {countfiles[samplename]} \\\n")
-                outfile.write("\t--minimum-interval-median-percentile 5.0 \\\n")
-                outfile.write(f"\t-O {joboutdirloc}pon_{batchname}_{batchnum}.hdf5\n")
-        except:
-            print("AAP")
+                outfile.write(pp.get_pon_command(ponjob, mimp))
+        except IOError:
+            print(f"Could not write PoN job script {outfilename}")
 
 
 def main():
     pon_params = get_params()
-    countfiles = get_count_files(pon_params["countsdir"])
+    countfiles = get_count_files(pon_params["countsdir"], pon_params["manifest"])
     batch_to_kit = get_batch_to_kit(pon_params["batchtokit"])
     batchname = batch_to_kit[pon_params["kitname"]]
     batch_clusters = determine_pons(pon_params["infile"])
-    make_single_pon(batchname, batch_clusters, countfiles, pon_params["jobout"], pon_params["outdir"])
+    num_of_intervals = 0
+    if pon_params["intervallist"] is not None:
+        num_of_intervals = mm.count_intervals(pon_params["intervallist"]) or 0
+    make_single_pon(batchname, batch_clusters, countfiles, pon_params["jobout"], pon_params["outdir"],
+                    pon_params["gatkver"], pon_params["rversion"], pon_params["mimp"], num_of_intervals,
+                    pon_params["maxsamples"], pon_params["array"], pon_params["throttle"])
 
 
 if __name__ == "__main__":
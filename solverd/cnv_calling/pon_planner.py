@@ -0,0 +1,198 @@
+#!/usr/bin/env python
+import memory_model as mm
+
+
+# Runtime model of CreateReadCountPanelOfNormals: a fixed startup time plus
+# time per million cells of the count matrix (intervals x samples).
+PON_BASE_SECONDS = 600
+PON_SECONDS_PER_MILLION_CELLS = 20
+PON_TIME_HEADROOM = 1.5
+MIN_PON_SECONDS = 3600
+
+
+def seconds_to_slurm_time(seconds):
+    """Convert a number of seconds to a slurm time string (HH:MM:SS).
+
+    Parameters
+    ----------
+    seconds : int
+        Number of seconds
+
+    Returns
+    -------
+    str
+        Slurm time string
+    """
+    return f"{seconds // 3600:02d}:{(seconds % 3600) // 60:02d}:{seconds % 60:02d}"
+
+
+def subsample_pon_samples(ponsamples, maxsamples):
+    """Select and return evenly spaced samples of an oversized cluster.
+
+    Parameters
+    ----------
+    ponsamples : list of str
+        Samples of a cluster
+    maxsamples : int or None
+        Maximum number of samples for a single PanelOfNormals
+
+    Returns
+    -------
+    list of str
+        At most maxsamples samples of the cluster
+    """
+    if maxsamples is None or len(ponsamples) <= maxsamples:
+        return ponsamples
+    sorted_samples = sorted(ponsamples)
+    step = len(sorted_samples) / maxsamples
+    return [sorted_samples[int(x * step)] for x in range(maxsamples)]
+
+
+def select_pon_inputs(ponsamples, readcountfiles):
+    """Select and return the read count files of the PanelOfNormals samples.
+
+    Parameters
+    ----------
+    ponsamples : list of str
+        Samples to use for making the PanelOfNormals
+    readcountfiles : list of str
+        Read count files
+
+    Returns
+    -------
+    list of str
+        Read count files of the PanelOfNormals samples
+    """
+    ponsamples = set(ponsamples)
+    return [rcfile for rcfile in readcountfiles if rcfile.split("/")[-1].split(".")[0] in ponsamples]
+
+
+def plan_pon_job(jobname, ponsamples, readcountfiles, ponfileoutloc, numofintervals, maxsamples=None,
+                 minjobmemgb=mm.MIN_JOB_MEMORY_GB, minseconds=MIN_PON_SECONDS):
+    """Plan a single CreateReadCountPanelOfNormals job with resources scaled
+    to the size of the count matrix.
+
+    The job memory and time are never lower than the given minimums, so
+    scripts can keep the memory and time they used before as a floor.
+
+    Parameters
+    ----------
+    jobname : str
+        Name for the PoN job
+    ponsamples : list of str
+        Samples to use for making the PanelOfNormals
+    readcountfiles : list of str
+        Read count files
+    ponfileoutloc : str
+        Path the job should write the PanelOfNormals to
+    numofintervals : int
+        Number of intervals in the read count files
+    maxsamples : int or None
+        Maximum number of samples for a single PanelOfNormals
+    minjobmemgb : int
+        Smallest job memory request in GB
+    minseconds : int
+        Smallest job time in seconds
+
+    Returns
+    -------
+    dict
+        Job name, input files, output file, job memory, GATK4 java memory and
+        time (as slurm time and in seconds) for the PoN job
+    """
+    poninputs = select_pon_inputs(subsample_pon_samples(ponsamples, maxsamples), readcountfiles)
+    jobmem, gatkmem = mm.size_stage_memory("pon", numofintervals, len(poninputs), 0, minjobmemgb=minjobmemgb)
+    million_cells = numofintervals * len(poninputs) / 1000000
+    jobseconds = max(minseconds, int((PON_BASE_SECONDS + million_cells * PON_SECONDS_PER_MILLION_CELLS) * PON_TIME_HEADROOM))
+    return {"jobname": jobname, "inputs": poninputs, "output": ponfileoutloc,
+            "jobmem": jobmem, "gatkmem": gatkmem, "time": seconds_to_slurm_time(jobseconds), "seconds": jobseconds}
+
+
+def get_pon_command(ponjob, mimp=None):
+    """Make and return the CreateReadCountPanelOfNormals command of a planned
+    PoN job.
+
+    Parameters
+    ----------
+    ponjob : dict
+        Planned PoN job
+    mimp : str or None
+        Minimum interval median percentile, GATK4 default if None
+
+    Returns
+    -------
+    pon_command : str
+        CreateReadCountPanelOfNormals command
+    """
+    pon_command = f"gatk --java-options \"-Xmx{ponjob['gatkmem']}\" CreateReadCountPanelOfNormals \\\n"
+    for poninput in ponjob["inputs"]:
+        pon_command += f"\t-I {poninput} \\\n"
+    if mimp is not None:
+        pon_command += f"\t--minimum-interval-median-percentile {mimp} \\\n"
+    pon_command += f"\t-O {ponjob['output']}\n"
+    return pon_command
+
+
+def write_pon_array_job(ponjobs, scriptoutloc, jobname, throttle, gatkver, mimp=None, rversion=None):
+    """Write all planned PoN jobs as a single throttled slurm array job.
+
+    The array job requests the memory and time of the largest PoN job, so
+    every task can run without OOM retries.
+
+    Parameters
+    ----------
+    ponjobs : list of dict
+        Planned PoN jobs
+    scriptoutloc : str
+        Path to write the array job script to
+    jobname : str
+        Name for the array job
+    throttle : int
+        Maximum number of array tasks to run at the same time
+    gatkver : str
+        GATK4 module to load
+    mimp : str or None
+        Minimum interval median percentile, GATK4 default if None
+    rversion : str or None
+        RPlus module to load, not loaded if None
+
+    Returns
+    -------
+    file_written : bool
+        True if file has been successfully written, False if not
+    """
+    file_written = False
+    # Planned job memory is always in whole GB (e.g. 6gb).
+    largest_job = max(ponjobs, key=lambda ponjob: int(ponjob["jobmem"][0:-2]))
+    longest_time = max(ponjobs, key=lambda ponjob: ponjob["seconds"])["time"]
+    try:
+        with open(scriptoutloc, 'w') as arrayfile:
+            arrayfile.write("#!/bin/bash\n")
+            arrayfile.write(f"#SBATCH --job-name={jobname}\n")
+            arrayfile.write(f"#SBATCH --output={jobname}_%a.out\n")
+            arrayfile.write(f"#SBATCH --error={jobname}_%a.err\n")
+            arrayfile.write(f"#SBATCH --time={longest_time}\n")
+            arrayfile.write("#SBATCH --cpus-per-task=1\n")
+            arrayfile.write(f"#SBATCH --mem={largest_job['jobmem']}\n")
+            arrayfile.write("#SBATCH --nodes=1\n")
+            arrayfile.write(f"#SBATCH --array=0-{len(ponjobs) - 1}%{throttle}\n")
+            arrayfile.write("#SBATCH --open-mode=append\n")
+            arrayfile.write("#SBATCH --export=NONE\n")
+            arrayfile.write("#SBATCH --get-user-env=L\n\n")
+            arrayfile.write(f"module load GATK/{gatkver}\n")
+            if rversion is not None:
+                arrayfile.write(f"module load RPlus/{rversion}\n")
+            arrayfile.write("module list\n\n")
+
+            arrayfile.write("case ${SLURM_ARRAY_TASK_ID} in\n")
+            for tasknum, ponjob in enumerate(ponjobs):
+                arrayfile.write(f"{tasknum})\n")
+                arrayfile.write(f"\techo \"Making PanelOfNormals {ponjob['jobname']}\"\n")
+                arrayfile.write("\t" + get_pon_command(dict(ponjob, gatkmem=largest_job["gatkmem"]), mimp))
+                arrayfile.write("\t;;\n")
+            arrayfile.write("esac\n")
+        file_written = True
+    except IOError:
+        print(f"Could not write PoN array job script {scriptoutloc}")
+    finally:
+        return file_written
@@ -2,6 +2,14 @@
 import os
 import argparse
 
+import memory_model as mm
+import pon_planner as pp
+
+
+# Memory and time every PoN job used to get, kept as the lower limit.
+MIN_PON_JOB_MEMORY_GB = 5
+MIN_PON_JOB_SECONDS = 3600
+
 
 def get_params():
     pon_args = argparse.ArgumentParser()
@@ -12,6 +20,10 @@ def get_params():
     pon_args.add_argument("-o", "--outdir", type=str, required=True, dest="outdir", help="Path to output directory")
     pon_args.add_argument("-r", "--read-counts-dir", type=str, required=True, dest="read-counts-dir", help="Path to directory with read counts files")
     pon_args.add_argument("-s", "--script-oudir", type=str, required=True, dest="script-outdir", help="Path to write scripts to")
+    pon_args.add_argument("-l", "--intervallist", type=str, dest="intervallist", help="Interval list used for the read counts, to scale job memory and time with")
+    pon_args.add_argument("-m", "--max-samples", type=int, dest="max-samples", help="Maximum number of samples per PanelOfNormals, larger clusters are subsampled")
+    pon_args.add_argument("-a", "--array", action="store_true", dest="array", help="Write all PoN jobs as a single slurm array job")
+    pon_args.add_argument("-t", "--throttle", type=int, default=10, dest="throttle", help="Maximum number of array tasks to run at the same time")
     return vars(pon_args.parse_args())
 
 
@@ -95,21 +107,15 @@ def get_readcount_files(readcountsdir):
     return hdf5files
 
 
-def write_pon_job(ponsamples, readcountfiles, ponscriptoutloc, ponfileoutloc, jobname):
+def write_pon_job(ponjob, ponscriptoutloc):
     """Write a job script for creating the PanelOfNormals
 
     Parameters
     ----------
-    ponsamples : list of str
-        Samples to use for making the PanelOfNormals
-    readcountfiles : list of str
-        Read count files
+    ponjob : dict
+        PoN job planned with pon_planner.plan_pon_job
     ponscriptoutloc : str
         Path to write the PoN job script to
-    ponfileoutloc : str
-        Path job should write output file to
-    jobname : str
-        Name for the PoN job
 
     Returns
     -------
@@ -117,31 +123,26 @@ def write_pon_job(ponsamples, readcountfiles, ponscriptoutloc, ponfileoutloc, jo
         True if file has been successfully written, False if not
     """
     file_written = False
+    jobname = ponjob["jobname"]
     try:
         with open(ponscriptoutloc, 'w') as ponjobfile:
             ponjobfile.write("#!/bin/bash\n")
             ponjobfile.write(f"#SBATCH --job-name={jobname}\n")
             ponjobfile.write(f"#SBATCH --output={jobname}.out\n")
             ponjobfile.write(f"#SBATCH --error={jobname}.err\n")
-            ponjobfile.write("#SBATCH --time=01:00:00\n")
+            ponjobfile.write(f"#SBATCH --time={ponjob['time']}\n")
             ponjobfile.write("#SBATCH --cpus-per-task=1\n")
-            ponjobfile.write("#SBATCH --mem=5gb\n")
+            ponjobfile.write(f"#SBATCH --mem={ponjob['jobmem']}\n")
             ponjobfile.write("#SBATCH --nodes=1\n")
             ponjobfile.write("#SBATCH --open-mode=append\n")
             ponjobfile.write("#SBATCH --export=NONE\n")
             ponjobfile.write("#SBATCH --get-user-env=L\n\n")
             ponjobfile.write("module load GATK/4.1.4.1-Java-8-LTS\n")
             ponjobfile.write("module list\n\n")
-            ponjobfile.write("gatk CreateReadCountPanelOfNormals \\\n")
-
-            for rcfile in readcountfiles:
-                samplename = rcfile.split("/")[-1].split(".")[0]
-                if samplename in ponsamples:
-                    ponjobfile.write(f"\t-I {rcfile} \\\n")
-            ponjobfile.write(f"\t-O {ponfileoutloc}\n")
+            ponjobfile.write(pp.get_pon_command(ponjob))
         file_written = True
     except IOError:
-        print(f"")
+        print(f"Could not write PoN job script {ponscriptoutloc}")
     finally:
         return file_written
 
@@ -195,16 +196,18 @@ def main():
     btsdata = read_bam_to_sex(pon_params["bam-to-sex"])
     s4cdata = read_combineds4_data(pon_params["s4-clusters"])
     readcountfiles = get_readcount_files(readcountsdir)
+    num_of_intervals = 0
+    if pon_params["intervallist"] is not None:
+        num_of_intervals = mm.count_intervals(pon_params["intervallist"]) or 0
 
     # Iterate over the combined clusters
+    ponjobs = []
     for clusternum in s4cdata:
         # Make some outfile path
         pon_name_f = f"{joboutdir}{prefix_name}_fpon_{clusternum}.hdf5"
         pon_name_m = f"{joboutdir}{prefix_name}_mpon_{clusternum}.hdf5"
         ponjob_name_f = f"{prefix_name}_fpon_{clusternum}"
         ponjob_name_m = f"{prefix_name}_mpon_{clusternum}"
-        script_path_f = f"{scriptoutdir}{prefix_name}_makefpon_{clusternum}.sh"
-        script_path_m = f"{scriptoutdir}{prefix_name}_makempon_{clusternum}.sh"
         ponlink_fpath = f"{outdir}{prefix_name}_{clusternum}_fsamples.txt"
         ponlink_mpath = f"{outdir}{prefix_name}_{clusternum}_msamples.txt"
 
@@ -212,11 +215,13 @@ def main():
         fsamples = fetch_fm_samples(s4cdata[clusternum], btsdata["F"])
         msamples = fetch_fm_samples(s4cdata[clusternum], btsdata["M"])
 
-        # Make the PanelOfNormals job with the samples
-        wrote_ponjob_f = write_pon_job(fsamples, readcountfiles, script_path_f, pon_name_f, ponjob_name_f)
-        print(f"Successfully wrote female PoN jobscript for cluster {clusternum}?: {wrote_ponjob_f}")
-        wrote_ponjob_m = write_pon_job(msamples, readcountfiles, script_path_m, pon_name_m, ponjob_name_m)
-        print(f"Successfully wrote male PoN jobscript for cluster {clusternum}?: {wrote_ponjob_m}")
+        # Plan the PanelOfNormals jobs with the samples
+        ponjobs.append((pp.plan_pon_job(ponjob_name_f, fsamples, readcountfiles, pon_name_f, num_of_intervals, pon_params["max-samples"],
+                                        MIN_PON_JOB_MEMORY_GB, MIN_PON_JOB_SECONDS),
+                        f"{scriptoutdir}{prefix_name}_makefpon_{clusternum}.sh"))
+        ponjobs.append((pp.plan_pon_job(ponjob_name_m, msamples, readcountfiles, pon_name_m, num_of_intervals, pon_params["max-samples"],
+                                        MIN_PON_JOB_MEMORY_GB, MIN_PON_JOB_SECONDS),
+                        f"{scriptoutdir}{prefix_name}_makempon_{clusternum}.sh"))
 
         # Make the file listing the PanelOfNormals to use for each read counts file
         wrote_ponlink_f = write_samples_to_pon(fsamples, readcountfiles, pon_name_f, ponlink_fpath)
@@ -224,6 +229,19 @@ def main():
         wrote_ponlink_m = write_samples_to_pon(msamples, readcountfiles, pon_name_m, ponlink_mpath)
         print(f"Successfully wrote male sample to PoN file for cluster {clusternum}?: {wrote_ponlink_m}")
 
+    # Make the PanelOfNormals jobs, skipping PoNs without any read count files
+    ponjobs = [(ponjob, scriptpath) for ponjob, scriptpath in ponjobs if ponjob["inputs"]]
+    if pon_params["array"]:
+        if ponjobs:
+            array_script_path = f"{scriptoutdir}{prefix_name}_makepons_array.sh"
+            wrote_array = pp.write_pon_array_job([ponjob for ponjob, scriptpath in ponjobs], array_script_path,
+                                                 f"{prefix_name}_pons", pon_params["throttle"], "4.1.4.1-Java-8-LTS")
+            print(f"Successfully wrote PoN array jobscript with {len(ponjobs)} PoNs?: {wrote_array}")
+    else:
+        for ponjob, scriptpath in ponjobs:
+            wrote_ponjob = write_pon_job(ponjob, scriptpath)
+            print(f"Successfully wrote PoN jobscript {ponjob['jobname']} ({len(ponjob['inputs'])} samples, {ponjob['jobmem']}, {ponjob['time']})?: {wrote_ponjob}")
+
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,533 @@
+#!/usr/bin/env python
+import argparse
+import math
+import os
+import re
+import shlex
+import sqlite3
+
+
+SACCT_COLUMNS = ["JobID", "Elapsed", "AllocCPUS", "AveCPU", "ReqMem", "MaxVMSize", "MaxRSS", "MaxDiskRead", "MaxDiskWrite"]
+TELEMETRY_SCHEMA = "CREATE TABLE IF NOT EXISTS jobs (" \
+    "jobid TEXT PRIMARY KEY, " \
+    "stage TEXT, " \
+    "sample TEXT, " \
+    "jobname TEXT, " \
+    "elapsed_s INTEGER, " \
+    "alloccpus INTEGER, " \
+    "avecpu_s INTEGER, " \
+    "reqmem_mb REAL, " \
+    "maxvmsize_mb REAL, " \
+    "maxrss_mb REAL, " \
+    "maxdiskread_mb REAL, " \
+    "maxdiskwrite_mb REAL, " \
+    "input_bytes INTEGER, " \
+    "intervals INTEGER, " \
+    "inputs INTEGER)"
+TELEMETRY_INDEX = "CREATE INDEX IF NOT EXISTS jobs_stage ON jobs (stage)"
+# Command line options of the GATK4 commands in job scripts with the input files and the interval list.
+GATK_INPUT_OPTIONS = ("-I", "--input")
+GATK_INTERVAL_OPTIONS = ("-L", "--intervals")
+
+
+def get_params():
+    tel_args = argparse.ArgumentParser()
+    tel_args.add_argument("-db", "--database", dest="database", required=True, help="Path to the SQLite telemetry database")
+    tel_subparsers = tel_args.add_subparsers(dest="command", required=True)
+
+    ingest_args = tel_subparsers.add_parser("ingest", help="Add job records from slurm job .out files")
+    ingest_args.add_argument("-d", "--indir", dest="indir", nargs="+", required=True, help="Path to input directory with job output files")
+    ingest_args.add_argument("-s", "--stage", dest="stage", required=True, help="Stage the jobs belong to (e.g. crc, pon)")
+    ingest_args.add_argument("-p", "--prefix", dest="prefix", default="", help="Job name prefix to remove to obtain the sample name")
+    ingest_args.add_argument("-j", "--job-scripts-dir", dest="jobscriptsdir", help="Directory with the job scripts (<job name>.sh) to obtain the inputs of each job from, by default the directory of the .out files")
+    ingest_args.add_argument("-i", "--inputs-dir", dest="inputsdir", help="Directory with the job input files to obtain input sizes from")
+    ingest_args.add_argument("-l", "--intervallist", dest="intervallist", help="Interval list the jobs used to obtain the interval count from")
+    ingest_args.add_argument("-n", "--num-inputs", dest="numinputs", type=int, default=1, help="Number of input files combined in each job (e.g. the PoN size for pon jobs) [1]")
+
+    query_args = tel_subparsers.add_parser("query", help="Report runtime, memory and CPU efficiency per stage")
+    query_args.add_argument("-s", "--stage", dest="stage", help="Only report this stage")
+    query_args.add_argument("-w", "--worst", dest="worst", type=int, default=5, help="Number of worst offenders to report per stage")
+    return vars(tel_args.parse_args())
+
+
+def open_database(databaseloc):
+    """Open and return a connection to the telemetry database, creating the
+    jobs table if required.
+
+    Parameters
+    ----------
+    databaseloc : str
+        Path to the SQLite telemetry database
+
+    Returns
+    -------
+    sqlite3.Connection
+        Connection to the telemetry database
+    """
+    telemetry_db = sqlite3.connect(databaseloc)
+    telemetry_db.execute(TELEMETRY_SCHEMA)
+    telemetry_db.execute(TELEMETRY_INDEX)
+    # Databases made before the inputs column was added get the column added.
+    if "inputs" not in [x[1] for x in telemetry_db.execute("PRAGMA table_info(jobs)")]:
+        telemetry_db.execute("ALTER TABLE jobs ADD COLUMN inputs INTEGER")
+    return telemetry_db
+
+
+def sacct_time_to_seconds(saccttime):
+    """Convert a sacct time value ([D-]HH:MM:SS or MM:SS.mmm) to seconds.
+
+    Parameters
+    ----------
+    saccttime : str
+        Time value as reported by sacct
+
+    Returns
+    -------
+    int or None
+        Time in seconds, None if the value could not be converted
+    """
+    try:
+        days = 0
+        if "-" in saccttime:
+            days, saccttime = saccttime.split("-")
+        timedata = [float(x) for x in saccttime.split(":")]
+        while len(timedata) < 3:
+            timedata.insert(0, 0.0)
+        return int(int(days) * 86400 + timedata[0] * 3600 + timedata[1] * 60 + timedata[2])
+    except ValueError:
+        return None
+
+
+def sacct_memory_to_mb(sacctmem):
+    """Convert a sacct memory value (e.g. 123456K, 1.5G, 4Gn) to MB.
+
+    Parameters
+    ----------
+    sacctmem : str
+        Memory value as reported by sacct
+
+    Returns
+    -------
+    float or None
+        Memory in MB, None if the value could not be converted
+    """
+    mem_measure_level = {"K": -1, "M": 0, "G": 1, "T": 2}
+    sacctmem = sacctmem.strip().upper()
+    if sacctmem[-1:] in ("N", "C") and sacctmem[-2:-1] in mem_measure_level:
+        sacctmem = sacctmem[0:-1]
+    try:
+        if sacctmem[-1:] in mem_measure_level:
+            return float(sacctmem[0:-1]) * (1024 ** mem_measure_level[sacctmem[-1]])
+        return float(sacctmem) / (1024 ** 2)
+    except ValueError:
+        return None
+
+
+def get_sacct_column_spans(separatorline):
+    """Return the start and end of each column of fixed width sacct output,
+    taken from the line of dashes below the sacct header."""
+    return [(dashes.start(), dashes.end()) for dashes in re.finditer(r"-+", separatorline)]
+
+
+def split_sacct_line(fileline, columnspans):
+    """Split a sacct line into its values.
+
+    Lines of sacct --parsable2 output are split on '|'. Lines of the default
+    fixed width output are cut at the column positions of the separator
+    line, so empty values keep their column. Without a separator line the
+    line is split on whitespace.
+
+    Parameters
+    ----------
+    fileline : str
+        Sacct header or job line
+    columnspans : list of tuple or None
+        Start and end of each column, None if no separator line was read
+
+    Returns
+    -------
+    list of str
+        Values of the sacct line
+    """
+    fileline = fileline.rstrip("\n")
+    if "|" in fileline:
+        return [sacctvalue.strip() for sacctvalue in fileline.split("|")]
+    if columnspans is None:
+        return fileline.split()
+    return [fileline[spanstart:spanend].strip() for spanstart, spanend in columnspans]
+
+
+def read_job_record(outfileloc):
+    """Read the sacct lines of a single slurm job .out file and combine the
+    job steps into a single job record.
+
+    The main job line carries the elapsed time, the job steps (.batch,
+    .extern) carry the memory and CPU usage. For each value the maximum over
+    all lines is kept. The sacct lines are the lines after the last sacct
+    header, whose values are matched to their columns with the header, in
+    the default fixed width output as well as in --parsable2 output.
+
+    Parameters
+    ----------
+    outfileloc : str
+        Path to the slurm job .out file
+
+    Returns
+    -------
+    job_record : dict or None
+        Combined job record, None if the file has no sacct lines
+    """
+    job_record = None
+    try:
+        with open(outfileloc, 'r') as joboutfile:
+            filelines = joboutfile.readlines()
+    except IOError:
+        print(f"Could not read {outfileloc}")
+        return job_record
+
+    # Only the lines after the last sacct header are sacct lines, so digit-led log lines before it are skipped.
+    header_indices = [lineindex for lineindex, fileline in enumerate(filelines) if fileline.strip().startswith("JobID")]
+    column_names = SACCT_COLUMNS
+    column_spans = None
+    if header_indices:
+        header_line = filelines[header_indices[-1]]
+        filelines = filelines[header_indices[-1]+1:]
+        if filelines and filelines[0].strip().startswith("-") and set(filelines[0].strip()) <= {"-", " "}:
+            column_spans = get_sacct_column_spans(filelines[0])
+        column_names = split_sacct_line(header_line, column_spans)
+
+    for fileline in filelines:
+        if fileline[0:1].isdigit():
+            linevalues = dict(zip(column_names, split_sacct_line(fileline, column_spans)))
+            if job_record is None:
+                job_record = {"jobid": linevalues["JobID"].split(".")[0], "elapsed_s": None, "alloccpus": None,
+                              "avecpu_s": None, "reqmem_mb": None, "maxvmsize_mb": None, "maxrss_mb": None,
+                              "maxdiskread_mb": None, "maxdiskwrite_mb": None}
+            update_job_record(job_record, linevalues)
+    return job_record
+
+
+def update_job_record(jobrecord, linevalues):
+    """Update a job record with the values of a single sacct line.
+
+    Values that are set but could not be converted are reported.
+
+    Parameters
+    ----------
+    jobrecord : dict
+        Job record to update
+    linevalues : dict
+        Values of a single sacct line per sacct column
+    """
+    converters = {"elapsed_s": ("Elapsed", sacct_time_to_seconds),
+                  "alloccpus": ("AllocCPUS", lambda x: int(x) if x.isdigit() else None),
+                  "avecpu_s": ("AveCPU", sacct_time_to_seconds),
+                  "reqmem_mb": ("ReqMem", sacct_memory_to_mb),
+                  "maxvmsize_mb": ("MaxVMSize", sacct_memory_to_mb),
+                  "maxrss_mb": ("MaxRSS", sacct_memory_to_mb),
+                  "maxdiskread_mb": ("MaxDiskRead", sacct_memory_to_mb),
+                  "maxdiskwrite_mb": ("MaxDiskWrite", sacct_memory_to_mb)}
+    for recordkey, (sacctcolumn, converter) in converters.items():
+        sacctvalue = linevalues.get(sacctcolumn, "")
+        if sacctvalue == "":
+            continue
+        recordvalue = converter(sacctvalue)
+        if recordvalue is None:
+            print(f"Could not convert {sacctcolumn} value {sacctvalue} of job {linevalues.get('JobID')}")
+        elif jobrecord[recordkey] is None or recordvalue > jobrecord[recordkey]:
+            jobrecord[recordkey] = recordvalue
+
+
+def get_input_sizes(inputsdirloc):
+    """Return the size of the input files per sample name.
+
+    Parameters
+    ----------
+    inputsdirloc : str
+        Path to directory with the job input files
+
+    Returns
+    -------
+    input_sizes : dict
+        Input file size in bytes per sample name
+    """
+    input_sizes = {}
+    with os.scandir(inputsdirloc) as inputentries:
+        for inputentry in inputentries:
+            if inputentry.is_file():
+                samplename = inputentry.name.split(".")[0]
+                input_sizes[samplename] = input_sizes.get(samplename, 0) + inputentry.stat().st_size
+    return input_sizes
+
+
+def read_job_inputs(jobscriptloc):
+    """Read the inputs of the GATK4 commands in a job script.
+
+    The input files (-I) and interval list (-L) of each command are taken
+    from the script, so jobs running multiple commands, such as the
+    {jobname}_{x} jobs of csj3.py, get their own input sizes.
+
+    Parameters
+    ----------
+    jobscriptloc : str
+        Path to the job script
+
+    Returns
+    -------
+    job_inputs : dict or None
+        Largest number of input files of a single command, size in bytes of
+        the largest input file and the interval list of the commands, None if
+        the script could not be read or has no GATK4 input files
+    """
+    try:
+        with open(jobscriptloc, 'r') as jobscript:
+            scriptlines = jobscript.read().replace("\\\n", " ").splitlines()
+    except IOError:
+        return None
+
+    job_inputs = {"inputs": 0, "input_bytes": None, "intervallist": None}
+    for scriptline in scriptlines:
+        try:
+            commandargs = shlex.split(scriptline)
+        except ValueError:
+            continue
+        if len(commandargs) == 0 or commandargs[0] != "gatk":
+            continue
+        inputfiles = [commandargs[argindex+1] for argindex in range(len(commandargs)-1) if commandargs[argindex] in GATK_INPUT_OPTIONS]
+        intervallists = [commandargs[argindex+1] for argindex in range(len(commandargs)-1) if commandargs[argindex] in GATK_INTERVAL_OPTIONS]
+        job_inputs["inputs"] = max(job_inputs["inputs"], len(inputfiles))
+        if len(intervallists) > 0:
+            job_inputs["intervallist"] = intervallists[0]
+        for inputfile in inputfiles:
+            try:
+                job_inputs["input_bytes"] = max(job_inputs["input_bytes"] or 0, os.path.getsize(inputfile))
+            except OSError:
+                print(f"Could not determine size of {inputfile} of job script {jobscriptloc}")
+    if job_inputs["inputs"] == 0:
+        return None
+    return job_inputs
+
+
+def count_intervals(intervallistloc):
+    """Count and return the number of intervals in an interval list or BED
+    file.
+
+    Parameters
+    ----------
+    intervallistloc : str
+        Path to the interval list
+
+    Returns
+    -------
+    num_of_intervals : int or None
+        Number of intervals, None if the file could not be read
+    """
+    try:
+        with open(intervallistloc, 'r') as intervalfile:
+            return sum(1 for intervalline in intervalfile if not intervalline.startswith(("@", "#", "track", "browser")) and intervalline.strip() != "")
+    except IOError:
+        print(f"Could not read interval list {intervallistloc}")
+        return None
+
+
+def ingest_jobs(telemetrydb, indirlocs, stage, prefix, inputsizes, numofintervals, numofinputs=1, jobscriptsdir=None):
+    """Read the slurm job .out files and add their job records to the
+    telemetry database.
+
+    The number of inputs, input size and interval count of a job are taken
+    from its job script if it has GATK4 commands with input files. Otherwise
+    the input size is looked up by the sample name in the job name, which
+    only works for stages with one sample per job, and the given number of
+    intervals and inputs are used.
+
+    Parameters
+    ----------
+    telemetrydb : sqlite3.Connection
+        Connection to the telemetry database
+    indirlocs : list of str
+        Paths to directories with slurm job .out files
+    stage : str
+        Stage the jobs belong to
+    prefix : str
+        Job name prefix to remove to obtain the sample name
+    inputsizes : dict
+        Input file size in bytes per sample name
+    numofintervals : int or None
+        Number of intervals the jobs used
+    numofinputs : int
+        Number of input files combined in each job
+    jobscriptsdir : str
+        Directory with the job scripts, None to use the directory of the .out files
+
+    Returns
+    -------
+    num_of_records : int
+        Number of job records added or updated
+    """
+    num_of_records = 0
+    interval_counts = {}
+    for indirloc in indirlocs:
+        with os.scandir(indirloc) as direntries:
+            for direntry in direntries:
+                if direntry.name.endswith(".out"):
+                    job_record = read_job_record(direntry.path)
+                    if job_record is not None:
+                        jobname = direntry.name[0:-4]
+                        samplename = jobname[len(prefix):].lstrip("_") if prefix != "" and jobname.startswith(prefix) else jobname
+                        job_record.update({"stage": stage, "sample": samplename, "jobname": jobname,
+                                           "input_bytes": inputsizes.get(samplename), "intervals": numofintervals,
+                                           "inputs": numofinputs})
+                        job_inputs = read_job_inputs(os.path.join(jobscriptsdir or indirloc, f"{jobname}.sh"))
+                        if job_inputs is not None:
+                            job_record.update({"input_bytes": job_inputs["input_bytes"], "inputs": job_inputs["inputs"]})
+                            if job_inputs["intervallist"] is not None:
+                                if job_inputs["intervallist"] not in interval_counts:
+                                    interval_counts[job_inputs["intervallist"]] = count_intervals(job_inputs["intervallist"])
+                                job_record["intervals"] = interval_counts[job_inputs["intervallist"]] or numofintervals
+                        telemetrydb.execute("INSERT OR REPLACE INTO jobs (jobid, stage, sample, jobname, elapsed_s, "
+                                            "alloccpus, avecpu_s, reqmem_mb, maxvmsize_mb, maxrss_mb, maxdiskread_mb, "
+                                            "maxdiskwrite_mb, input_bytes, intervals, inputs) VALUES (:jobid, :stage, :sample, "
+                                            ":jobname, :elapsed_s, :alloccpus, :avecpu_s, :reqmem_mb, :maxvmsize_mb, "
+                                            ":maxrss_mb, :maxdiskread_mb, :maxdiskwrite_mb, :input_bytes, :intervals, :inputs)",
+                                            job_record)
+                        num_of_records += 1
+    telemetrydb.commit()
+    return num_of_records
+
+
+def percentile(sortedvalues, percent):
+    """Return the nearest-rank percentile of a sorted list of values.
+
+    Parameters
+    ----------
+    sortedvalues : list of float
+        Sorted values
+    percent : int
+        Percentile to return
+
+    Returns
+    -------
+    float or None
+        Percentile value, None if there are no values
+    """
+    if not sortedvalues:
+        return None
+    rank = max(1, math.ceil(len(sortedvalues) * percent / 100))
+    return sortedvalues[rank - 1]
+
+
+def get_stage_summary(telemetrydb, stage):
+    """Determine and return the runtime, memory and CPU efficiency summary of
+    a single stage.
+
+    Parameters
+    ----------
+    telemetrydb : sqlite3.Connection
+        Connection to the telemetry database
+    stage : str
+        Stage to summarize
+
+    Returns
+    -------
+    stage_summary : dict
+        Number of jobs, p50/p95/p99 runtime and MaxRSS and mean CPU efficiency
+    """
+    elapsed_values = [x[0] for x in telemetrydb.execute("SELECT elapsed_s FROM jobs WHERE stage = ? AND elapsed_s IS NOT NULL ORDER BY elapsed_s", (stage,))]
+    maxrss_values = [x[0] for x in telemetrydb.execute("SELECT maxrss_mb FROM jobs WHERE stage = ? AND maxrss_mb IS NOT NULL ORDER BY maxrss_mb", (stage,))]
+    cpu_efficiency = telemetrydb.execute("SELECT AVG(CAST(avecpu_s AS REAL) / (elapsed_s * alloccpus)) FROM jobs "
+                                         "WHERE stage = ? AND elapsed_s > 0 AND alloccpus > 0 AND avecpu_s IS NOT NULL",
+                                         (stage,)).fetchone()[0]
+    stage_summary = {"jobs": len(elapsed_values), "cpu_efficiency": cpu_efficiency}
+    for percent in (50, 95, 99):
+        stage_summary[f"elapsed_p{percent}"] = percentile(elapsed_values, percent)
+        stage_summary[f"maxrss_p{percent}"] = percentile(maxrss_values, percent)
+    return stage_summary
+
+
+def get_worst_offenders(telemetrydb, stage, numofjobs):
+    """Return the jobs of a stage with the longest runtime, highest MaxRSS and
+    lowest CPU efficiency.
+
+    Parameters
+    ----------
+    telemetrydb : sqlite3.Connection
+        Connection to the telemetry database
+    stage : str
+        Stage to report
+    numofjobs : int
+        Number of jobs to report per category
+
+    Returns
+    -------
+    dict
+        Lists of (jobid, sample, value) tuples per category
+    """
+    return {"elapsed_s": telemetrydb.execute("SELECT jobid, sample, elapsed_s FROM jobs WHERE stage = ? AND elapsed_s IS NOT NULL "
+                                             "ORDER BY elapsed_s DESC LIMIT ?", (stage, numofjobs)).fetchall(),
+            "maxrss_mb": telemetrydb.execute("SELECT jobid, sample, maxrss_mb FROM jobs WHERE stage = ? AND maxrss_mb IS NOT NULL "
+                                             "ORDER BY maxrss_mb DESC LIMIT ?", (stage, numofjobs)).fetchall(),
+            "cpu_efficiency": telemetrydb.execute("SELECT jobid, sample, CAST(avecpu_s AS REAL) / (elapsed_s * alloccpus) AS eff "
+                                                  "FROM jobs WHERE stage = ? AND elapsed_s > 0 AND alloccpus > 0 AND avecpu_s IS NOT NULL "
+                                                  "ORDER BY eff ASC LIMIT ?", (stage, numofjobs)).fetchall()}
+
+
+def format_value(statvalue):
+    """Return a statistics value rounded for display, or NA if missing."""
+    return "NA" if statvalue is None else str(round(statvalue, 3))
+
+
+def report_stages(telemetrydb, stage, numofworst):
+    """Print the summary and worst offenders of one or all stages.
+
+    Parameters
+    ----------
+    telemetrydb : sqlite3.Connection
+        Connection to the telemetry database
+    stage : str or None
+        Stage to report, all stages if None
+    numofworst : int
+        Number of worst offenders to report per category
+    """
+    if stage is None:
+        stages = [x[0] for x in telemetrydb.execute("SELECT DISTINCT stage FROM jobs ORDER BY stage")]
+    else:
+        stages = [stage]
+
+    print("Stage\tJobs\tElapsed_p50\tElapsed_p95\tElapsed_p99\tMaxRSS_p50\tMaxRSS_p95\tMaxRSS_p99\tCPU_efficiency")
+    for stagename in stages:
+        stage_summary = get_stage_summary(telemetrydb, stagename)
+        print(f"{stagename}\t{stage_summary['jobs']}\t"
+              f"{format_value(stage_summary['elapsed_p50'])}\t{format_value(stage_summary['elapsed_p95'])}\t"
+              f"{format_value(stage_summary['elapsed_p99'])}\t{format_value(stage_summary['maxrss_p50'])}\t"
+              f"{format_value(stage_summary['maxrss_p95'])}\t{format_value(stage_summary['maxrss_p99'])}\t"
+              f"{format_value(stage_summary['cpu_efficiency'])}")
+
+    for stagename in stages:
+        worst_offenders = get_worst_offenders(telemetrydb, stagename, numofworst)
+        for category, offenders in worst_offenders.items():
+            print(f"\nWorst {category} jobs for {stagename}:")
+            for jobid, samplename, statvalue in offenders:
+                print(f"{jobid}\t{samplename}\t{format_value(statvalue)}")
+
+
+def main():
+    tel_params = get_params()
+    telemetry_db = open_database(tel_params["database"])
+
+    if tel_params["command"] == "ingest":
+        input_sizes = {}
+        if tel_params["inputsdir"] is not None:
+            input_sizes = get_input_sizes(tel_params["inputsdir"])
+        num_of_intervals = None
+        if tel_params["intervallist"] is not None:
+            num_of_intervals = count_intervals(tel_params["intervallist"])
+        num_of_records = ingest_jobs(telemetry_db, tel_params["indir"], tel_params["stage"], tel_params["prefix"],
+                                     input_sizes, num_of_intervals, tel_params["numinputs"], tel_params["jobscriptsdir"])
+        print(f"Added {num_of_records} job records for stage {tel_params['stage']}")
+    else:
+        report_stages(telemetry_db, tel_params["stage"], tel_params["worst"])
+    telemetry_db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,41 +1,154 @@
 #!/usr/bin/env python
 import argparse
 import os
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+
+# Header line of the sacct summary block at the end of a job .out file.
+SACCT_HEADER = re.compile(rb"^\s*JobID\s", re.MULTILINE)
 
 
 def get_params():
     jobdata_args = argparse.ArgumentParser()
     jobdata_args.add_argument("-d", "--indir", dest="indir", nargs="+", required=True, help="Path to input directory with job output files")
     jobdata_args.add_argument("-o", "--outfile", dest="outfile", required=True, help="Path to write job data output file to")
+    jobdata_args.add_argument("-w", "--workers", dest="workers", type=int, default=16, help="Number of job output files to read at the same time [16]")
+    jobdata_args.add_argument("-t", "--tail-bytes", dest="tailbytes", type=int, default=16384, help="Number of bytes at the end of each job output file to look for the sacct lines in [16384]")
     return vars(jobdata_args.parse_args())
 
 
-def gather_job_data(outfiles):
-    jobdata = {}
-    for outfile in outfiles:
-        try:
-            with open(outfile, 'r') as joboutfile:
-                for fileline in joboutfile:
-                    if fileline[0].isdigit():
-                        filelinedata = fileline.strip().split()
-                        jobdata[filelinedata[0]] = filelinedata
-        except IOError:
-            print(f"Could not read {outfile}")
-    return jobdata
+def read_sacct_lines(outfileloc, tailbytes):
+    """Read and return the sacct lines at the end of a single job .out file.
+
+    Only the last bytes of the file are read. The sacct lines are the lines
+    starting with a digit after the last sacct header in these bytes. If the
+    header is not in the last bytes the whole file is read, and without a
+    header all lines starting with a digit are used.
+
+    Parameters
+    ----------
+    outfileloc : str
+        Path to the slurm job .out file
+    tailbytes : int
+        Number of bytes at the end of the file to read
+
+    Returns
+    -------
+    sacct_lines : list of list of str
+        Values of each sacct line
+    bytes_read : int
+        Number of bytes read from the file
+    """
+    with open(outfileloc, 'rb') as joboutfile:
+        filesize = joboutfile.seek(0, os.SEEK_END)
+        joboutfile.seek(max(0, filesize - tailbytes))
+        filetail = joboutfile.read()
+        bytes_read = len(filetail)
+        if filesize > tailbytes:
+            filetail = filetail[filetail.find(b"\n")+1:]
+        header_matches = list(SACCT_HEADER.finditer(filetail))
+        if len(header_matches) == 0 and filesize > tailbytes:
+            joboutfile.seek(0)
+            filetail = joboutfile.read()
+            bytes_read += len(filetail)
+            header_matches = list(SACCT_HEADER.finditer(filetail))
+    if len(header_matches) > 0:
+        filetail = filetail[header_matches[-1].start():]
+    return [fileline.strip().split() for fileline in filetail.decode(errors="replace").splitlines() if fileline[0:1].isdigit()], bytes_read
+
+
+def gather_job_data(outfiles, numofworkers, tailbytes, harveststats):
+    """Read the job .out files with a thread pool and yield their sacct lines.
+
+    The sacct lines are yielded per file, in the order of the files, as soon
+    as the file has been read.
+
+    Parameters
+    ----------
+    outfiles : list of str
+        Paths to the slurm job .out files
+    numofworkers : int
+        Number of files to read at the same time
+    tailbytes : int
+        Number of bytes at the end of each file to read
+    harveststats : dict
+        Number of files and bytes read, updated while reading
+
+    Yields
+    ------
+    list of str
+        Values of a single sacct line
+    """
+    with ThreadPoolExecutor(max_workers=max(1, numofworkers)) as read_executor:
+        read_futures = [read_executor.submit(read_sacct_lines, outfile, tailbytes) for outfile in outfiles]
+        for outfile, read_future in zip(outfiles, read_futures):
+            try:
+                sacct_lines, bytes_read = read_future.result()
+            except IOError:
+                print(f"Could not read {outfile}")
+                continue
+            harveststats["files"] += 1
+            harveststats["bytes"] += bytes_read
+            yield from sacct_lines
 
 
 def write_output_file(jobdatastats, outfileloc):
+    """Write the sacct lines to the output file while they are read. Each job
+    (step) ends up once in the output file, with the values of its last
+    sacct line.
+
+    Parameters
+    ----------
+    jobdatastats : iterable of list of str
+        Values of each sacct line
+    outfileloc : str
+        Path to write the output file to
+
+    Returns
+    -------
+    wrote_file : bool
+        True if the output file has been written, False if not
+    num_of_lines : int
+        Number of written sacct lines
+    """
     wrote_file = False
+    written_jobids = set()
+    has_duplicates = False
     try:
         with open(outfileloc, 'w') as outfile:
             outfile.write("JobID\tElapsed\tAllocCPUS\tAveCPU\tReqMem\tMaxVMSize\tMaxRSS\tMaxDiskRead\tMaxDiskWrite\n")
             for jobstats in jobdatastats:
-                outfile.write("\t".join(jobdatastats[jobstats]) +"\n")
+                has_duplicates = has_duplicates or jobstats[0] in written_jobids
+                written_jobids.add(jobstats[0])
+                outfile.write("\t".join(jobstats) +"\n")
+        if has_duplicates:
+            keep_last_job_lines(outfileloc)
         wrote_file = True
     except IOError:
-        print(f"Could not write ")
+        print(f"Could not write {outfileloc}")
     finally:
-        return wrote_file
+        return wrote_file, len(written_jobids)
+
+
+def keep_last_job_lines(outfileloc):
+    """Rewrite the output file with only the last line of each job (step)
+    that occurs more than once, at the place of its first line.
+
+    Parameters
+    ----------
+    outfileloc : str
+        Path to the output file
+    """
+    with open(outfileloc, 'r') as outfile:
+        headerline = next(outfile)
+        jobdata = {}
+        for fileline in outfile:
+            jobdata[fileline.split("\t", 1)[0]] = fileline
+    with open(outfileloc, 'w') as outfile:
+        outfile.write(headerline)
+        outfile.writelines(jobdata.values())
 
 
 def get_outfilepaths(indirlocs):
@@ -52,9 +165,14 @@ def get_outfilepaths(indirlocs):
 def main():
     jobdata_params = get_params()
     joboutfiles = get_outfilepaths(jobdata_params["indir"])
-    jobstats = gather_job_data(joboutfiles)
-    file_written = write_output_file(jobstats, jobdata_params["outfile"])
-    print(f"Wrote the output file: {file_written}")
+    harvest_stats = {"files": 0, "bytes": 0}
+    harvest_start = time.perf_counter()
+    jobstats = gather_job_data(joboutfiles, jobdata_params["workers"], jobdata_params["tailbytes"], harvest_stats)
+    file_written, num_of_lines = write_output_file(jobstats, jobdata_params["outfile"])
+    harvest_time = max(time.perf_counter() - harvest_start, 1e-9)
+    print(f"Read {harvest_stats['files']} of {len(joboutfiles)} job output files ({harvest_stats['bytes'] / 1024 ** 2:.2f} MB) in {harvest_time:.2f}s: "
+          f"{harvest_stats['files'] / harvest_time:.1f} files/s, {harvest_stats['bytes'] / 1024 ** 2 / harvest_time:.2f} MB/s")
+    print(f"Wrote the output file with {num_of_lines} job lines: {file_written}")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,569 @@
+#!/usr/bin/env python
+import os
+import gzip
+import struct
+import argparse
+
+import h5py
+import numpy as np
+
+
+# Bin number of the BAI pseudo bin holding the mapped and unmapped read counts of a reference.
+BAI_PSEUDO_BIN = 37450
+
+# Default X/autosome coverage ratio thresholds, the same as used by determine_ud_sexes.py
+MALE_MAX_RATIO = 0.7
+FEMALE_MIN_RATIO = 0.85
+FEMALE_MAX_RATIO = 1.3
+SEX_THRESHOLDS = (MALE_MAX_RATIO, FEMALE_MIN_RATIO, FEMALE_MAX_RATIO)
+
+# Dataset paths within a GATK4 CollectReadCounts HDF5 file.
+READCOUNTS_VALUES_PATH = "/counts/values"
+READCOUNTS_INTERVALS_PATH = "/intervals/transposed_index_start_end"
+READCOUNTS_CONTIGS_PATH = "/intervals/indexed_contig_names"
+
+
+def get_params():
+    """Define CLI parameters and return the set values.
+
+    Returns
+    -------
+    dict
+        Set parameter values
+    """
+    sex_args = argparse.ArgumentParser()
+    sex_input = sex_args.add_mutually_exclusive_group(required=True)
+    sex_input.add_argument("-u", "--uddir", type=str, dest="uddir", help="Path to directory with UD BAM files and their indexes")
+    sex_input.add_argument("-r", "--read-counts-dir", type=str, dest="read-counts-dir", help="Path to directory with CollectReadCounts .hdf5 or .tsv files")
+    sex_args.add_argument("-l", "--intervallist", type=str, dest="intervallist", help="Path to intervallist or BED file with the targets, required with -u")
+    sex_args.add_argument("-o", "--outfile", type=str, required=True, dest="outfile", help="Path to write the determined sexes to")
+    sex_args.add_argument("-b", "--bam-to-sex", type=str, dest="bam-to-sex", help="Path to BAM to sex file, to only determine the sex of UD samples in it")
+    sex_args.add_argument("-c", "--coverage-outfile", type=str, dest="coverage-outfile", help="Path to write the X, Y and autosomal target depths per sample to")
+    sex_args.add_argument("-t", "--sex-table-outfile", type=str, dest="sex-table-outfile", help="Path to write the BAM to sex file with the UD sexes replaced by the determined sexes to")
+    sex_args.add_argument("-n", "--batch-size", type=int, default=500, dest="batch-size", help="Number of read count files to load at once [500]")
+    sex_args.add_argument("-mm", "--male-max-ratio", type=float, default=MALE_MAX_RATIO, dest="male-max-ratio", help=f"Maximum X/autosome ratio of males [{MALE_MAX_RATIO}]")
+    sex_args.add_argument("-fm", "--female-min-ratio", type=float, default=FEMALE_MIN_RATIO, dest="female-min-ratio", help=f"Minimum X/autosome ratio of females [{FEMALE_MIN_RATIO}]")
+    sex_args.add_argument("-fx", "--female-max-ratio", type=float, default=FEMALE_MAX_RATIO, dest="female-max-ratio", help=f"Maximum X/autosome ratio of females [{FEMALE_MAX_RATIO}]")
+    return vars(sex_args.parse_args())
+
+
+def get_chrom_group(chromname):
+    """Determine and return whether a chromosome is X, Y or an autosome.
+
+    Parameters
+    ----------
+    chromname : str
+        Chromosome name, with or without chr prefix
+
+    Returns
+    -------
+    str or None
+        X, Y or A for autosomes, None for other contigs
+    """
+    chromname = chromname[3:] if chromname.startswith("chr") else chromname
+    if chromname in ("X", "Y"):
+        return chromname
+    if chromname.isdigit():
+        return "A"
+    return None
+
+
+def read_target_sizes(intervallistloc):
+    """Read and return the number of targeted bases on X, Y and the autosomes.
+
+    Both Picard interval lists (1-based, with @ header lines) and BED files
+    (0-based) can be used.
+
+    Parameters
+    ----------
+    intervallistloc : str
+        Path to intervallist or BED file
+
+    Returns
+    -------
+    target_sizes : dict
+        Number of targeted bases for X, Y and the autosomes (A)
+    """
+    target_sizes = {"X": 0, "Y": 0, "A": 0}
+    basecorrection = 0 if intervallistloc.endswith(".bed") else 1
+    try:
+        with open(intervallistloc, 'r') as intervallist:
+            for fileline in intervallist:
+                if not fileline.startswith(("@", "#", "track")):
+                    filelinedata = fileline.strip().split("\t")
+                    chrom_group = get_chrom_group(filelinedata[0])
+                    if chrom_group is not None:
+                        target_sizes[chrom_group] += int(filelinedata[2]) - int(filelinedata[1]) + basecorrection
+    except IOError:
+        print(f"Could not read intervallist {intervallistloc}")
+    finally:
+        return target_sizes
+
+
+def read_bam_reference_names(bamfileloc):
+    """Read and return the reference names from the header of a BAM file.
+
+    Only the header is decompressed, not the alignments.
+
+    Parameters
+    ----------
+    bamfileloc : str
+        Path to BAM file
+
+    Returns
+    -------
+    reference_names : list of str
+        Reference names in BAM order
+    """
+    reference_names = []
+    with gzip.open(bamfileloc, 'rb') as bamfile:
+        if bamfile.read(4) != b"BAM\1":
+            raise ValueError(f"{bamfileloc} is not a BAM file")
+        headertext_length = struct.unpack("<i", bamfile.read(4))[0]
+        bamfile.read(headertext_length)
+        num_of_references = struct.unpack("<i", bamfile.read(4))[0]
+        for refnum in range(num_of_references):
+            refname_length = struct.unpack("<i", bamfile.read(4))[0]
+            reference_names.append(bamfile.read(refname_length)[:-1].decode())
+            bamfile.read(4)
+    return reference_names
+
+
+def read_bai_mapped_reads(baifileloc):
+    """Read and return the number of mapped reads per reference from a BAM
+    index.
+
+    The counts are taken from the pseudo bin of each reference, so only the
+    index is read and not the alignments.
+
+    Parameters
+    ----------
+    baifileloc : str
+        Path to BAM index (.bai) file
+
+    Returns
+    -------
+    mapped_reads : list of int
+        Number of mapped reads per reference, in BAM order
+    """
+    mapped_reads = []
+    with open(baifileloc, 'rb') as baifile:
+        baidata = baifile.read()
+    if baidata[0:4] != b"BAI\1":
+        raise ValueError(f"{baifileloc} is not a BAM index file")
+    num_of_references = struct.unpack_from("<i", baidata, 4)[0]
+    dataoffset = 8
+    for refnum in range(num_of_references):
+        ref_mapped_reads = 0
+        num_of_bins = struct.unpack_from("<i", baidata, dataoffset)[0]
+        dataoffset += 4
+        for binnum in range(num_of_bins):
+            bin_id, num_of_chunks = struct.unpack_from("<Ii", baidata, dataoffset)
+            dataoffset += 8
+            if bin_id == BAI_PSEUDO_BIN:
+                ref_mapped_reads = struct.unpack_from("<QQ", baidata, dataoffset + 16)[0]
+            dataoffset += 16 * num_of_chunks
+        num_of_intervals = struct.unpack_from("<i", baidata, dataoffset)[0]
+        dataoffset += 4 + 8 * num_of_intervals
+        mapped_reads.append(ref_mapped_reads)
+    return mapped_reads
+
+
+def get_bai_file(bamfileloc):
+    """Return the path to the index of a BAM file, None if there is none."""
+    for baifileloc in (f"{bamfileloc}.bai", f"{bamfileloc[:-4]}.bai"):
+        if os.path.isfile(baifileloc):
+            return baifileloc
+    return None
+
+
+def get_sample_depths(bamfileloc, targetsizes):
+    """Determine and return the mapped reads per targeted base on X, Y and
+    the autosomes of a single sample.
+
+    The BAM index only holds the number of mapped reads per chromosome, so
+    off-target reads are counted as well. The resulting ratios are therefore
+    not the same as the target coverage ratios of determine_ud_sexes.py.
+
+    Parameters
+    ----------
+    bamfileloc : str
+        Path to BAM file
+    targetsizes : dict
+        Number of targeted bases for X, Y and the autosomes
+
+    Returns
+    -------
+    sample_depths : dict
+        Mapped reads per targeted base for X, Y and the autosomes (A)
+    """
+    mapped_reads = {"X": 0, "Y": 0, "A": 0}
+    reference_names = read_bam_reference_names(bamfileloc)
+    for refname, refmapped in zip(reference_names, read_bai_mapped_reads(get_bai_file(bamfileloc))):
+        chrom_group = get_chrom_group(refname)
+        if chrom_group is not None:
+            mapped_reads[chrom_group] += refmapped
+    return {chromgroup: mapped_reads[chromgroup] / targetsizes[chromgroup] if targetsizes[chromgroup] > 0 else 0 for chromgroup in mapped_reads}
+
+
+def determine_sex(xratio, sexthresholds=SEX_THRESHOLDS):
+    """Determine and return the sex for an X/autosome coverage ratio.
+
+    Parameters
+    ----------
+    xratio : float
+        Ratio between the X and autosomal coverage
+    sexthresholds : tuple of float
+        Maximum male ratio, minimum female ratio and maximum female ratio
+
+    Returns
+    -------
+    str
+        M, F or UD
+    """
+    male_max_ratio, female_min_ratio, female_max_ratio = sexthresholds
+    if xratio < male_max_ratio:
+        return "M"
+    if female_min_ratio < xratio < female_max_ratio:
+        return "F"
+    return "UD"
+
+
+def read_ud_samples(btsfileloc):
+    """Read and return the samples with an undetermined sex from the BAM to
+    sex file.
+
+    Parameters
+    ----------
+    btsfileloc : str
+        Path to BAM to sex file
+
+    Returns
+    -------
+    ud_samples : set of str
+        Sample names with sex UD
+    """
+    ud_samples = set()
+    try:
+        with open(btsfileloc, 'r') as btsfile:
+            next(btsfile)
+            for fileline in btsfile:
+                filelinedata = fileline.strip().split("\t")
+                if len(filelinedata) == 3 and filelinedata[2] == "UD":
+                    ud_samples.add(filelinedata[0])
+    except IOError:
+        print(f"Could not read BAM to sex file {btsfileloc}")
+    finally:
+        return ud_samples
+
+
+def add_sex(sampledepths, sexthresholds=SEX_THRESHOLDS):
+    """Add the X/autosome and Y/autosome ratios and the determined sex to the
+    depths of a sample.
+
+    Parameters
+    ----------
+    sampledepths : dict
+        Depths for X, Y and the autosomes (A) of a sample
+    sexthresholds : tuple of float
+        Maximum male ratio, minimum female ratio and maximum female ratio
+
+    Returns
+    -------
+    sampledepths : dict
+        Depths, ratios and sex of the sample
+    """
+    sampledepths["X_ratio"] = sampledepths["X"] / sampledepths["A"]
+    sampledepths["Y_ratio"] = sampledepths["Y"] / sampledepths["A"]
+    sampledepths["sex"] = determine_sex(sampledepths["X_ratio"], sexthresholds)
+    return sampledepths
+
+
+def infer_sexes(udbamfiles, targetsizes, sexthresholds=SEX_THRESHOLDS):
+    """Determine and return the coverage ratios and sexes of multiple samples.
+
+    Parameters
+    ----------
+    udbamfiles : dict
+        Path to the BAM file per sample
+    targetsizes : dict
+        Number of targeted bases for X, Y and the autosomes
+    sexthresholds : tuple of float
+        Maximum male ratio, minimum female ratio and maximum female ratio
+
+    Returns
+    -------
+    sample_sexes : dict
+        Target depths, X/autosome and Y/autosome ratio and sex per sample
+    """
+    sample_sexes = {}
+    for samplename, bamfileloc in udbamfiles.items():
+        if get_bai_file(bamfileloc) is None:
+            print(f"Could not find the index of {bamfileloc}")
+            continue
+        try:
+            sample_depths = get_sample_depths(bamfileloc, targetsizes)
+        except (IOError, ValueError, struct.error):
+            print(f"Could not read mapped reads of {bamfileloc}")
+            continue
+        if sample_depths["A"] > 0:
+            sample_sexes[samplename] = add_sex(sample_depths, sexthresholds)
+    return sample_sexes
+
+
+def read_hdf5_read_counts(readcountfileloc):
+    """Read and return the intervals and counts of a CollectReadCounts HDF5
+    file.
+
+    Parameters
+    ----------
+    readcountfileloc : str
+        Path to read count .hdf5 file
+
+    Returns
+    -------
+    interval_contigs : numpy.ndarray
+        Contig name per interval
+    interval_lengths : numpy.ndarray
+        Length per interval
+    interval_counts : numpy.ndarray
+        Read count per interval
+    """
+    with h5py.File(readcountfileloc, 'r') as readcountfile:
+        contig_names = np.array([x.decode() if isinstance(x, bytes) else str(x) for x in readcountfile[READCOUNTS_CONTIGS_PATH][...].ravel()])
+        interval_data = readcountfile[READCOUNTS_INTERVALS_PATH][...]
+        interval_counts = readcountfile[READCOUNTS_VALUES_PATH][...].ravel()
+    return contig_names[interval_data[0]], interval_data[2] - interval_data[1] + 1, interval_counts
+
+
+def read_tsv_read_counts(readcountfileloc):
+    """Read and return the intervals and counts of a CollectReadCounts TSV
+    file.
+
+    Parameters
+    ----------
+    readcountfileloc : str
+        Path to read count .tsv file
+
+    Returns
+    -------
+    interval_contigs : numpy.ndarray
+        Contig name per interval
+    interval_lengths : numpy.ndarray
+        Length per interval
+    interval_counts : numpy.ndarray
+        Read count per interval
+    """
+    with open(readcountfileloc, 'r') as readcountfile:
+        countlines = [fileline.rstrip("\n").split("\t") for fileline in readcountfile if not fileline.startswith("@")]
+    interval_data = np.array(countlines[1:], dtype=object).reshape(-1, 4)
+    return interval_data[:, 0].astype(str), interval_data[:, 2].astype(np.int64) - interval_data[:, 1].astype(np.int64) + 1, interval_data[:, 3].astype(np.int64)
+
+
+def read_read_counts(readcountfileloc):
+    """Read and return the intervals and counts of a read count file."""
+    if readcountfileloc.endswith(".hdf5"):
+        return read_hdf5_read_counts(readcountfileloc)
+    return read_tsv_read_counts(readcountfileloc)
+
+
+def get_group_masks(intervalcontigs):
+    """Determine and return for each interval whether it is on X, Y or an
+    autosome.
+
+    Parameters
+    ----------
+    intervalcontigs : numpy.ndarray
+        Contig name per interval
+
+    Returns
+    -------
+    group_masks : numpy.ndarray
+        X, Y and autosome (A) membership per interval, one row per chromosome group
+    """
+    contig_groups = {contigname: get_chrom_group(contigname) for contigname in np.unique(intervalcontigs)}
+    interval_groups = np.array([contig_groups[contigname] for contigname in intervalcontigs], dtype=object)
+    return np.array([interval_groups == chromgroup for chromgroup in ("X", "Y", "A")], dtype=np.float64)
+
+
+def infer_sexes_from_read_counts(readcountfiles, batchsize, sexthresholds=SEX_THRESHOLDS):
+    """Determine and return the coverage ratios and sexes of multiple samples
+    from their read count files.
+
+    The read count files are loaded in batches into a single sample by
+    interval matrix, from which the depths on X, Y and the autosomes of all
+    samples in the batch are determined at once.
+
+    Parameters
+    ----------
+    readcountfiles : dict
+        Path to the read count file per sample
+    batchsize : int
+        Number of read count files to load at once
+    sexthresholds : tuple of float
+        Maximum male ratio, minimum female ratio and maximum female ratio
+
+    Returns
+    -------
+    sample_sexes : dict
+        Target depths, X/autosome and Y/autosome ratio and sex per sample
+    """
+    sample_sexes = {}
+    group_masks = None
+    group_lengths = None
+    num_of_intervals = None
+    samplenames = list(readcountfiles.keys())
+    for batchstart in range(0, len(samplenames), batchsize):
+        batch_samples = []
+        batch_counts = []
+        for samplename in samplenames[batchstart:batchstart+batchsize]:
+            try:
+                interval_contigs, interval_lengths, interval_counts = read_read_counts(readcountfiles[samplename])
+            except (IOError, KeyError, ValueError, IndexError):
+                print(f"Could not read read counts of {readcountfiles[samplename]}")
+                continue
+            if group_masks is None:
+                group_masks = get_group_masks(interval_contigs)
+                group_lengths = group_masks @ interval_lengths
+                num_of_intervals = len(interval_counts)
+            if len(interval_counts) != num_of_intervals:
+                print(f"Skipping {readcountfiles[samplename]}, it has {len(interval_counts)} instead of {num_of_intervals} intervals")
+                continue
+            batch_samples.append(samplename)
+            batch_counts.append(interval_counts)
+
+        if len(batch_samples) > 0:
+            group_depths = (np.vstack(batch_counts) @ group_masks.T) / np.where(group_lengths > 0, group_lengths, 1)
+            for samplename, sampledepths in zip(batch_samples, group_depths.tolist()):
+                sample_depths = dict(zip(("X", "Y", "A"), sampledepths))
+                if sample_depths["A"] > 0:
+                    sample_sexes[samplename] = add_sex(sample_depths, sexthresholds)
+    return sample_sexes
+
+
+def write_sexes(outfileloc, samplesexes):
+    """Write the determined sexes in the format of determine_ud_sexes.py.
+
+    Parameters
+    ----------
+    outfileloc : str
+        Path to write the output file to
+    samplesexes : dict
+        Determined sex per sample
+
+    Returns
+    -------
+    file_written : bool
+        True if file has been written, False if not
+    """
+    file_written = False
+    try:
+        with open(outfileloc, 'w') as outfile:
+            outfile.writelines([f"{samplename}: {samplesexes[samplename]['sex']} ({samplesexes[samplename]['X_ratio']})\n" for samplename in samplesexes])
+        file_written = True
+    except IOError:
+        print(f"Could not write sexes to {outfileloc}")
+    finally:
+        return file_written
+
+
+def write_coverage_table(outfileloc, samplesexes):
+    """Write the X, Y and autosomal target depths, ratios and sex per sample.
+
+    Parameters
+    ----------
+    outfileloc : str
+        Path to write the output file to
+    samplesexes : dict
+        Target depths, ratios and sex per sample
+
+    Returns
+    -------
+    file_written : bool
+        True if file has been written, False if not
+    """
+    file_written = False
+    try:
+        with open(outfileloc, 'w') as outfile:
+            outfile.write("Sample\tX_depth\tY_depth\tAutosomal_depth\tX_ratio\tY_ratio\tSex\n")
+            for samplename, sampledata in samplesexes.items():
+                outfile.write(f"{samplename}\t{sampledata['X']}\t{sampledata['Y']}\t{sampledata['A']}\t"
+                              f"{sampledata['X_ratio']}\t{sampledata['Y_ratio']}\t{sampledata['sex']}\n")
+        file_written = True
+    except IOError:
+        print(f"Could not write coverage table to {outfileloc}")
+    finally:
+        return file_written
+
+
+def write_sex_table(outfileloc, btsfileloc, samplesexes):
+    """Write the BAM to sex file with the sexes of the UD samples replaced by
+    their determined sexes.
+
+    Parameters
+    ----------
+    outfileloc : str
+        Path to write the output file to
+    btsfileloc : str
+        Path to BAM to sex file
+    samplesexes : dict
+        Determined sex per sample
+
+    Returns
+    -------
+    file_written : bool
+        True if file has been written, False if not
+    """
+    file_written = False
+    try:
+        with open(btsfileloc, 'r') as btsfile, open(outfileloc, 'w') as outfile:
+            outfile.write(next(btsfile))
+            for fileline in btsfile:
+                filelinedata = fileline.rstrip("\n").split("\t")
+                if len(filelinedata) == 3 and filelinedata[2] == "UD" and filelinedata[0] in samplesexes:
+                    filelinedata[2] = samplesexes[filelinedata[0]]["sex"]
+                    fileline = "\t".join(filelinedata) + "\n"
+                outfile.write(fileline)
+        file_written = True
+    except IOError:
+        print(f"Could not write sex table to {outfileloc}")
+    finally:
+        return file_written
+
+
+def main():
+    sex_params = get_params()
+    if sex_params["uddir"] is not None and sex_params["intervallist"] is None:
+        print("An intervallist or BED file (-l) is required to determine sexes from BAM files")
+        return
+
+    if sex_params["uddir"] is not None:
+        with os.scandir(sex_params["uddir"]) as direntries:
+            sample_files = {direntry.name.split(".")[0]: direntry.path for direntry in direntries if direntry.name.endswith(".bam")}
+    else:
+        with os.scandir(sex_params["read-counts-dir"]) as direntries:
+            sample_files = {direntry.name.split(".")[0]: direntry.path for direntry in direntries if direntry.name.endswith((".hdf5", ".tsv"))}
+    if sex_params["bam-to-sex"] is not None:
+        ud_samples = read_ud_samples(sex_params["bam-to-sex"])
+        sample_files = {samplename: sample_files[samplename] for samplename in sample_files if samplename in ud_samples}
+    sample_files = dict(sorted(sample_files.items()))
+
+    sex_thresholds = (sex_params["male-max-ratio"], sex_params["female-min-ratio"], sex_params["female-max-ratio"])
+    if sex_params["uddir"] is not None:
+        sample_sexes = infer_sexes(sample_files, read_target_sizes(sex_params["intervallist"]), sex_thresholds)
+    else:
+        sample_sexes = infer_sexes_from_read_counts(sample_files, sex_params["batch-size"], sex_thresholds)
+    wrote_sexes = write_sexes(sex_params["outfile"], sample_sexes)
+    print(f"Wrote sexes for {len(sample_sexes)} of {len(sample_files)} samples?: {wrote_sexes}")
+    if sex_params["coverage-outfile"] is not None:
+        wrote_table = write_coverage_table(sex_params["coverage-outfile"], sample_sexes)
+        print(f"Wrote coverage table?: {wrote_table}")
+    if sex_params["sex-table-outfile"] is not None and sex_params["bam-to-sex"] is None:
+        print("A BAM to sex file (-b) is required to write the BAM to sex file with determined sexes")
+    elif sex_params["sex-table-outfile"] is not None:
+        wrote_sex_table = write_sex_table(sex_params["sex-table-outfile"], sex_params["bam-to-sex"], sample_sexes)
+        print(f"Wrote BAM to sex file with determined sexes?: {wrote_sex_table}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,5 @@
 #!/usr/bin/env python
+import os
 import sys
 
 
@@ -7,9 +8,34 @@ master_path = "/groups/umcg-solve-rd/rsc01/releases/master/bam/"
 try:
     infile = open(sys.argv[1], 'r')
     outfile = open(sys.argv[2], 'w')
+    is_manifest = False
+    in_master_dir = False
+    master_dir_current = False
+    bamfiles = []
     for fileline in infile:
-        if fileline.strip().endswith((".bam", ".bam.bai", ".bai")):
-            bamfile = fileline.strip().split()[-1]
+        filelinedata = fileline.strip().split("\t") if fileline.startswith(("D\t", "F\t")) else fileline.strip().split()
+        if len(filelinedata) == 0:
+            continue
+        # A file_manifest.py manifest lists its files per directory, only use the files of the master BAM directory
+        if filelinedata[0] == "D":
+            is_manifest = True
+            in_master_dir = filelinedata[1] == os.path.abspath(master_path)
+            if in_master_dir:
+                master_dir_current = os.path.isdir(master_path) and os.stat(master_path).st_mtime_ns == int(filelinedata[2])
+            continue
+        if is_manifest:
+            if filelinedata[0] == "F" and in_master_dir:
+                bamfiles.append(filelinedata[1])
+        else:
+            bamfiles.append(filelinedata[-1])
+
+    # As generate_sambamba.py does, list the master BAM directory if the manifest is missing or outdated for it
+    if is_manifest and not master_dir_current:
+        print(f"The manifest is missing or outdated for {master_path}, listing the directory instead")
+        bamfiles = os.listdir(master_path)
+
+    for bamfile in bamfiles:
+        if bamfile.endswith((".bam", ".bam.bai", ".bai")):
             outfile.write(f"{master_path}{bamfile}\n")
     infile.close()
     outfile.close()
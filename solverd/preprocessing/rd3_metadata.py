@@ -0,0 +1,352 @@
+#!/usr/bin/env python
+import os
+import sys
+import pickle
+import argparse
+
+
+# Increase when the layout of the cached mappings changes.
+CACHE_VERSION = 1
+CACHE_FILENAME = "rd3_metadata.pickle"
+
+# Directory with the BED files of the kits, as used by link_bed_to_bam.py
+BED_KITS_DIR = "/groups/umcg-solve-rd/tmp01/resources/BED_KITS"
+
+# Column with the kit name in the RD3 experiment table, as used by link_bed_to_bam.py
+EXPERIMENT_KIT_COLUMN = 3
+
+
+def get_params():
+    """Define CLI parameters and return the set values.
+
+    Returns
+    -------
+    dict
+        Set parameter values
+    """
+    rd3_args = argparse.ArgumentParser()
+    rd3_args.add_argument("-b", "--bamlist", type=str, required=True, dest="bamlist", help="Path to master BAM list")
+    rd3_args.add_argument("-c", "--cache-file", type=str, dest="cache-file", help="Path to the binary cache file [<outdir>/rd3_metadata.pickle]")
+    rd3_args.add_argument("-e", "--experiment-data", type=str, required=True, dest="experiment-data", help="Path to RD3 experiment table")
+    rd3_args.add_argument("-k", "--kitlist", type=str, required=True, dest="kitlist", help="Path to RDConnect file linking kit name to BED file")
+    rd3_args.add_argument("-o", "--outdir", type=str, required=True, dest="outdir", help="Path to write the derived tables to")
+    rd3_args.add_argument("-s", "--samples-data", type=str, required=True, dest="samples-data", help="Path to RD3 samples table")
+    rd3_args.add_argument("-u", "--subjects-data", type=str, required=True, dest="subjects-data", help="Path to RD3 subjects table")
+    rd3_args.add_argument("-d", "--ud-dir", type=str, dest="ud-dir", help="Path to directory containing UD samples, to write the UD link scripts per kit")
+    rd3_args.add_argument("-m", "--master-dir", type=str, dest="master-dir", help="Path to master dir containing BAMs, required with -d")
+    return vars(rd3_args.parse_args())
+
+
+def read_table(tablefileloc):
+    """Read an RD3 table and return its column names and rows.
+
+    Parameters
+    ----------
+    tablefileloc : str
+        Path to tab separated table with header
+
+    Returns
+    -------
+    header_fields : list of str
+        Column names
+    table_rows : list of list of str
+        Fields per row
+    """
+    with open(tablefileloc, 'r') as tablefile:
+        header_fields = next(tablefile).strip().split("\t")
+        table_rows = [fileline.strip().split("\t") for fileline in tablefile]
+    return header_fields, table_rows
+
+
+def build_index(tablerows, keycolumn, valuecolumn, skipempty=False):
+    """Build and return a hash index of a table on a join key.
+
+    Rows too short to contain both columns are skipped. As with the separate
+    scripts, a later row replaces an earlier row with the same key.
+
+    Parameters
+    ----------
+    tablerows : list of list of str
+        Fields per row
+    keycolumn : int
+        Index of the key column
+    valuecolumn : int
+        Index of the value column
+    skipempty : bool
+        Whether to skip rows with an empty key or value
+
+    Returns
+    -------
+    table_index : dict
+        Value per key
+    """
+    table_index = {}
+    maxcolumn = max(keycolumn, valuecolumn)
+    for tablerow in tablerows:
+        if len(tablerow) > maxcolumn:
+            if skipempty and (tablerow[keycolumn] == "" or tablerow[valuecolumn] == ""):
+                continue
+            table_index[tablerow[keycolumn]] = tablerow[valuecolumn]
+    return table_index
+
+
+def read_bamlist(bamlistloc):
+    """Read and return the BAM and index files per sample from the master BAM
+    list.
+
+    Parameters
+    ----------
+    bamlistloc : str
+        Path to master BAM list
+
+    Returns
+    -------
+    bam_files : dict
+        BAM and index file paths per sample, in BAM list order
+    """
+    bam_files = {}
+    with open(bamlistloc, 'r') as bamlistfile:
+        for fileline in bamlistfile:
+            if fileline.strip().endswith((".bam", ".bam.bai", ".bai")):
+                bamsample = fileline.strip().split("/")[-1].split(".")[0]
+                bam_files.setdefault(bamsample, []).append(fileline.strip())
+    return bam_files
+
+
+def load_sources(sourcefiles):
+    """Read all RD3 exports and input lists once and build the hash indexes on
+    their join keys.
+
+    Parameters
+    ----------
+    sourcefiles : dict
+        Paths to the experiment, samples and subjects tables, the BAM list and the kit list
+
+    Returns
+    -------
+    rd3_indexes : dict
+        Hash indexes of the source tables
+    """
+    exp_header, exp_rows = read_table(sourcefiles["experiment-data"])
+    sam_header, sam_rows = read_table(sourcefiles["samples-data"])
+    sub_header, sub_rows = read_table(sourcefiles["subjects-data"])
+    with open(sourcefiles["kitlist"], 'r') as kitlistfile:
+        kit_rows = [fileline.strip().split("\t") for fileline in kitlistfile]
+
+    # The experiment table is keyed on both the sample and the experiment (E-number)
+    experiment_ids = [exprow[exp_header.index("experimentID")] for exprow in exp_rows]
+    experiment_samples = [exprow[exp_header.index("sample")] for exprow in exp_rows]
+    rd3_indexes = {
+        "sample_to_experiment": dict(zip(experiment_samples, experiment_ids)),
+        "experiment_to_sample": dict(zip(experiment_ids, experiment_samples)),
+        "experiment_to_kit": build_index(exp_rows, exp_header.index("experimentID"), EXPERIMENT_KIT_COLUMN),
+        "sample_to_subject": build_index(sam_rows, sam_header.index("sampleID"), sam_header.index("subject"), True),
+        "subject_to_sex": build_index(sub_rows, sub_header.index("SubjectID"), sub_header.index("Claimed sex"), True),
+        "subject_to_ern": {subrow[sub_header.index("SubjectID")]: subrow[-1] for subrow in sub_rows},
+        "kit_to_bed": {kitrow[0]: f"{BED_KITS_DIR}/{kitrow[1]}" for kitrow in kit_rows if len(kitrow) > 1},
+        "bed_to_kit": {kitrow[1]: kitrow[0] for kitrow in kit_rows if len(kitrow) > 1},
+        "bam_files": read_bamlist(sourcefiles["bamlist"])
+    }
+    return rd3_indexes
+
+
+def make_bed_to_bam(rd3indexes):
+    """Make and return the BED file of each BAM and index file."""
+    bed_to_bam = []
+    for experimentid, kitname in rd3indexes["experiment_to_kit"].items():
+        if kitname in rd3indexes["kit_to_bed"] and experimentid in rd3indexes["bam_files"]:
+            bed_to_bam.extend([(rd3indexes["kit_to_bed"][kitname], bamfile) for bamfile in rd3indexes["bam_files"][experimentid]])
+    return bed_to_bam
+
+
+def make_sex_to_bam(rd3indexes, bedtobam):
+    """Make and return the BAM file and claimed sex per experiment."""
+    bam_paths = {}
+    for bedfile, bamfile in bedtobam:
+        bam_paths.setdefault(bamfile.split("/")[-1].split(".")[0], bamfile)
+    sex_to_bam = []
+    for sampleid, experimentid in rd3indexes["sample_to_experiment"].items():
+        subjectid = rd3indexes["sample_to_subject"].get(sampleid, "")
+        sex_to_bam.append((experimentid, bam_paths.get(experimentid, "NA"), rd3indexes["subject_to_sex"].get(subjectid, "")))
+    return sex_to_bam
+
+
+def make_sample_to_ern(rd3indexes):
+    """Make and return the ERN per experiment."""
+    sample_to_ern = {}
+    for experimentid, sampleid in rd3indexes["experiment_to_sample"].items():
+        subjectid = rd3indexes["sample_to_subject"].get(sampleid)
+        if subjectid in rd3indexes["subject_to_ern"]:
+            sample_to_ern[experimentid] = rd3indexes["subject_to_ern"][subjectid]
+    return sample_to_ern
+
+
+def make_ud_to_bed(rd3indexes, bedtobam, udbamfiles):
+    """Make and return the UD BAM files per kit.
+
+    Parameters
+    ----------
+    rd3indexes : dict
+        Hash indexes of the source tables
+    bedtobam : list of tuple
+        BED file per BAM and index file
+    udbamfiles : list of str
+        Names of the UD BAM files
+
+    Returns
+    -------
+    ud_to_bed : dict
+        UD BAM file names per kit name
+    """
+    bam_beds = {bamfile.split("/")[-1]: bedfile.split("/")[-1] for bedfile, bamfile in bedtobam if bamfile.endswith(".bam")}
+    ud_to_bed = {}
+    for udbamfile in udbamfiles:
+        if udbamfile in bam_beds:
+            ud_to_bed.setdefault(rd3indexes["bed_to_kit"][bam_beds[udbamfile]], []).append(udbamfile)
+    return ud_to_bed
+
+
+def build_mappings(sourcefiles, udbamfiles=None):
+    """Load the RD3 exports and materialize all derived mappings.
+
+    Parameters
+    ----------
+    sourcefiles : dict
+        Paths to the experiment, samples and subjects tables, the BAM list and the kit list
+    udbamfiles : list of str
+        Names of the UD BAM files, None to not link UD samples to kits
+
+    Returns
+    -------
+    rd3_mappings : dict
+        BED to BAM, sex to BAM, sample to ERN and UD to BED mappings
+    """
+    rd3_indexes = load_sources(sourcefiles)
+    bed_to_bam = make_bed_to_bam(rd3_indexes)
+    rd3_mappings = {"bed_to_bam": bed_to_bam,
+                    "sex_to_bam": make_sex_to_bam(rd3_indexes, bed_to_bam),
+                    "sample_to_ern": make_sample_to_ern(rd3_indexes),
+                    "ud_to_bed": make_ud_to_bed(rd3_indexes, bed_to_bam, udbamfiles) if udbamfiles is not None else {}}
+    return rd3_mappings
+
+
+def get_source_signature(sourcefiles):
+    """Return the size and modification time of each source file."""
+    source_signature = {}
+    for sourcename, sourcefileloc in sorted(sourcefiles.items()):
+        sourcestat = os.stat(sourcefileloc)
+        source_signature[sourcename] = (sourcefileloc, sourcestat.st_size, sourcestat.st_mtime_ns)
+    return source_signature
+
+
+def read_cache(cachefileloc, sourcesignature=None):
+    """Read and return the cached mappings, None if the cache can not be used.
+
+    Parameters
+    ----------
+    cachefileloc : str
+        Path to the cache file
+    sourcesignature : dict
+        Signature of the current source files, None to not check the sources
+
+    Returns
+    -------
+    dict or None
+        Cached mappings
+    """
+    try:
+        with open(cachefileloc, 'rb') as cachefile:
+            rd3_cache = pickle.load(cachefile)
+        if rd3_cache.get("version") == CACHE_VERSION and (sourcesignature is None or rd3_cache.get("sources") == sourcesignature):
+            return rd3_cache["mappings"]
+    except (IOError, EOFError, pickle.UnpicklingError):
+        pass
+    return None
+
+
+def write_cache(cachefileloc, sourcesignature, rd3mappings):
+    """Write the mappings and the signature of their sources to the cache file."""
+    try:
+        with open(cachefileloc, 'wb') as cachefile:
+            pickle.dump({"version": CACHE_VERSION, "sources": sourcesignature, "mappings": rd3mappings}, cachefile, protocol=pickle.HIGHEST_PROTOCOL)
+    except IOError:
+        print(f"Could not write RD3 metadata cache {cachefileloc}")
+
+
+def write_table(outfileloc, headerline, tablerows):
+    """Write a tab separated table.
+
+    Parameters
+    ----------
+    outfileloc : str
+        Path to write the table to
+    headerline : str
+        Header line, None to write no header
+    tablerows : list of tuple
+        Fields per row
+
+    Returns
+    -------
+    file_written : bool
+        True if file has been written, False if not
+    """
+    file_written = False
+    try:
+        with open(outfileloc, 'w') as outfile:
+            if headerline is not None:
+                outfile.write(headerline)
+            outfile.writelines(["\t".join(tablerow) + "\n" for tablerow in tablerows])
+        file_written = True
+    except IOError:
+        print(f"Could not write {outfileloc}")
+    finally:
+        return file_written
+
+
+def write_ud_link_scripts(outdirloc, udtobed, masterdirloc, uddirloc):
+    """Write the link commands of the UD BAM files per kit, as ud_to_bed.py does."""
+    for kitname, udbamfiles in udtobed.items():
+        try:
+            with open(f"{outdirloc}/{kitname}.sh", 'w') as outfile:
+                for udfile in udbamfiles:
+                    outfile.write(f"ln -s {masterdirloc}/{udfile} {uddirloc}/{kitname}/{udfile}\n")
+                    outfile.write(f"ln -s {masterdirloc}/{udfile}.bai {uddirloc}/{kitname}/{udfile}.bai\n")
+        except IOError:
+            print(f"Could not write UD link script for {kitname}")
+
+
+def main():
+    rd3_params = get_params()
+    if rd3_params["ud-dir"] is not None and rd3_params["master-dir"] is None:
+        print("The -m / --master-dir parameter is required with -d / --ud-dir")
+        sys.exit(1)
+    outdir = rd3_params["outdir"].rstrip("/")
+    cachefileloc = rd3_params["cache-file"] if rd3_params["cache-file"] is not None else f"{outdir}/{CACHE_FILENAME}"
+    source_files = {sourcename: rd3_params[sourcename] for sourcename in ("bamlist", "experiment-data", "kitlist", "samples-data", "subjects-data")}
+    ud_bam_files = None
+    if rd3_params["ud-dir"] is not None:
+        with os.scandir(rd3_params["ud-dir"]) as direntries:
+            ud_bam_files = sorted([direntry.name for direntry in direntries if direntry.name.endswith(".bam")])
+        source_files["ud-dir"] = rd3_params["ud-dir"]
+
+    source_signature = get_source_signature(source_files)
+    rd3_mappings = read_cache(cachefileloc, source_signature)
+    if rd3_mappings is None:
+        print("...[BUILDING RD3 METADATA MAPPINGS]...")
+        source_files.pop("ud-dir", None)
+        rd3_mappings = build_mappings(source_files, ud_bam_files)
+        write_cache(cachefileloc, source_signature, rd3_mappings)
+    else:
+        print(f"...[LOADED RD3 METADATA MAPPINGS FROM {cachefileloc}]...")
+
+    wrote_btb = write_table(f"{outdir}/master_bed_to_bam.txt", "BED\tBAM\n", rd3_mappings["bed_to_bam"])
+    wrote_stb = write_table(f"{outdir}/sex_to_bam.txt", "ESample\tBAM file\tSample sex\n", rd3_mappings["sex_to_bam"])
+    wrote_ste = write_table(f"{outdir}/sample_to_ern.txt", None, rd3_mappings["sample_to_ern"].items())
+    print(f"Wrote BED to BAM, sex to BAM and sample to ERN files?: {wrote_btb}, {wrote_stb}, {wrote_ste}")
+    if rd3_params["ud-dir"] is not None:
+        write_ud_link_scripts(outdir, rd3_mappings["ud_to_bed"], rd3_params["master-dir"], outdir)
+        print(f"Wrote UD link scripts for {len(rd3_mappings['ud_to_bed'])} kits")
+
+
+if __name__ == "__main__":
+    main()
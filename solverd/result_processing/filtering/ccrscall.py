@@ -1,7 +1,8 @@
 #!/usr/bin/env python
 import statistics
+from conradexon import ConradGeneNames
 
-class CcrsCall:
+class CcrsCall(ConradGeneNames):
     def __init__(self, ccrssample, ccrschrom, ccrsstart, ccrsend, ccrsprobes, ccrscall, ccrssegmean):
         self.ccrs_sample = ccrssample
         self.ccrs_chrom = ccrschrom
@@ -39,23 +40,17 @@ class CcrsCall:
         if self.ccrs_call == "0":
             return "Neutral"
 
-    def get_gene_names(self):
-        """Return names of all overlapping Conrad genes."""
-        genenames = []
-        for cexon in self.conrad_exons:
-            genenames.append(cexon.gene_name)
-        return set(genenames)
+    @property
+    def conrad_exons(self):
+        return self.gene_exons
 
-    def get_gene_names_2(self):
-        """Return the names of all overlapping Conrad genes."""
-        return set([cexon.gene_name for cexon in self.conrad_exons])
+    @conrad_exons.setter
+    def conrad_exons(self, conradexons):
+        self.gene_exons = conradexons
 
     def get_conrad_gene_names(self):
-        """Return gene names of all overlapping Conrad CNVs."""
-        conrad_genenames = []
-        for conradcnv in self.conrad_cnvs:
-            conrad_genenames.extend(conradcnv.get_gene_names_2())
-        return conrad_genenames
+        """Return gene names of all overlapping Conrad CNVs, from the gene names each Conrad CNV keeps."""
+        return tuple([genename for conradcnv in self.conrad_cnvs for genename in conradcnv.get_gene_names_2()])
 
     def get_region_string(self):
         """Return the CCRS call as a genomic region string (i.e. 1:100000-1000000)."""
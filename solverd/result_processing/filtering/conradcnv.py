@@ -1,5 +1,8 @@
 #!/usr/bin/env python
-class ConradCnv:
+from conradexon import ConradGeneNames
+
+
+class ConradCnv(ConradGeneNames):
     def __init__(self, cnvchrom, cnvstart, cnvend, cnvwidth, cnvstrand, cnvnames, cnvtype, cnvoccurrence, cnvfrequency):
         self.cnv_chrom = cnvchrom
         self.cnv_start = cnvstart
@@ -36,16 +39,13 @@ class ConradCnv:
         overlap_perc = (overlap_size / acnvlength) * 100
         return round(overlap_perc, 3)
 
-    def get_gene_names(self):
-        """Return names of all overlapping genes."""
-        genenames = []
-        for cexon in self.cnv_exons:
-            genenames.append(cexon.gene_name)
-        return set(genenames)
+    @property
+    def cnv_exons(self):
+        return self.gene_exons
 
-    def get_gene_names_2(self):
-        """Return the names of all overlapping genes."""
-        return set([cexon.gene_name for cexon in self.cnv_exons])
+    @cnv_exons.setter
+    def cnv_exons(self, cnvexons):
+        self.gene_exons = cnvexons
 
     def get_occurrence_number(self):
         return [int(x) for x in self.cnv_occurrence.split("/")]
@@ -6,3 +6,28 @@ class ConradExon:
         self.exon_end = cexonend
         self.exon_name = cexonname
         self.gene_name = cexonname.split("_")[0]
+
+
+
+class ConradGeneNames:
+    """Mixin for classes with overlapping Conrad exons. Provides these exons
+    as gene_exons and the memoized distinct gene names of these exons."""
+    @property
+    def gene_exons(self):
+        return self._gene_exons
+
+    @gene_exons.setter
+    def gene_exons(self, conradexons):
+        # The exons are stored as a tuple, so they can only change here and the cached gene names stay valid.
+        self._gene_exons = tuple(conradexons)
+        self._gene_names = None
+
+    def get_gene_names(self):
+        """Return names of all overlapping genes."""
+        return self.get_gene_names_2()
+
+    def get_gene_names_2(self):
+        """Return the names of all overlapping genes. The names are collected once, and again after new exons have been set."""
+        if self._gene_names is None:
+            self._gene_names = frozenset([cexon.gene_name for cexon in self._gene_exons])
+        return self._gene_names